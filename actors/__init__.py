@@ -1,15 +1,20 @@
 import inspect
 
 import actors.actor
-from actors.director import start, shutdown
+from actors.director import (start, shutdown, flush, get_metrics, migrate,
+                             supervise, wait_idle)
+from actors.future import ActorFuture, get
+from actors.group import ActorGroup
+from actors.mailbox import ActorStopped, MailboxFull, high_priority
+from actors.replicas import ReplicaSet
 
 
-def make_decorator(class_id=None):
+def make_decorator(class_id=None, **options):
     def class_decorator(cls):
         if inspect.isclass(cls):
             # check extra parameters (in the future)
 
-            return actors.actor.make_role_class(cls, class_id)
+            return actors.actor.make_role_class(cls, class_id, **options)
 
         raise TypeError("The @actors.remote decorator must be applied to "
                         "a class.")
@@ -25,20 +30,24 @@ def remote(*args, **kwargs):
     error_string = ("The @actors.remote decorator must be applied either "
                     "with no arguments and no parentheses, or it must be "
                     "applied using some of the arguments: "
-                    "'class_id', "
+                    "'class_id', 'concurrency', 'serializer', "
+                    "'mailbox_size', 'overflow', 'checkpoint_every', "
+                    "'checkpoint_interval', 'pool', 'spread', 'memory', "
+                    "'cpus', 'replicas', 'max_replicas', "
                     "like in @actors.remote(class_id='userclassid').")
     assert len(args) == 0 and len(kwargs) > 0, error_string
     for key in kwargs:
         assert key in [
             "class_id",
+            *actors.actor.ROLE_OPTIONS,
         ], error_string
 
     # Handle arguments.
-    class_id = kwargs.get("class_id")
+    class_id = kwargs.pop("class_id", None)
 
-    return make_decorator(class_id=class_id)
+    return make_decorator(class_id=class_id, **kwargs)
 
 
-def role(actor_type, class_id=None):
-    decor_class = make_decorator(class_id=class_id)(actor_type)
+def role(actor_type, class_id=None, **options):
+    decor_class = make_decorator(class_id=class_id, **options)(actor_type)
     return decor_class
@@ -0,0 +1,224 @@
+"""Counts of the calls sent and handled, to know when the actors are idle.
+
+Every process counts the calls it sends, the calls it takes in (from
+its queue, its channels or its own actors), and the calls its actors
+finish or drop (a full mailbox, see actors.mailbox, or a stopped actor).
+The actors are idle when every call sent was handled: no call is waiting
+in a mailbox or a queue, or running.
+
+:func:`actors.wait_idle` gets the counts of every process in waves: it
+puts a :class:`Probe` on the queue of each process, and the thread that
+reads the queue answers it right away, even if an actor is busy. The
+counts of a wave are not taken at the same instant, so the actors are
+only considered idle after two waves in a row with the same counts, in
+which the calls sent and handled match. A process that stops sends its
+last counts.
+
+The calls taken by a process that dies are never handled. Once the
+director saw a process die, the actors are also idle after two waves
+with the same counts in which every process handled all the calls it
+took: the calls sent and not handled then were lost with it, or sent
+to it and never taken, and they are settled.
+"""
+import logging
+import queue as local_queue
+import threading
+import time
+import uuid
+
+from actors.actor import Action
+from actors.batching import Batch
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the answers of a wave.
+WAVE_TIMEOUT = 2
+# Seconds between waves while the actors are busy, at most.
+MAX_WAVE_INTERVAL = 0.5
+
+
+class Counters(object):
+    """The calls sent and handled by this process.
+
+    The process is told apart by its *process_id*, and the counts it
+    reports go to the *reports* queue of the director.
+    """
+
+    def __init__(self, reports=None):
+        self.process_id = uuid.uuid4().hex
+        self.reports = reports
+        self.sent = 0
+        self.received = 0
+        self.handled = 0
+        self.lock = threading.Lock()
+
+    def add_sent(self, n=1):
+        with self.lock:
+            self.sent += n
+
+    def add_received(self, messages):
+        """Count the calls in *messages* that this process took in."""
+        calls = count_calls(messages)
+        with self.lock:
+            self.received += calls
+
+    def hand_over(self, messages):
+        """Stop counting the calls in *messages* that this process took
+        in, another one takes them, see actors.migration."""
+        calls = count_calls(messages)
+        with self.lock:
+            self.received -= calls
+
+    def add_handled(self, n=1):
+        with self.lock:
+            self.handled += n
+
+    def add_dropped(self, messages):
+        """Count the calls in *messages* that will never be handled."""
+        self.add_handled(count_calls(messages))
+
+    def report(self, wave=None, actor_key=None):
+        """Send our counts, for a *wave*, or the last ones if None, when
+        the process of *actor_key* ends."""
+        with self.lock:
+            counts = (wave, self.process_id, self.sent, self.handled,
+                      self.received, actor_key)
+        if self.reports is not None:
+            try:
+                self.reports.put(counts)
+            except (EOFError, OSError):
+                pass  # the director is gone
+
+
+counters = Counters()
+
+
+def set_up(reports):
+    """Count from zero in a new process, see Counters."""
+    global counters
+    counters = Counters(reports)
+
+
+def count_calls(messages):
+    calls = 0
+    for message in messages:
+        if isinstance(message, Batch):
+            calls += len(message)
+        elif isinstance(message, Action):
+            calls += 1
+    return calls
+
+
+class Probe(object):
+    """Asks a process for its counts, for a *wave*."""
+    __slots__ = ('wave',)
+
+    def __init__(self, wave):
+        self.wave = wave
+
+    def __reduce__(self):
+        return Probe, (self.wave,)
+
+    def __repr__(self):
+        return f"Probe({self.wave})"
+
+
+class IdleDetector(object):
+    """Tells when the actors are idle, from the driver.
+
+    *reports* is the queue where the processes put their counts, see
+    Counters.
+    """
+
+    def __init__(self, reports):
+        self.reports = reports
+        self.known = {}  # the last counts of each process, by its ID
+        self.ended = set()  # the keys of the actors whose process ended
+        self.waves = 0
+        self.lock = threading.Lock()
+        # processes that died since the last settlement, and the calls
+        # settled so far, see the module docstring
+        self.deaths = 0
+        self.settled = 0
+        self.deaths_lock = threading.Lock()
+
+    def died(self):
+        """A process that runs actors died, the calls it took are
+        lost."""
+        with self.deaths_lock:
+            self.deaths += 1
+
+    def wait(self, probe, timeout=None):
+        """Wait until the actors are idle, True if they are.
+
+        *probe* puts a Probe on the queue of every process that runs
+        actors, and returns how many it reached, or None if some queue was
+        full. False if they are still busy after *timeout* seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        previous = None
+        interval = 0.01
+        with self.lock:
+            while True:
+                self.waves += 1
+                wave = self.waves
+                with self.deaths_lock:
+                    deaths = self.deaths
+                reached = probe(Probe(wave))
+                answered, quiet = self._collect(wave, reached or 0, deadline)
+                answered = answered and reached is not None
+                sent = counters.sent + sum(s for s, _ in self.known.values())
+                handled = counters.handled + self.settled + sum(
+                    h for _, h in self.known.values())
+                idle = answered and (sent == handled or
+                                     deaths > 0 and quiet)
+                if idle and previous == (sent, handled):
+                    if sent != handled:
+                        logger.warning(f"Settling {sent - handled} calls "
+                                       f"lost with the processes that died")
+                        self.settled += sent - handled
+                    with self.deaths_lock:
+                        self.deaths -= deaths
+                    return True
+                previous = (sent, handled) if idle else None
+                if deadline is not None and time.monotonic() >= deadline:
+                    logger.debug(f"Not idle: {sent} calls sent, {handled} "
+                                 "handled")
+                    return False
+                if not idle:
+                    time.sleep(interval)
+                    interval = min(interval * 2, MAX_WAVE_INTERVAL)
+
+    def _collect(self, wave, expected, deadline):
+        """Take the counts of *wave*, and whether all arrived and all the
+        processes that answered handled the calls they took.
+
+        Also the last counts of the processes that stopped meanwhile.
+        """
+        answers = 0
+        quiet = True
+        until = time.monotonic() + WAVE_TIMEOUT
+        if deadline is not None:
+            until = min(until, deadline)
+        while True:
+            try:
+                if answers < expected:
+                    counts = self.reports.get(
+                        timeout=max(0.001, until - time.monotonic()))
+                else:
+                    counts = self.reports.get(block=False)
+            except local_queue.Empty:
+                # else they are busy, or gone
+                return answers == expected, quiet
+            answer_wave, process_id, sent, handled, received, actor_key = \
+                counts
+            if actor_key is not None:
+                self.ended.add(actor_key)
+            # the counts of a process only grow, late answers are older
+            known = self.known.get(process_id, (0, 0))
+            self.known[process_id] = (max(known[0], sent),
+                                      max(known[1], handled))
+            if answer_wave == wave:
+                answers += 1
+                # the dropped calls it could not load were not taken
+                quiet = quiet and handled >= received
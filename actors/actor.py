@@ -1,19 +1,67 @@
 import inspect
+import itertools
 import logging
 import uuid
 
 import actors
+import actors.shm
+from actors import registry, serialization
+from actors.placement import PLACEMENT_OPTIONS
+from actors.registry import RoleInfo
 from actors.util.inspect import (extract_signature, is_class_method,
                                  is_function_or_method,
                                  is_static_method)
 
 logger = logging.getLogger(__name__)
 
+# Options of a role, given to @actors.remote, and their defaults.
+ROLE_OPTIONS = {
+    # Max number of calls to `async def` methods an actor runs at once.
+    'concurrency': 1000,
+    # Serializer for the calls to the actors of the role, see
+    # actors.serialization. None leaves it to the queue (cloudpickle).
+    'serializer': None,
+    # Max number of calls waiting for an actor, None for no limit, see
+    # actors.mailbox.
+    'mailbox_size': None,
+    # What to do with a call for an actor whose mailbox is full, one of
+    # OVERFLOW_POLICIES.
+    'overflow': 'block',
+    # Save the state of the actors after this many calls, and/or after a
+    # call this many seconds after the last save, see actors.checkpoint.
+    # None for neither.
+    'checkpoint_every': None,
+    'checkpoint_interval': None,
+    # The worker pool of the actors, None for the default one, whether to
+    # spread them over the workers, and the memory (MB) and CPUs each one
+    # needs, see actors.placement.
+    'pool': None,
+    'spread': False,
+    'memory': None,
+    'cpus': None,
+    # Number of actors behind each proxy, None for one, and up to how
+    # many to scale them, None for no scaling, see actors.replicas.
+    'replicas': None,
+    'max_replicas': None,
+}
+
+# The options of Role.options().
+CREATE_OPTIONS = PLACEMENT_OPTIONS + ('replicas', 'max_replicas')
+
+# 'block' the sender until there is room, drop the oldest waiting call,
+# drop the new one, or raise actors.MailboxFull in the sender.
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'raise')
+
+# Action IDs only need to be unique within the sender, since they are
+# used to match the replies that come back to it.
+action_ids = itertools.count(1)
+
 
 class MethodHandler(object):
-    def __init__(self, actor_proxy, method_name):
+    def __init__(self, actor_proxy, method_name, method_id):
         self._actor_proxy = actor_proxy  # TODO: make this a weak ref
         self._method_name = method_name
+        self._method_id = method_id
         self._with_future = False
 
     def __call__(self, *args, **kwargs):
@@ -23,36 +71,31 @@ class MethodHandler(object):
 
     def remote(self, *args, **kwargs):
         # TODO: we could let the user define the action id
-        logger.debug(f"Calling method '{self._method_name}'"
-                     f" on actor '{self._actor_proxy}'")
-
-        # FIXME: checking all args for proxies is slow
-        refs = False
-        args = list(args)
-        new_args = []
-        for arg in args:
-            if isinstance(arg, ActorProxy):
-                refs = True
-                arg = arg._to_weak()
-            new_args.append(arg)
-        new_kwargs = {}
-        for key, value in kwargs:
-            if isinstance(value, ActorProxy):
-                refs = True
-                value = value._to_weak()
-            new_kwargs[key] = value
-        new_action = Action(self._actor_proxy._thtr_actor_key,
-                            self._method_name,
-                            args=tuple(new_args), kwargs=new_kwargs, refs=refs)
-        actors.director.send_action(new_action)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Calling method '{self._method_name}'"
+                         f" on actor '{self._actor_proxy}'")
+
+        # proxies in the arguments need no special care, they pickle
+        # themselves as a WeakRef (see ActorProxy.__reduce__)
+        new_action = Action(self._actor_proxy._thtr_next_key(),
+                            self._method_id,
+                            args=args, kwargs=kwargs)
+        new_action.serializer = self._actor_proxy._thtr_role.serializer
+        future = None
         if self._with_future:
-            return "This would be a Future"
+            channel = actors.director.get_reply_channel()
+            new_action.reply_to = channel.queue
+            # register before sending, the reply could be faster than us
+            future = channel.register(new_action.action_id)
+        actors.director.send_action(new_action)
+        return future
 
     @property
     def future(self):
         class WithFuture(MethodHandler):
             def __init__(s):
-                super().__init__(self._actor_proxy, self._method_name)
+                super().__init__(self._actor_proxy, self._method_name,
+                                 self._method_id)
                 s._with_future = True
 
         return WithFuture()
@@ -85,6 +128,9 @@ class RoleClassMethodMetadata(object):
         actor_methods = inspect.getmembers(modified_class,
                                            is_function_or_method)
         self.methods = dict(actor_methods)
+        # method IDs are the positions in this (sorted) tuple, actors
+        # bind them once into their dispatch table (RoleInfo.bind)
+        self.method_names = tuple(sorted(self.methods))
         self.signatures = {}
         for method_name, method in actor_methods:
             # Whether or not this method requires binding of its first
@@ -119,23 +165,28 @@ class RoleClassMetadata:
         class_id: The ID of this actor class.
         class_name: The name of this class.
         method_meta: The actor method metadata.
+        options: The role options, see ROLE_OPTIONS.
     """
 
     def __init__(self, enriched_class,
-                 role_creation_function_descriptor, class_id):
+                 role_creation_function_descriptor, class_id, options):
         self.enriched_class = enriched_class
         self.actor_creation_function_descriptor = \
             role_creation_function_descriptor
         self.class_name = role_creation_function_descriptor.class_name
         self.class_id = class_id
+        self.options = options
         self.method_meta = RoleClassMethodMetadata.create(
             enriched_class, role_creation_function_descriptor)
-        self.proxy_crafter = lambda actor_key: ActorProxy(
-            actor_key,
-            self.method_meta.signatures,
-            self.class_name,
-            self.class_id
-        )
+        self.role = RoleInfo(class_id, self.class_name,
+                             self.method_meta.signatures,
+                             self.method_meta.method_names,
+                             serialization.wire_name(options['serializer']))
+        actor_class = enriched_class.__thtr_actor_class__
+        registry.register(self.role, f"{actor_class.__module__}."
+                                     f"{actor_class.__qualname__}")
+        self.proxy_crafter = lambda actor_key: ActorProxy(actor_key,
+                                                          self.role)
 
 
 class RoleClass(object):
@@ -180,7 +231,7 @@ class RoleClass(object):
                         f".with_key(key)'.")
 
     @classmethod
-    def _thtr_from_enriched_class(cls, enriched_class, class_id):
+    def _thtr_from_enriched_class(cls, enriched_class, class_id, options):
         for attribute in [
             'with_key',
             # "_remote",
@@ -207,47 +258,119 @@ class RoleClass(object):
             enriched_class.__thtr_actor_class__)
 
         self.__thtr_metadata__ = RoleClassMetadata(
-            enriched_class, actor_creation_function_descriptor, class_id)
+            enriched_class, actor_creation_function_descriptor, class_id,
+            options)
 
         return self
 
     def remote(self, *args, **kwargs):
-        meta = self.__thtr_metadata__
-        actor_key = meta.class_id + ':' + str(uuid.uuid4())
+        """Create a new actor of this role, returns its proxy right away.
 
-        proxy = ActorProxy(
-            actor_key,
-            meta.method_meta.signatures,
-            meta.class_name,
-            meta.class_id
-        )
-        weak_ref = proxy._to_weak()
+        Messages sent to the actor while it starts wait in its queue.
+        """
+        return self.remote_many(1, *args, **kwargs)[0]
+
+    def remote_many(self, n, *args, **kwargs):
+        """Create *n* actors of this role at once, returns their proxies.
+
+        All of them are constructed with the same *args* and *kwargs*.
+        """
+        return create_actors(self.__thtr_metadata__, n, args, kwargs)
 
-        actors.director.new_actor(meta, weak_ref,
-                                  args, kwargs)
+    def options(self, **options):
+        """This role with other placement or replica *options* for the
+        actors created through it, like
+        ``Role.options(colocate=other).remote()``.
 
+        See actors.placement and actors.replicas for the options.
+        """
+        meta = self.__thtr_metadata__
+        for key in options:
+            if key not in CREATE_OPTIONS:
+                raise TypeError(f"Unknown option '{key}' for "
+                                f"{meta.class_name}.options(), valid options "
+                                f"are: {', '.join(CREATE_OPTIONS)}")
+        colocate = options.get('colocate')
+        if isinstance(colocate, ActorProxy):
+            options['colocate'] = colocate._actor_key
+        role_options = dict(meta.options)
+        role_options.update(options)
+        check_role_options(role_options)
+        return RoleCreator(meta, role_options)
+
+    def respawn(self, actor_key, *args, **kwargs):
+        """Create the actor with *actor_key* again, returns its proxy.
+
+        Use it to bring back an actor whose process is gone, or to create
+        one with a known key. It is constructed with *args* and *kwargs*
+        and then it gets the state of its last checkpoint, if its role
+        saves them (see actors.checkpoint). Messages still waiting in the
+        queue of the previous actor go to the new one.
+        """
+        meta = self.__thtr_metadata__
+        proxy = ActorProxy(actor_key, meta.role)
+        actors.director.respawn_actor(meta, proxy._to_weak(), args, kwargs)
         return proxy
 
     def for_key(self, actor_key):
         meta = self.__thtr_metadata__
 
-        proxy = ActorProxy(
-            actor_key,
-            meta.method_meta.signatures,
-            meta.class_name,
-            meta.class_id
-        )
+        proxy = ActorProxy(actor_key, meta.role)
 
         return proxy
 
 
+class RoleCreator(object):
+    """Creates actors of a role with other role *options*, see
+    RoleClass.options."""
+
+    def __init__(self, meta, options):
+        self.meta = meta
+        self.options = options
+
+    def remote(self, *args, **kwargs):
+        return self.remote_many(1, *args, **kwargs)[0]
+
+    def remote_many(self, n, *args, **kwargs):
+        return create_actors(self.meta, n, args, kwargs, self.options)
+
+
+def create_actors(meta, n, args, kwargs, options=None):
+    """Create *n* actors of the role of *meta*, with its options or
+    *options*, and return their proxies.
+
+    With the replicas option, each one is a replica set, see
+    actors.replicas.
+    """
+    if (options or meta.options)['replicas'] is not None:
+        return [actors.replicas.create_replica_set(meta, args, kwargs,
+                                                   options or meta.options)
+                for _ in range(n)]
+    proxies = []
+    for _ in range(n):
+        actor_key = meta.class_id + ':' + str(uuid.uuid4())
+        proxies.append(ActorProxy(actor_key, meta.role))
+
+    actors.director.new_actors(meta, [p._to_weak() for p in proxies],
+                               args, kwargs, options)
+
+    return proxies
+
+
 class WeakRef(object):
-    def __init__(self, actor_key, methods_signs, class_name, class_id):
+    """What travels in place of a proxy: the actor key and class ID.
+
+    The rest of the proxy is rebuilt from the registry on arrival.
+    """
+    __slots__ = ('_thtr_actor_key', '_thtr_class_id')
+
+    def __init__(self, actor_key, class_id):
         self._thtr_actor_key = actor_key
-        self._thtr_method_signatures = methods_signs
-        self._thtr_class_name = class_name
         self._thtr_class_id = class_id
 
+    def __reduce__(self):
+        return WeakRef, (self._thtr_actor_key, self._thtr_class_id)
+
     def build_proxy(self):
         return ActorProxy._from_weak(self)
 
@@ -258,13 +381,11 @@ class ActorProxy(object):
     Fields are prefixed with _thtr_ to hide them and to avoid collisions.
     """
 
-    def __init__(self, actor_key, methods_signs, class_name, class_id):
+    def __init__(self, actor_key, role):
         self._thtr_actor_key = actor_key
-        self._thtr_method_signatures = methods_signs
-        self._thtr_class_name = class_name
-        self._thtr_class_id = class_id
+        self._thtr_role = role
 
-        for method_name in self._thtr_method_signatures.keys():
+        for method_id, method_name in enumerate(role.method_names):
             # TODO: Python function descriptors to load/import classes when
             #  needed. When recreating proxies or sending them elsewhere.
             # function_descriptor = PythonFunctionDescriptor(
@@ -273,22 +394,42 @@ class ActorProxy(object):
             #     method_name] = function_descriptor
             method = MethodHandler(
                 self,
-                method_name)
+                method_name,
+                method_id)
             setattr(self, method_name, method)
 
         setattr(self, 'pls_stop', self.__stop)
 
-    def __stop(self):
-        actors.director.send_stop(self._thtr_actor_key)
+    def __stop(self, now=False):
+        actors.director.send_stop(self._thtr_actor_key, now)
+
+    def _thtr_next_key(self):
+        """The key of the actor the next call goes to."""
+        return self._thtr_actor_key
+
+    @property
+    def _thtr_class_id(self):
+        return self._thtr_role.class_id
+
+    @property
+    def _thtr_class_name(self):
+        return self._thtr_role.class_name
+
+    @property
+    def _thtr_method_signatures(self):
+        return self._thtr_role.signatures
 
     def _to_weak(self):
-        return WeakRef(self._thtr_actor_key, self._thtr_method_signatures,
-                       self._thtr_class_name, self._thtr_class_id)
+        return WeakRef(self._thtr_actor_key, self._thtr_class_id)
 
     @staticmethod
     def _from_weak(weak: WeakRef):
-        return ActorProxy(weak._thtr_actor_key, weak._thtr_method_signatures,
-                          weak._thtr_class_name, weak._thtr_class_id)
+        return ActorProxy(weak._thtr_actor_key,
+                          registry.lookup(weak._thtr_class_id))
+
+    def __reduce__(self):
+        # travel as light as a WeakRef
+        return ActorProxy._from_weak, (self._to_weak(),)
 
     def __eq__(self, other):
         if isinstance(other, ActorProxy):
@@ -312,39 +453,98 @@ class ActorProxy(object):
 class Action(object):
     """Create a new representation of an action.
 
-    If no *action_id* is given, a new one is generated.
+    The method is identified by its *method_id* in the role, see
+    :class:`actors.registry.RoleInfo`. If no *action_id* is given, a new
+    one is generated. If *reply_to* is given, the result of the call is
+    put on that queue. Actions for roles with a *serializer* are sent
+    encoded with it, see actors.serialization.
     """
+    __slots__ = ('actor_key', 'method_id', 'action_id', 'args', 'kwargs',
+                 'reply_to', 'shared', 'trace', 'serializer')
 
-    def __init__(self, actor_key, method_name, action_id=None,
-                 args=None, kwargs=None, refs=False):
-        self.args = args or []
+    def __init__(self, actor_key, method_id, action_id=None,
+                 args=None, kwargs=None, reply_to=None, shared=None,
+                 trace=None):
+        self.args = args or ()
         self.kwargs = kwargs or {}
-        self.action_id = action_id or uuid.uuid4().hex
+        self.action_id = next(action_ids) if action_id is None else action_id
+        self.actor_key = actor_key
+        self.method_id = method_id
+        self.reply_to = reply_to
+        self.shared = shared  # arguments in shared memory, see actors.shm
+        self.trace = trace  # (sent time, bytes), see actors.metrics
+        self.serializer = None  # only for the sender, not on the wire
+
+    def state(self):
+        """The arguments to rebuild this action with."""
+        # positional state, no attribute names on the wire
+        return (self.actor_key, self.method_id, self.action_id,
+                self.args, self.kwargs, self.reply_to, self.shared,
+                self.trace)
+
+    def __reduce__(self):
+        return Action, self.state()
+
+    def encode(self):
+        """This action as bytes, encoded with its serializer."""
+        return serialization.encode(self.serializer, self.state())
+
+    def share_args(self, threshold):
+        """Move the large buffers in the arguments to shared memory."""
+        dumps = serialization.buffer_dumps(self.serializer)
+        shared = actors.shm.share((self.args, self.kwargs), threshold,
+                                  dumps=dumps)
+        if shared is not None:
+            self.shared = shared
+            self.args, self.kwargs = (), {}
+
+    def call(self, dispatch):
+        """Run this action with the bound methods of an actor instance.
+
+        *dispatch* has the bound methods by method ID, see
+        :meth:`actors.registry.RoleInfo.bind`.
+        """
+        if self.shared is not None:
+            self.args, self.kwargs = self.shared.load()
+            self.shared = None
+        return dispatch[self.method_id](*self.args, **self.kwargs)
+
+    def __repr__(self):
+        return f"Action({self.actor_key}, {self.method_id}, {self.action_id})"
+
+
+class Stop(object):
+    """Ask the actor with *actor_key* to stop.
+
+    The actor stops after handling the messages it got before this one,
+    or, if *now*, before any pending call (see actors.mailbox).
+    """
+    __slots__ = ('actor_key', 'now')
+
+    def __init__(self, actor_key, now=False):
+        self.actor_key = actor_key
+        self.now = now
+
+    def __reduce__(self):
+        return Stop, (self.actor_key, self.now)
+
+    def __repr__(self):
+        return f"Stop({self.actor_key}{', now' if self.now else ''})"
+
+
+class Restart(object):
+    """Ask the actor with *actor_key* to create its instance again, see
+    actors.supervision. It goes before any pending call."""
+    __slots__ = ('actor_key',)
+
+    def __init__(self, actor_key):
         self.actor_key = actor_key
-        self.method_name = method_name
-        self.refs = refs
-
-    def call(self, instance):
-        """Run this action on the *instance*"""
-        if self.refs:
-            args = list(self.args)
-            new_args = []
-            for arg in args:
-                if isinstance(arg, WeakRef):
-                    arg = ActorProxy._from_weak(arg)
-                new_args.append(arg)
-            self.args = tuple(new_args)
-            new_kwargs = {}
-            for key, value in self.kwargs:
-                if isinstance(value, WeakRef):
-                    value = ActorProxy._from_weak(value)
-                new_kwargs[key] = value
-            self.kwargs = new_kwargs
-        method = getattr(instance, self.method_name)
-        return method(*self.args, **self.kwargs)
+
+    def __reduce__(self):
+        return Restart, (self.actor_key,)
 
     def __repr__(self):
-        return f"Action({self.actor_key}, {self.method_name}, {self.action_id})"
+        return f"Restart({self.actor_key})"
 
 
 def enrich_class(cls):
@@ -360,6 +560,9 @@ def enrich_class(cls):
         def __thtr_stop_actor__(self):
             pass  # TODO: is it necessary here?
 
+    for method_name, function in registry.runtime_methods.items():
+        setattr(Class, method_name, function)
+
     Class.__module__ = cls.__module__
     Class.__name__ = cls.__name__
 
@@ -374,8 +577,75 @@ def enrich_class(cls):
     return Class
 
 
-def make_role_class(cls, class_id):
+# Steps of ActorGroup.reduce and allreduce, see actors.group. Instances
+# are of the original class, so they get these methods through
+# RoleInfo.bind.
+def _run_reduction(self, reduction, *args, **kwargs):
+    actors.group.run_reduction(self, reduction, args, kwargs)
+
+
+def _add_partial(self, reduction_id, child, result, error):
+    actors.group.add_partial(self, reduction_id, child, result, error)
+
+
+def _pass_down(self, reduction, result, error):
+    actors.group.pass_down(self, reduction, result, error)
+
+
+def _run_ring(self, plan, *args, **kwargs):
+    actors.group.run_ring(self, plan, args, kwargs)
+
+
+def _add_ring_part(self, reduction_id, step, part, error):
+    actors.group.add_ring_part(self, reduction_id, step, part, error)
+
+
+registry.runtime_methods.update({
+    '__thtr_reduce__': _run_reduction,
+    '__thtr_reduce_part__': _add_partial,
+    '__thtr_allreduce_result__': _pass_down,
+    '__thtr_ring__': _run_ring,
+    '__thtr_ring_part__': _add_ring_part,
+})
+
+
+def check_role_options(options):
+    size = options['mailbox_size']
+    if size is not None and (not isinstance(size, int) or size < 1):
+        raise ValueError(f"The mailbox_size must be a positive int or None, "
+                         f"not {size!r}")
+    if options['overflow'] not in OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown overflow policy {options['overflow']!r}, "
+                         f"valid policies are: {', '.join(OVERFLOW_POLICIES)}")
+    if options['pool'] is not None and not isinstance(options['pool'], str):
+        raise ValueError(f"The pool must be a name or None, not "
+                         f"{options['pool']!r}")
+    replicas, most = options['replicas'], options['max_replicas']
+    if replicas is not None and (isinstance(replicas, bool) or
+                                 not isinstance(replicas, int) or
+                                 replicas < 1):
+        raise ValueError(f"The replicas must be a positive int or None, "
+                         f"not {replicas!r}")
+    if most is not None and (replicas is None or isinstance(most, bool) or
+                             not isinstance(most, int) or most < replicas):
+        raise ValueError(f"The max_replicas must be an int of at least "
+                         f"replicas, or None, not {most!r}")
+    for name in ('checkpoint_every', 'checkpoint_interval', 'memory',
+                 'cpus'):
+        value = options[name]
+        if value is not None and (isinstance(value, bool) or
+                                  not isinstance(value, (int, float)) or
+                                  value <= 0):
+            raise ValueError(f"The {name} must be a positive number or "
+                             f"None, not {value!r}")
+
+
+def make_role_class(cls, class_id, **options):
     if class_id is None:
-        class_id = 'lithops:' + cls.__name__
+        class_id = f"lithops:{cls.__module__}.{cls.__qualname__}"
+    role_options = dict(ROLE_OPTIONS)
+    role_options.update(options)
+    check_role_options(role_options)
     Enriched = enrich_class(cls)
-    return RoleClass._thtr_from_enriched_class(Enriched, class_id)
+    return RoleClass._thtr_from_enriched_class(Enriched, class_id,
+                                                role_options)
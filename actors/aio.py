@@ -0,0 +1,167 @@
+import asyncio
+import inspect
+import itertools
+import logging
+import threading
+import time
+
+import actors
+from actors import activity
+from actors.batching import Batch
+from actors.mailbox import NORMAL, SYSTEM, classify, drop
+
+logger = logging.getLogger(__name__)
+
+
+def async_methods_of(actor_type):
+    """Names of the methods of *actor_type* defined with ``async def``."""
+    return frozenset(name for name, _ in inspect.getmembers(
+        actor_type, inspect.iscoroutinefunction))
+
+
+class EventLoopThread(object):
+    """An asyncio event loop running on its own daemon thread."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def run(self, coro):
+        """Run *coro* on the loop, returns a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class AsyncActor(object):
+    """Runs the messages of an actor that has ``async def`` methods.
+
+    Messages are taken by priority, in order within each class (see
+    actors.mailbox). Calls to async methods are started as
+    tasks, with at most *concurrency* of them running at the same time,
+    so an actor waiting on I/O can keep taking messages. Calls to the
+    other methods run right away on the loop, so they keep their order.
+    While the actor is failed (see actors.supervision) it only takes
+    system messages.
+    """
+
+    def __init__(self, cell, async_methods, concurrency, loop_thread):
+        self.cell = cell
+        self.async_methods = async_methods  # their method IDs
+        self.concurrency = concurrency
+        self.loop_thread = loop_thread
+        self.tasks = set()
+        self.mailbox = asyncio.PriorityQueue()
+        self.arrivals = itertools.count()  # keeps the order in a class
+        self.returns = itertools.count(-1, -1)  # for those put back
+        self.resumed = None  # set when the failed actor is restarted
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # with a bounded mailbox, submit waits for room here too
+        size = cell.mailbox.size
+        self.room = threading.Semaphore(size) if size else None
+        self.done = loop_thread.run(self._consume())
+
+    def submit(self, message):
+        """Give a message to the actor, can be called from any thread."""
+        if self.room is not None:
+            self.room.acquire()
+        self.loop_thread.call_soon(self._mailbox_put, message)
+
+    def stop(self, now=False):
+        """Wait until every message and running call is done.
+
+        Or, if *now*, only the running calls.
+        """
+        self.loop_thread.call_soon(self._put, SYSTEM if now else NORMAL,
+                                   None)
+        self.resume()
+        self.done.result()
+
+    def resume(self):
+        """Take messages again, after a restart."""
+        self.loop_thread.call_soon(self._resume)
+
+    def _resume(self):
+        if self.resumed is not None:
+            self.resumed.set()
+
+    def _mailbox_put(self, message):
+        for priority, item in classify(message, self.cell.mailbox.high_ids):
+            self._put(priority, item)
+
+    def _put(self, priority, message):
+        self.mailbox.put_nowait((priority, next(self.arrivals), message))
+
+    async def _consume(self):
+        while True:
+            priority, seq, message = await self.mailbox.get()
+            if self.cell.failed and priority != SYSTEM:
+                self.mailbox.put_nowait((priority, seq, message))
+                self.resumed = asyncio.Event()
+                await self.resumed.wait()
+                continue
+            if message is None:
+                break
+            if self.room is not None:
+                self.room.release()
+            actions = list(message) if isinstance(message, Batch) \
+                else [message]
+            for index, action in enumerate(actions):
+                if self.cell.credits is not None:
+                    self.cell.credits.settle(action)
+                if action.method_id in self.async_methods:
+                    await self.semaphore.acquire()
+                    task = asyncio.ensure_future(self._run_async(action))
+                    self.tasks.add(task)
+                    task.add_done_callback(self.tasks.discard)
+                else:
+                    actors.director.run_action(self.cell, action)
+                if self.cell.failed:
+                    # the rest wait for the restart
+                    for rest in reversed(actions[index + 1:]):
+                        self.mailbox.put_nowait(
+                            (priority, next(self.returns), rest))
+                    break
+            actors.director.flush()
+            if self.cell.checkpointer is not None and not self.cell.failed:
+                self.cell.checkpointer.handled(self.cell.instance,
+                                               len(actions))
+            # let the messages that just arrived into the mailbox, they
+            # may go before the ones we have
+            await asyncio.sleep(0)
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+        # left behind by a stop with now
+        left = []
+        while not self.mailbox.empty():
+            left.append(self.mailbox.get_nowait()[2])
+        drop(left, actors.director.stopped_error(self.cell.key))
+
+    async def _run_async(self, action):
+        metrics = actors.director.metrics
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            result = await action.call(self.cell.dispatch)
+        except Exception as e:
+            if action.reply_to is None:
+                actors.director.fail(self.cell, e, action)
+            else:
+                actors.director.send_reply(action, error=e)
+        else:
+            if action.reply_to is not None:
+                actors.director.send_reply(action, result)
+        finally:
+            if metrics is not None:
+                metrics.record(self.cell.key, action, started,
+                               time.perf_counter() - start)
+            activity.counters.add_handled()
+            self.semaphore.release()
+            actors.director.flush()
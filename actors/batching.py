@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+from actors.serialization import decode, drop_unreadable
+
+logger = logging.getLogger(__name__)
+
+
+class Batch(object):
+    """Several messages for the same actor sent with a single queue put."""
+    __slots__ = ('messages',)
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def __reduce__(self):
+        return Batch, (self.messages,)
+
+    def __iter__(self):
+        # actions of roles with a serializer travel encoded
+        for message in self.messages:
+            try:
+                yield decode(message)
+            except Exception as e:
+                drop_unreadable(message, e)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __repr__(self):
+        return f"Batch({len(self.messages)})"
+
+
+class Outbox(object):
+    """Messages waiting to be sent to one actor."""
+
+    def __init__(self):
+        self.messages = []
+        self.since = None  # time of the oldest message
+
+
+class Outboxes(object):
+    """Per-destination outboxes of a process.
+
+    Messages are kept until their outbox reaches *batch_size* messages,
+    until the oldest one is *batch_age_us* microseconds old, or until
+    they are flushed explicitly. *resolve* gives the queue of an actor
+    key.
+    """
+
+    def __init__(self, resolve, batch_size, batch_age_us):
+        self.resolve = resolve
+        self.batch_size = batch_size
+        self.max_age = batch_age_us / 1e6
+        self.boxes = {}
+        self.lock = threading.Lock()
+        self.running = True
+        self.flusher = threading.Thread(target=self._flush_old, daemon=True)
+        self.flusher.start()
+
+    def put(self, actor_key, msg):
+        with self.lock:
+            box = self.boxes.get(actor_key)
+            if box is None:
+                box = self.boxes[actor_key] = Outbox()
+            if not box.messages:
+                box.since = time.monotonic()
+            box.messages.append(msg)
+            if len(box.messages) >= self.batch_size:
+                self._send(actor_key, box)
+
+    def flush(self, actor_key=None):
+        """Send the pending messages to *actor_key*, or to everyone."""
+        with self.lock:
+            if actor_key is not None:
+                box = self.boxes.get(actor_key)
+                if box is not None:
+                    self._send(actor_key, box)
+                return
+            for key, box in self.boxes.items():
+                self._send_or_log(key, box)
+
+    def close(self):
+        self.running = False
+        self.flush()
+
+    def _send(self, actor_key, box):
+        if not box.messages:
+            return
+        # if the actor cannot be found, its messages wait in the box
+        queue = self.resolve(actor_key)
+        messages, box.messages = box.messages, []
+        box.since = None
+        if len(messages) == 1:
+            queue.put(messages[0])
+        else:
+            queue.put(Batch(messages))
+
+    def _send_or_log(self, actor_key, box):
+        # the other boxes are still sent
+        try:
+            self._send(actor_key, box)
+        except Exception as e:
+            logger.error(f"Could not send {len(box.messages)} messages to "
+                         f"{actor_key}: {e!r}")
+
+    def _flush_old(self):
+        while self.running:
+            time.sleep(self.max_age)
+            now = time.monotonic()
+            with self.lock:
+                for key, box in self.boxes.items():
+                    if box.since is None or now - box.since < self.max_age:
+                        continue
+                    self._send_or_log(key, box)
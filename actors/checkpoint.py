@@ -0,0 +1,186 @@
+"""Checkpoints of the state of actors, to survive the loss of a process.
+
+Enabled per role with ``@actors.remote(checkpoint_every=n)``, to save
+the state of each actor after every *n* calls, and/or
+``checkpoint_interval=seconds``, to save it after a call once that time
+has passed since the last save. Actors also save it when stopped.
+Checkpoints go to the local directory in the ``checkpoint_dir`` option
+of :func:`actors.start`, one directory per actor key.
+
+The state is the ``__dict__`` of the actor, or what its
+``__getstate__`` returns. Each field is pickled on its own, and only the
+fields whose pickle changed since the last save are written again, so a
+large model that did not change is not rewritten. A manifest lists the
+files of the last complete checkpoint and is replaced atomically, so a
+process that dies while saving leaves the previous one intact. Fields
+that cannot be pickled are skipped.
+
+An actor created again under the same key, with ``Role.respawn(key)``,
+runs its ``__init__`` and then gets the fields of its last checkpoint
+back (or they are given to its ``__setstate__``).
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+from urllib.parse import quote
+
+import cloudpickle
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.pkl'
+# Set on every actor by the runtime, see actors.director.create_instance.
+RUNTIME_FIELDS = ('class_id', 'proxy', 'key')
+
+
+def default_directory():
+    return os.path.join(tempfile.gettempdir(), 'lithops-actors-checkpoints')
+
+
+def has_custom(instance, name):
+    return getattr(type(instance), name, None) is not \
+        getattr(object, name, None)
+
+
+def state_of(instance):
+    """The fields of *instance* to save, by name."""
+    if has_custom(instance, '__getstate__'):
+        return instance.__getstate__()
+    return {name: value for name, value in vars(instance).items()
+            if name not in RUNTIME_FIELDS and not name.startswith('_thtr')}
+
+
+def pickled_state(instance):
+    """The fields of *instance* to save, each pickled on its own, by
+    name, and the errors of the ones that cannot be pickled."""
+    pickled, errors = {}, {}
+    for name, value in state_of(instance).items():
+        try:
+            pickled[name] = cloudpickle.dumps(value, protocol=5)
+        except Exception as e:
+            errors[name] = e
+    return pickled, errors
+
+
+def set_state(instance, state):
+    """Give *instance* the fields in *state*, or give them to its
+    ``__setstate__``."""
+    if has_custom(instance, '__setstate__'):
+        instance.__setstate__(state)
+    else:
+        instance.__dict__.update(state)
+
+
+def load_state(instance, pickled):
+    """Give *instance* the fields that pickled_state gave."""
+    set_state(instance, {name: pickle.loads(data)
+                         for name, data in pickled.items()})
+
+
+class Checkpointer(object):
+    """Saves and restores the state of the actor with *actor_key*, in
+    *directory*.
+
+    A checkpoint is due after *every* calls, or after a call *interval*
+    seconds after the last one, when they are given.
+    """
+
+    def __init__(self, directory, actor_key, every=None, interval=None):
+        self.path = os.path.join(directory, quote(actor_key, safe=''))
+        self.every = every
+        self.interval = interval
+        self.calls = 0  # since the last checkpoint
+        self.saved_at = time.monotonic()
+        self.unpicklable = set()  # fields we already warned about
+        manifest = self._read_manifest()
+        self.seq = manifest['seq'] if manifest else 0
+        self.fields = manifest['fields'] if manifest else {}
+
+    def restore(self, instance):
+        """Give *instance* the state of the last checkpoint, if any."""
+        if not self.fields:
+            return False
+        state = {}
+        for name, (filename, _) in self.fields.items():
+            with open(os.path.join(self.path, filename), 'rb') as f:
+                state[name] = pickle.load(f)
+        set_state(instance, state)
+        logger.debug(f"Restored checkpoint {self.seq} of {self.path}")
+        return True
+
+    def handled(self, instance, calls=1):
+        """Account *calls* handled by *instance*, save it if due."""
+        self.calls += calls
+        if self.every is not None and self.calls >= self.every:
+            self.save(instance)
+        elif self.interval is not None and \
+                time.monotonic() - self.saved_at >= self.interval:
+            self.save(instance)
+
+    def save(self, instance):
+        """Write the fields of *instance* that changed since the last
+        checkpoint, and a manifest with all of them."""
+        self.calls = 0
+        self.saved_at = time.monotonic()
+        os.makedirs(self.path, exist_ok=True)
+        seq = self.seq + 1
+        fields = {}
+        written = 0
+        pickled, errors = pickled_state(instance)
+        for name, e in errors.items():
+            if name not in self.unpicklable:
+                self.unpicklable.add(name)
+                logger.warning(f"Not checkpointing field '{name}' of "
+                               f"{self.path}: {e}")
+        for index, (name, data) in enumerate(pickled.items()):
+            digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+            previous = self.fields.get(name)
+            if previous is not None and previous[1] == digest:
+                fields[name] = previous
+                continue
+            filename = f'{seq}.{index}.pkl'
+            with open(os.path.join(self.path, filename), 'wb') as f:
+                f.write(data)
+            fields[name] = (filename, digest)
+            written += 1
+        self._write_manifest({'seq': seq, 'fields': fields})
+        # the files only the previous checkpoint used
+        kept = {filename for filename, _ in fields.values()}
+        for filename, _ in self.fields.values():
+            if filename not in kept:
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except OSError:
+                    pass
+        self.seq = seq
+        self.fields = fields
+        logger.debug(f"Checkpoint {seq} of {self.path}: {written} of "
+                     f"{len(fields)} fields written")
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        path = os.path.join(self.path, MANIFEST)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+
+def make_checkpointer(actor_key, role_options, directory):
+    """The Checkpointer of an actor, or None if its role has none."""
+    every = role_options['checkpoint_every']
+    interval = role_options['checkpoint_interval']
+    if every is None and interval is None:
+        return None
+    return Checkpointer(directory or default_directory(), actor_key, every,
+                        interval)
@@ -0,0 +1,65 @@
+"""Runtime options, given as keyword arguments to :func:`actors.start`.
+
+The director ships them to every actor process, so that both the driver
+and the actors follow the same settings.
+"""
+
+DEFAULTS = {
+    # Max number of messages coalesced into a single queue put.
+    # A value of 1 disables batching.
+    'batch_size': 1,
+    # Max time (in microseconds) a message waits in a batch before it is
+    # sent, regardless of the batch size.
+    'batch_age_us': 1000,
+    # Number of worker processes that host all the actors, each worker
+    # runs many of them. With 0, every actor gets its own process.
+    'workers': 0,
+    # More workers, in named pools, as {name: number of workers}, for the
+    # actors of the roles with that pool, see actors.placement.
+    'pools': None,
+    # Memory (MB) and CPUs of each worker, for the actors of the roles
+    # that say what they need. None for no limit.
+    'worker_memory': None,
+    'worker_cpus': None,
+    # Buffers in action arguments of at least this many bytes (e.g. NumPy
+    # arrays) are sent through shared memory, see actors.shm.
+    # 0 disables it.
+    'shm_threshold': 0,
+    # Collect per-actor and per-method metrics, see actors.metrics.
+    'metrics': False,
+    # Seconds between the metrics snapshots published by each process.
+    'metrics_interval': 1.0,
+    # File where the director appends a JSON line with all the metrics
+    # every metrics_interval seconds. None disables it.
+    'metrics_dump': None,
+    # Send messages through direct channels between processes when
+    # possible, instead of through the queues, see actors.peers.
+    'peer_channels': False,
+    # Address the processes listen on for those channels. It must be
+    # reachable by all of them.
+    'peer_host': '127.0.0.1',
+    # Local directory for the checkpoints of the actors, see
+    # actors.checkpoint. None for one in the temporary directory.
+    'checkpoint_dir': None,
+    # Number of shards of the directory of the actors, each served by a
+    # manager of its own, see actors.directory. More spread the lookups
+    # of many processes, at the cost of a manager process each.
+    'directory_shards': 1,
+    # Number of shards that keep each entry of the directory, so that it
+    # survives the loss of a shard.
+    'directory_replicas': 1,
+    # Seconds between the reports of the mailbox depths of the replicas
+    # of replica sets, and between the reads of the senders that route
+    # calls after them, see actors.replicas.
+    'replica_interval': 0.2,
+}
+
+
+def make_config(**options):
+    for key in options:
+        if key not in DEFAULTS:
+            raise TypeError(f"Unknown option '{key}' for actors.start(), "
+                            f"valid options are: {', '.join(DEFAULTS)}")
+    config = dict(DEFAULTS)
+    config.update(options)
+    return config
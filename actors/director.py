@@ -1,38 +1,376 @@
 import logging
+import os
+import queue as local_queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import lithops.multiprocessing as mp
 
-actor_directory = {}
+from actors import activity, registry, replicas, shm
+from actors.actor import Restart, Stop, action_ids
+from actors.activity import IdleDetector, Probe
+from actors.aio import AsyncActor, EventLoopThread, async_methods_of
+from actors.batching import Batch, Outboxes
+from actors.checkpoint import load_state, make_checkpointer, pickled_state
+from actors.config import make_config
+from actors.directory import DirectoryManager, ShardedDirectory
+from actors.future import ReplyChannel
+from actors.mailbox import (NORMAL, SYSTEM, ActorStopped, Mailbox,
+                            BoundedQueue, high_priority_methods_of)
+from actors.metrics import Dumper, Metrics, stamp
+from actors.migration import Drain, Migrate, Migrated, Reroute
+from actors.peers import PeerDirectory, PeerListener, Peers, Switch
+from actors.placement import (Placer, check_pool, hashed_worker,
+                              worker_pools)
+from actors.replicas import Autoscaler, ReplicaBoard
+from actors.scheduler import ActorCell, Scheduler, Spawn, Spawned
+from actors.serialization import (copy_message, decode, drop_unreadable,
+                                  sendable_error)
+from actors.supervision import Failure, Supervision, Watcher
+
+# the queues of the actors, in the processes that run actors, see
+# actors.directory
+actor_directory = None
+# process-local cache of the queues resolved from the actor_directory,
+# so that only the first message to each actor hits the directory
+directory_cache = {}
+
+# where the results of the future calls made by this process arrive
+reply_channel = None
+# runtime options of this process, see actors.config
+config = make_config()
+# per-destination outboxes, only when batching is enabled
+outboxes = None
+# event loop of this process, started for the first async actor
+event_loop = None
+# metrics of the actors run by this process, only when enabled
+metrics = None
+# channels to other processes, and the listener for the channels from
+# them, only when peer channels are enabled, see actors.peers
+peers = None
+listener = None
+# what this process got from the director, when it runs actors
+runtime = None
+# in a worker: its index, the keys of the actors it hosts that the
+# calls from here go to directly, and its inbox, see worker_process
+worker_index = None
+local_keys = None
+local_inbox = None
+# the queue of the worker of each actor that left this process, where
+# what comes for it goes on, see actors.migration
+moved_actors = {}
+# the routes of this process to the actors that moved, while the calls
+# it sent them by the old one drain, see actors.migration
+reroutes = {}
+
+# max number of actor processes started at the same time
+MAX_STARTING = 32
+# seconds the processes have to end on shutdown, even when the actors
+# were busy until the timeout
+STOP_GRACE = 1
+# seconds the processes still running then have to end once terminated,
+# before they are killed
+KILL_GRACE = 1
 
 logger = logging.getLogger(__name__)
 
 
-def send_stop(actor_key):
-    if actor_directory:
+def get_reply_channel():
+    """Return the reply channel of this process, creating it if needed."""
+    global reply_channel
+    if reply_channel is None or reply_channel.pid != os.getpid():
+        reply_channel = ReplyChannel(mp.Queue())
+    return reply_channel
+
+
+def lookup_queue(actor_key):
+    """Return the queue of the actor with *actor_key*.
+
+    The queue is resolved from the (sharded) directory only the first
+    time, and kept in a process-local cache afterwards.
+    """
+    try:
+        return directory_cache[actor_key]
+    except KeyError:
+        queue = actor_directory[actor_key]
+        directory_cache[actor_key] = queue
+        return queue
+
+
+def forget_queue(actor_key):
+    """Drop the cached queue of *actor_key*, if any."""
+    if runtime is not None:
+        directory_cache.pop(actor_key, None)
+    elif global_director is not None:
+        global_director.queues.pop(actor_key, None)
+
+
+def prefetch(actor_keys):
+    """Resolve the queues of the *actor_keys* not cached yet, with a
+    single lookup per shard of the directory."""
+    if runtime is not None:
+        missing = [key for key in actor_keys if key not in directory_cache]
+        if missing:
+            directory_cache.update(actor_directory.get_many(missing))
+    elif global_director is not None:
+        global_director.lookup_many(actor_keys)
+
+
+def resolve_queue(actor_key):
+    if runtime is not None:
         # we are on a subprocess, we have the directory
-        actor_directory[actor_key].put('pls stop')
+        return lookup_queue(actor_key)
     else:
         # we are on the main process, where the director exists
+        return global_director.lookup(actor_key)
+
+
+def resolve(actor_key):
+    """Where to put the messages for *actor_key*.
+
+    A direct channel to its process if we can reach it, or its queue,
+    or the messages wait while it moves to another worker.
+    """
+    reroute = reroutes.get(actor_key)
+    if reroute is not None:
+        return reroute
+    return resolve_route(actor_key)
+
+
+def resolve_route(actor_key):
+    if peers is not None:
+        route = peers.route(actor_key, resolve_queue)
+        if route is not None:
+            return route
+    return resolve_queue(actor_key)
+
+
+def forget_route(actor_key):
+    forget_queue(actor_key)
+    if peers is not None:
+        peers.forget(actor_key)
+
+
+def has_route(actor_key):
+    """Whether this process kept a route to *actor_key*."""
+    if peers is not None and actor_key in peers.routes:
+        return True
+    if runtime is not None:
+        return actor_key in directory_cache
+    return global_director is not None and actor_key in global_director.queues
+
+
+def reroute(actor_key):
+    """Take the new route to *actor_key*, that moved to another worker,
+    once what this process sent by the old one has reached it, see
+    actors.migration."""
+    if actor_key in reroutes or not has_route(actor_key):
+        return
+    old = resolve_route(actor_key)
+    reroutes[actor_key] = Reroute(actor_key, resolve_route)
+    channel = get_reply_channel()
+    drain = Drain(actor_key, channel.queue, next(action_ids))
+    channel.register(drain.action_id).add_done_callback(
+        lambda _: rerouted(actor_key))
+    try:
+        old.put(drain)
+    except Exception as e:
+        logger.warning(f"Could not drain the route to {actor_key}: {e!r}")
+        rerouted(actor_key)
+
+
+def rerouted(actor_key):
+    forget_route(actor_key)
+    # released before it is dropped, so nothing overtakes what it held
+    reroutes[actor_key].release()
+    del reroutes[actor_key]
+
+
+def enable_batching():
+    global outboxes
+    outboxes = None
+    if config['batch_size'] > 1:
+        outboxes = Outboxes(resolve, config['batch_size'],
+                            config['batch_age_us'])
+
+
+def flush(actor_key=None):
+    """Send now the batched messages to *actor_key*, or to all actors."""
+    if outboxes is not None:
+        outboxes.flush(actor_key)
+
+
+def send_stop(actor_key, now=False):
+    # the stop goes after anything we batched for that actor
+    flush(actor_key)
+    if local_keys is not None and actor_key in local_keys:
+        # after the calls from here, that went right to the inbox
+        local_inbox.put(Stop(actor_key, now))
+    elif runtime is not None:
+        resolve(actor_key).put(Stop(actor_key, now))
+        forget_route(actor_key)
+    else:
         global global_director
-        global_director.msg2(actor_key, 'pls stop')
+        global_director.msg2(actor_key, Stop(actor_key, now))
 
 
 def send_action(action):
-    if actor_directory:
+    if config['metrics']:
+        stamp(action)
+    if config['shm_threshold'] and action.shared is None:
+        action.share_args(config['shm_threshold'])
+    try:
+        put_action(action)
+    except BaseException:
+        if action.shared is not None:
+            action.shared.release()  # nobody will load it
+        raise
+    activity.counters.add_sent()
+
+    return None
+
+
+def put_action(action):
+    message = action if action.serializer is None else action.encode()
+    if local_keys is not None and action.actor_key in local_keys:
+        # hosted by this worker, the call does not leave the process
+        local_inbox.put(copy_message(message))
+        activity.counters.add_received([action])
+    elif outboxes is not None and \
+            not isinstance(resolve_queue(action.actor_key), BoundedQueue):
+        outboxes.put(action.actor_key, message)
+    elif runtime is not None:
         # we are on a subprocess, we have the director queue
-        actor_directory[action.actor_key].put(action)
+        resolve(action.actor_key).put(message)
     else:
         # we are on the main process, where the director exists
         global global_director
-        global_director.msg2(action.actor_key, action)
+        global_director.msg2(action.actor_key, message)
         # print(f"Put action {action}")
 
-    return None
+
+def send_reply(action, result=None, error=None):
+    if error is not None:
+        error = sendable_error(error)
+    try:
+        action.reply_to.put((action.action_id, result, error))
+    except (EOFError, OSError):
+        # the caller is gone, nobody waits for the reply
+        logger.debug(f"Could not reply to action {action.action_id}")
+    except Exception as e:
+        # the result cannot be pickled, the caller gets why instead
+        logger.error(f"Could not send the result of action "
+                     f"{action.action_id}: {e!r}")
+        action.reply_to.put((action.action_id, None, RuntimeError(repr(e))))
+
+
+def run_action(cell, action):
+    if metrics is None:
+        call_action(cell, action)
+    else:
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            call_action(cell, action)
+        finally:
+            metrics.record(cell.key, action, started,
+                           time.perf_counter() - start)
+    activity.counters.add_handled()
 
 
-def actor_process(actor_type, weak_ref,
-                  queue, directory, event,
-                  args, kwargs):
+def call_action(cell, action):
+    try:
+        result = action.call(cell.dispatch)
+    except Exception as e:
+        if action.reply_to is None:
+            fail(cell, e, action)
+        else:
+            send_reply(action, error=e)
+    else:
+        if action.reply_to is not None:
+            send_reply(action, result)
+
+
+def run_message(cell, message):
+    if isinstance(message, Batch):
+        actions = list(message)
+        for index, action in enumerate(actions):
+            run_action(cell, action)
+            if cell.failed:
+                # the rest wait for the restart
+                cell.mailbox.put_back(actions[index + 1:])
+                break
+    else:
+        run_action(cell, message)
+    # what we sent while handling this message should not wait more
+    flush()
+    if cell.checkpointer is not None and not cell.failed:
+        cell.checkpointer.handled(cell.instance, len(message)
+                                  if isinstance(message, Batch) else 1)
+
+
+def fail(cell, error, action=None):
+    """The actor of *cell* failed with *error*, it takes no more calls
+    until it is restarted, see actors.supervision."""
+    running = f" running {action}" if action is not None else ""
+    logger.error(f"Actor {cell.key} failed{running}", exc_info=error)
+    cell.failed = True
+    if runtime is not None:
+        error = ''.join(traceback.format_exception(
+            type(error), error, error.__traceback__))
+        runtime.events.put(Failure(cell.key, error))
+
+
+def init_cell(cell, state=None, missing=()):
+    """Create the instance of *cell* from its spec, with its last
+    checkpoint if it has one.
+
+    An actor that moved here gets its pickled *state* instead, and its
+    ``__init__`` only runs for the *missing* fields that could not be
+    pickled, see actors.migration.
+    """
+    actor_type, weak_ref, args, kwargs = cell.spec
+    try:
+        cell.instance = create_instance(actor_type, weak_ref, args, kwargs,
+                                        init=state is None or bool(missing))
+        cell.dispatch = registry.lookup(weak_ref._thtr_class_id).bind(
+            cell.instance)
+        if state is not None:
+            load_state(cell.instance, state)
+        elif cell.checkpointer is not None:
+            cell.checkpointer.restore(cell.instance)
+    except Exception as e:
+        fail(cell, e)
+        return
+    cell.failed = False
+
+
+def restart_cell(cell):
+    logger.info(f"Restarting actor {cell.key}")
+    init_cell(cell)
+    if cell.async_actor is not None:
+        cell.async_actor.resume()
+
+
+def stopped_error(actor_key):
+    return ActorStopped(f"Actor {actor_key} stopped before running the "
+                        "call")
+
+
+def stop_cell(cell):
+    """Clean up after the actor of *cell*, that just stopped."""
+    if cell.checkpointer is not None and not cell.failed:
+        cell.checkpointer.save(cell.instance)
+    if metrics is not None:
+        metrics.remove_actor(cell.key)
+    if listener is not None:
+        listener.unpublish(cell.key)
+    replicas.untrack(cell.key)
+
+
+def create_instance(actor_type, weak_ref, args, kwargs, init=True):
     # Create an instance without __init__ called.
     actor_class = actor_type
     actor_instance = actor_class.__new__(actor_class)
@@ -40,41 +378,719 @@ def actor_process(actor_type, weak_ref,
     actor_instance.proxy = weak_ref.build_proxy()
 
     actor_instance.key = weak_ref._thtr_actor_key
-    actor_instance.__init__(*args, **kwargs)
-    global actor_directory
-    actor_directory = directory
+    if init:
+        actor_instance.__init__(*args, **kwargs)
+    return actor_instance
+
+
+def high_method_ids(actor_type, role):
+    """The IDs of the methods of *actor_type* with high priority, see
+    actors.mailbox."""
+    return frozenset(role.method_ids[name]
+                     for name in high_priority_methods_of(actor_type)
+                     if name in role.method_ids)
+
+
+def create_cell(actor_type, weak_ref, args, kwargs, role_options,
+                depth=None, mailbox=None, failed=False, state=None,
+                missing=()):
+    """Create the actor and its cell.
+
+    *depth* returns the number of messages waiting for the actor outside
+    of the cell, for the metrics. The cell gets a new mailbox unless one
+    is given. If the actor *failed* before, the cell waits for a restart
+    to create it. An actor that moved brings its *state*, see init_cell.
+    """
+    role = registry.lookup(weak_ref._thtr_class_id)
+    high_ids = high_method_ids(actor_type, role)
+    cell = ActorCell(weak_ref._thtr_actor_key, None, None, high_ids)
+    cell.spec = (actor_type, weak_ref, args, kwargs)
+    cell.role_options = role_options
+    cell.checkpointer = make_checkpointer(cell.key, role_options,
+                                          config['checkpoint_dir'])
+    if mailbox is not None:
+        mailbox.high_ids = high_ids
+        cell.mailbox = mailbox
+    if failed:
+        cell.failed = True
+    else:
+        init_cell(cell, state, missing)
+    cell.async_actor = make_async_actor(actor_type, cell, role, role_options)
+    if metrics is not None:
+        metrics.add_actor(cell.key, role.method_names,
+                          mailbox_depth(cell, depth))
+    if role_options.get('replica_of') is not None:
+        replicas.track(cell.key, mailbox_depth(cell, depth))
+    return cell
+
+
+def move_cell(cell, worker, pending, queue=None):
+    """Send the actor of *cell* to the *worker* at that index, with the
+    *pending* messages of its mailbox, and its own *queue* if it has one,
+    see actors.migration."""
+    pickled, errors = pickled_state(cell.instance)
+    for name, e in errors.items():
+        logger.warning(f"Not moving field '{name}' of actor {cell.key}: {e}")
+    activity.counters.hand_over(pending)
+    actor_type, weak_ref, args, kwargs = cell.spec
+    worker_queue = moved_actors[cell.key] = runtime.workers[worker]
+    worker_queue.put(Spawn(actor_type, weak_ref, args, kwargs,
+                           cell.role_options, pickled, pending, queue,
+                           tuple(errors)))
+    # after the spawn, so the calls that come that way find the actor
+    actor_directory[cell.key] = worker_queue
+    directory_cache[cell.key] = worker_queue
+    runtime.events.put(Migrated(cell.key, worker))
+    logger.info(f"Moved actor {cell.key} to worker {worker}")
+
+
+def mailbox_depth(cell, depth=None):
+    def measure():
+        pending = len(cell.mailbox)
+        if depth is not None:
+            pending += depth()
+        if cell.async_actor is not None:
+            pending += cell.async_actor.mailbox.qsize()
+        return pending
+    return measure
+
+
+def make_async_actor(actor_type, cell, role, role_options):
+    """Wrap the cell in an AsyncActor if its role has async methods."""
+    global event_loop
+    async_methods = async_methods_of(actor_type)
+    if not async_methods:
+        return None
+    if event_loop is None:
+        event_loop = EventLoopThread()
+    async_ids = frozenset(role.method_ids[name] for name in async_methods
+                          if name in role.method_ids)
+    return AsyncActor(cell, async_ids, role_options['concurrency'],
+                      event_loop)
+
+
+class Runtime(object):
+    """What the director gives to every process that runs actors.
+
+    The *directory* of the queues of the actors and the *roles*, shared by
+    all, the queues of the *workers* and their *pools* (see
+    actors.placement), the queues for the *events* of
+    actors.supervision and the *reports* of actors.activity, the
+    *metrics_board* and *peer_directory* (or None if disabled) and the
+    *config*, the *replica_board* of actors.replicas and the
+    *shm_prefix* of the names of the shared memory segments, see
+    actors.shm.
+    """
+
+    def __init__(self, directory, roles, workers, pools, events, reports,
+                 metrics_board, peer_directory, config, replica_board,
+                 shm_prefix):
+        self.directory = directory
+        self.roles = roles
+        self.workers = workers
+        self.pools = pools
+        self.events = events
+        self.reports = reports
+        self.metrics_board = metrics_board
+        self.peer_directory = peer_directory
+        self.config = config
+        self.replica_board = replica_board
+        self.shm_prefix = shm_prefix
+
+
+def set_up_process(process_runtime, inbox=None):
+    """Set up a process that runs actors.
+
+    With peer channels, the messages that come through them are put on
+    the *inbox*.
+    """
+    global actor_directory, config, metrics, peers, listener, runtime
+    global global_director
+    # even when forked from the driver, the director is not here
+    global_director = None
+    runtime = process_runtime
+    actor_directory = runtime.directory
+    activity.set_up(runtime.reports)
+    registry.shared_roles = runtime.roles
+    config = runtime.config
+    enable_batching()
+    replicas.set_up(runtime.replica_board, config['replica_interval'])
+    shm.set_up(runtime.shm_prefix)
+    if config['metrics']:
+        metrics = Metrics(runtime.metrics_board, config['metrics_interval'])
+    if runtime.peer_directory is not None:
+        peers = Peers(runtime.peer_directory)
+        listener = PeerListener(runtime.peer_directory, config['peer_host'],
+                                lambda message: take_in(inbox, message))
+
+
+def take_in(inbox, message):
+    """Put a *message* that came to this process on the *inbox*."""
+    activity.counters.add_received([message])
+    inbox.put(message)
+
+
+def make_queues(actor_type, weak_refs, role_options):
+    """The queues for new actors of *actor_type* with a process of their
+    own, by actor key."""
+    size = role_options['mailbox_size']
+    overflow = role_options['overflow']
+    queues = {weak_ref._thtr_actor_key: mp.Queue()
+              for weak_ref in weak_refs}
+    if size and overflow in ('block', 'raise'):
+        # the senders wait or raise for credits, see actors.mailbox
+        role = registry.lookup(weak_refs[0]._thtr_class_id)
+        high_ids = high_method_ids(actor_type, role)
+        queues = {key: BoundedQueue(queue, mp.Semaphore(size), key,
+                                    high_ids, overflow == 'raise')
+                  for key, queue in queues.items()}
+    return queues
+
+
+def start_actor_processes(process_runtime, actor_type, weak_refs, queues,
+                          args, kwargs, role_options):
+    """Start a process for each actor, with the queue in *queues*."""
+    processes = [
+        mp.Process(target=actor_process,
+                   args=(actor_type, weak_ref,
+                         queues[weak_ref._thtr_actor_key], process_runtime,
+                         args, kwargs, role_options))
+        for weak_ref in weak_refs
+    ]
+    if len(processes) == 1:
+        processes[0].start()
+    else:
+        with ThreadPoolExecutor(min(len(processes),
+                                    MAX_STARTING)) as executor:
+            list(executor.map(lambda ps: ps.start(), processes))
+    return processes
+
+
+def spawn_actors(actor_type, weak_refs, args, kwargs, role_options):
+    """Create actors from a process that runs actors.
+
+    They are registered in the directory from here, without waiting for
+    the driver, and hosted by the workers (see actors.placement for
+    which) or started in processes of their own, like the director does.
+    The director learns about them afterwards, through a Spawned event.
+    """
+    spawns = [Spawn(actor_type, weak_ref, args, kwargs, role_options)
+              for weak_ref in weak_refs]
+    check_pool(role_options, runtime.pools)
+    colocate = role_options.get('colocate')
+    placement = {}
+    if role_options['mailbox_size'] is None:
+        for spawn in spawns:
+            if local_keys is not None and colocate in local_keys:
+                worker = worker_index
+            else:
+                worker = hashed_worker(spawn.actor_key, runtime.pools,
+                                       role_options['pool'])
+            if worker is not None:
+                placement[spawn.actor_key] = worker
+    if placement:
+        senders = {key: runtime.workers[worker]
+                   for key, worker in placement.items()}
+        actor_directory.update(senders)  # a single round trip per shard
+        runtime.events.put(Spawned(spawns, {}, placement))
+        for spawn in spawns:
+            key = spawn.actor_key
+            if placement[key] == worker_index:
+                # the calls from here go after the spawn, in the inbox
+                local_keys.add(key)
+                local_inbox.put(spawn)
+            else:
+                directory_cache[key] = senders[key]
+                senders[key].put(spawn)
+        return []
+    queues = make_queues(actor_type, weak_refs, role_options)
+    actor_directory.update(queues)
+    directory_cache.update(queues)
+    runtime.events.put(Spawned(spawns, queues, {}))
+    return start_actor_processes(runtime, actor_type, weak_refs, queues,
+                                 args, kwargs, role_options)
+
+
+def actor_process(actor_type, weak_ref, queue, process_runtime, args, kwargs,
+                  role_options):
+    # messages from the queue (and the channels) go to the mailbox, where
+    # they are taken by priority, see actors.mailbox
+    credits = queue if isinstance(queue, BoundedQueue) else None
+    mailbox = Mailbox(size=None if credits else role_options['mailbox_size'],
+                      overflow=role_options['overflow'])
+    set_up_process(process_runtime, mailbox)
+    cell = create_cell(actor_type, weak_ref, args, kwargs, role_options,
+                       depth=queue.qsize, mailbox=mailbox)
+    cell.credits = credits
+    async_actor = cell.async_actor
+    threading.Thread(target=pump, args=(queue, mailbox, True),
+                     daemon=True).start()
+    moved = False
+    # the senders take credits to put calls on the queue
+    if listener is not None and not (role_options['mailbox_size'] and
+                                     role_options['overflow'] in
+                                     ('block', 'raise')):
+        listener.publish(cell.key)
 
-    event.set()  # tell father i'm ready
     while True:
-        action = queue.get()
+        # a failed actor only takes system messages
+        action = mailbox.get(SYSTEM if cell.failed else NORMAL)
         # print(action)
-        if action == 'pls stop':
+        if isinstance(action, Stop):
             logger.debug(f"Stopping actor {weak_ref._thtr_actor_key}")
+            if async_actor is not None:
+                async_actor.stop(action.now)
+            stop_cell(cell)
+            break
+        if isinstance(action, Migrate):
+            if not cell.failed:
+                stop_cell(cell)
+                move_cell(cell, action.worker, mailbox.take_all(), queue)
+                moved = True
+                break
+            logger.warning(f"Actor {cell.key} failed, not moving it")
+            # the queue stopped at the Migrate
+            threading.Thread(target=pump, args=(queue, mailbox, True),
+                             daemon=True).start()
+        elif isinstance(action, Restart):
+            restart_cell(cell)
+        elif async_actor is not None:
+            async_actor.submit(action)
+        else:
+            if credits is not None:
+                credits.settle(action)
+            run_message(cell, action)
+    if outboxes is not None:
+        outboxes.close()
+    if not moved:
+        forget_route(weak_ref._thtr_actor_key)
+    # the calls after the stop are lost
+    mailbox.clear(stopped_error(cell.key))
+    activity.counters.report(actor_key=weak_ref._thtr_actor_key)
+
+
+def pump(queue, inbox, single_actor=False):
+    """Move everything from the (remote) *queue* to the local *inbox*.
+
+    Until a 'pls stop', or a Stop or a Migrate for the queue of a
+    *single_actor*, after which the queue is for another process.
+    """
+    while True:
+        try:
+            data = queue.get()
+        except (EOFError, OSError):
+            # the director is gone, nobody can send through the queue
+            logger.debug("Queue closed")
+            break
+        except Exception as e:
+            # only this message is lost, the next ones can be loaded
+            drop_unreadable(None, e)
+            continue
+        try:
+            message = decode(data)
+        except Exception as e:
+            if isinstance(queue, BoundedQueue):
+                queue.lost(data)
+            drop_unreadable(data, e)
+            continue
+        if isinstance(queue, BoundedQueue):
+            queue.arrived(data, message)
+        if isinstance(message, Switch):
+            forward = moved_actors.get(message.actor_key)
+            if forward is None:
+                listener.switched(message)
+            else:
+                # the channel is to the worker the actor moved to
+                forward.put(message)
+            continue
+        if isinstance(message, Probe):
+            activity.counters.report(message.wave)
+            continue
+        if isinstance(message, Migrated):
+            reroute(message.actor_key)
+            continue
+        take_in(inbox, message)
+        if message == 'pls stop' or \
+                (single_actor and isinstance(message, (Stop, Migrate))):
+            break
+
+
+def worker_process(queue, process_runtime, index, hosted=(), moved=()):
+    """Host many actors in this process, see actors.scheduler.
+
+    This is the worker at *index* in the runtime. When it replaces a
+    worker that died, *hosted* has the Spawn messages of the actors of
+    that worker, that wait here for a restart, and *moved* the
+    ``(actor_key, queue)`` of those that left it, see actors.migration.
+    """
+    global worker_index, local_keys, local_inbox
+    # a thread keeps reading the queue, so we can see new messages
+    # without blocking when there is work to do
+    inbox = local_queue.Queue()
+    set_up_process(process_runtime, inbox)
+
+    def handle(cell, message):
+        if isinstance(message, Stop):
+            logger.debug(f"Stopping actor {cell.key}")
+            scheduler.remove(cell.key)
+            local_keys.discard(cell.key)
+            cell.mailbox.clear(stopped_error(cell.key))
+            forget_route(cell.key)
+            if cell.async_actor is not None:
+                cell.async_actor.stop(message.now)
+            stop_cell(cell)
+        elif isinstance(message, Migrate):
+            migrate_cell(cell, message.worker)
+        elif isinstance(message, Restart):
+            restart_cell(cell)
+        elif cell.async_actor is not None:
+            # async actors run on the event loop of this worker
+            cell.async_actor.submit(message)
+        else:
+            run_message(cell, message)
+
+    def migrate_cell(cell, worker):
+        if cell.failed or worker == worker_index:
+            logger.warning(f"Not moving actor {cell.key} to worker {worker}, "
+                           f"it failed or is there already")
+            return
+        scheduler.remove(cell.key)
+        local_keys.discard(cell.key)
+        stop_cell(cell)
+        move_cell(cell, worker, cell.mailbox.take_all())
+
+    def arrive(cell, spawn):
+        # an actor moved here, see actors.migration
+        activity.counters.add_received(spawn.pending)
+        for message in spawn.pending:
+            cell.mailbox.append(message)
+        if spawn.queue is not None:
+            # its own queue, the calls that were on their way to it
+            threading.Thread(target=pump, args=(spawn.queue, inbox),
+                             daemon=True).start()
+
+    def deliver(message):
+        forward = moved_actors.get(message.actor_key)
+        if forward is not None:
+            forward.put(message)  # the actor moved to another worker
+        elif isinstance(message, Drain):
+            # what came before it for the actor is here
+            message.done()
+        else:
+            scheduler.enqueue(message.actor_key, message)
+
+    def dispatch(message):
+        if isinstance(message, Spawn):
+            moved_actors.pop(message.actor_key, None)
+            cell = create_cell(message.actor_type, message.weak_ref,
+                               message.args, message.kwargs,
+                               message.role_options, state=message.state,
+                               missing=message.missing)
+            if message.state is not None:
+                arrive(cell, message)
+            scheduler.add(cell)
+            # unless calls from here to it went through the queue, and
+            # could still be on their way
+            if message.actor_key not in directory_cache:
+                local_keys.add(message.actor_key)
+            if listener is not None:
+                listener.publish(message.actor_key)
+        elif isinstance(message, Batch):
+            for action in message:
+                deliver(action)
+        else:
+            deliver(message)
+
+    scheduler = Scheduler(handle)
+    # the calls between the actors of this worker go right to the inbox
+    worker_index = index
+    local_keys = set()
+    local_inbox = inbox
+    moved_actors.update(moved)
+    for spawn in hosted:
+        scheduler.add(create_cell(spawn.actor_type, spawn.weak_ref,
+                                  spawn.args, spawn.kwargs,
+                                  spawn.role_options, failed=True))
+        local_keys.add(spawn.actor_key)
+        if listener is not None:
+            listener.publish(spawn.actor_key)
+    reader = threading.Thread(target=pump, args=(queue, inbox), daemon=True)
+    reader.start()
+
+    stopping = False
+    while True:
+        if scheduler.has_work():
+            while True:
+                try:
+                    message = inbox.get_nowait()
+                except local_queue.Empty:
+                    break
+                if message == 'pls stop':
+                    stopping = True
+                else:
+                    dispatch(message)
+            scheduler.run_once()
+        elif stopping:
             break
-        action.call(actor_instance)
+        else:
+            message = inbox.get()
+            if message == 'pls stop':
+                stopping = True
+            else:
+                dispatch(message)
+    if outboxes is not None:
+        outboxes.close()
+    activity.counters.report()
 
 
 class Director(object):
 
-    def __init__(self):
+    def __init__(self, actors_config):
+        self.config = actors_config
         # self.actors = {}
         # self.queue = mp.Queue()
-        self.manager = mp.Manager()
-        self.actors = self.manager.dict()
-
-    def new_actor(self, actor_type, weak_ref, args, kwargs):
-        actor_queue = mp.Queue()
-        self.actors[weak_ref._thtr_actor_key] = actor_queue
-        event = self.manager.Event()
-        actor_ps = mp.Process(target=actor_process,
-                              args=(actor_type, weak_ref,
-                                    actor_queue, self.actors, event,
-                                    args, kwargs))
-        actor_ps.start()
-        # we need to wait for the child to be working,
-        # otherwise, the queue loses events
-        event.wait()
-        return actor_ps
+        # the directory is spread over several managers, see
+        # actors.directory
+        self.managers = [DirectoryManager()
+                         for _ in range(actors_config['directory_shards'])]
+        for manager in self.managers:
+            manager.start()
+        self.manager = self.managers[0]
+        self.actors = ShardedDirectory(
+            [manager.Shard() for manager in self.managers],
+            actors_config['directory_replicas'])
+        self.roles = self.manager.dict()
+        registry.shared_roles = self.roles
+        # snapshots published by the processes, see actors.metrics
+        self.metrics = self.manager.dict() if actors_config['metrics'] \
+            else None
+        self.dumper = None
+        # endpoints of the actors for direct channels, see actors.peers
+        self.peer_directory = PeerDirectory(self.manager.dict()) \
+            if actors_config['peer_channels'] else None
+        # members and loads of the replica sets, see actors.replicas
+        self.replica_board = ReplicaBoard(self.manager.dict(),
+                                          self.manager.dict())
+        replicas.set_up(self.replica_board, actors_config['replica_interval'])
+        self.autoscaler = None
+        # local copy of the queues we registered, avoids asking the manager
+        self.queues = {}
+        self.worker_queues = []
+        self.worker_processes = []
+        # the pool of each worker, and where the actors go, see
+        # actors.placement
+        self.worker_pools = worker_pools(actors_config['workers'],
+                                         actors_config['pools'])
+        self.placer = Placer(self.worker_pools,
+                             actors_config['worker_memory'],
+                             actors_config['worker_cpus'])
+        # the workers each actor moved from, see actors.migration
+        self.left = {}
+        # to restart the actors, see actors.supervision
+        self.processes = {}  # of the actors with a process of their own
+        self.exited = set()  # the keys of those whose process died
+        self.specs = {}  # how each actor was created
+        self.events = mp.Queue()
+        self.watcher = None
+        # the actors with a process of their own created by other actors
+        self.adopted = set()
+        # counts of the calls, to know when the actors are idle
+        self.reports = mp.Queue()
+        self.idle = IdleDetector(self.reports)
+        self.died = set()  # the processes that died, told to self.idle
+        # the shared memory segments of this runtime, see actors.shm
+        self.shm_prefix = shm.new_prefix()
+        shm.set_up(self.shm_prefix)
+        self.runtime = Runtime(self.actors, self.roles, self.worker_queues,
+                               self.worker_pools, self.events, self.reports,
+                               self.metrics, self.peer_directory, self.config,
+                               self.replica_board, self.shm_prefix)
+
+    def new_actors(self, actor_type, weak_refs, args, kwargs, role_options):
+        """Create one actor for each of the *weak_refs*, without waiting.
+
+        The queues are registered before any process starts, and they
+        keep the messages sent to the actors until they are running.
+        """
+        check_pool(role_options, self.worker_pools)
+        placement = {}
+        # bounded mailboxes need a queue of their own, see actors.mailbox
+        if self.worker_queues and role_options['mailbox_size'] is None:
+            for weak_ref in weak_refs:
+                worker = self.placer.place(weak_ref._thtr_actor_key,
+                                           weak_ref._thtr_class_id,
+                                           role_options)
+                if worker is not None:
+                    placement[weak_ref._thtr_actor_key] = worker
+        elif role_options.get('colocate') is not None:
+            logger.warning("Actors with a process of their own cannot be "
+                           "co-located")
+        if placement:
+            self.new_hosted_actors(actor_type, weak_refs, placement, args,
+                                   kwargs, role_options)
+        own = [weak_ref for weak_ref in weak_refs
+               if weak_ref._thtr_actor_key not in placement]
+        if not own:
+            return []
+        queues = make_queues(actor_type, own, role_options)
+        self.actors.update(queues)  # a single round trip per shard
+        self.queues.update(queues)
+        return self.start_processes(actor_type, own, queues, args, kwargs,
+                                    role_options)
+
+    def start_processes(self, actor_type, weak_refs, queues, args, kwargs,
+                        role_options):
+        processes = start_actor_processes(self.runtime, actor_type, weak_refs,
+                                          queues, args, kwargs, role_options)
+        for weak_ref, process in zip(weak_refs, processes):
+            key = weak_ref._thtr_actor_key
+            self.processes[key] = process
+            self.specs[key] = (actor_type, weak_ref, args, kwargs,
+                               role_options)
+        return processes
+
+    def respawn_actor(self, actor_type, weak_ref, args, kwargs,
+                      role_options):
+        """Create the actor of *weak_ref* again, on the same worker or with
+        the same queue as before, so the messages waiting for it and the
+        queues other processes cached for it are still good."""
+        actor_key = weak_ref._thtr_actor_key
+        worker = self.placer.placement.get(actor_key)
+        if worker is not None and role_options['mailbox_size'] is None:
+            self.placer.add(actor_key, worker, weak_ref._thtr_class_id,
+                            role_options)
+            self.worker_queues[worker].put(
+                Spawn(actor_type, weak_ref, args, kwargs, role_options))
+            self.queues[actor_key] = self.worker_queues[worker]
+            self.specs[actor_key] = (actor_type, weak_ref, args, kwargs,
+                                     role_options)
+            return []
+        try:
+            queue = self.lookup(actor_key)
+        except KeyError:
+            queue = None
+        if queue is None or worker is not None:
+            return self.new_actors(actor_type, [weak_ref], args, kwargs,
+                                   role_options)
+        self.queues[actor_key] = queue
+        return self.start_processes(actor_type, [weak_ref],
+                                    {actor_key: queue}, args, kwargs,
+                                    role_options)
+
+    def new_hosted_actors(self, actor_type, weak_refs, placement, args,
+                          kwargs, role_options):
+        """Host the new actors in *placement* on their workers."""
+        queues = {key: self.worker_queues[worker]
+                  for key, worker in placement.items()}
+        self.actors.update(queues)
+        self.queues.update(queues)
+        for weak_ref in weak_refs:
+            key = weak_ref._thtr_actor_key
+            if key not in placement:
+                continue
+            self.specs[key] = (actor_type, weak_ref, args, kwargs,
+                               role_options)
+            queues[key].put(
+                Spawn(actor_type, weak_ref, args, kwargs, role_options))
+
+    def start_workers(self):
+        # every process gets the queues of all the workers, of all pools
+        self.worker_queues.extend(mp.Queue() for _ in self.worker_pools)
+        for worker in range(len(self.worker_queues)):
+            self.worker_processes.append(self.start_worker(worker))
+
+    def start_worker(self, worker, hosted=(), moved=()):
+        worker_ps = mp.Process(target=worker_process,
+                               args=(self.worker_queues[worker], self.runtime,
+                                     worker, hosted, moved))
+        worker_ps.start()
+        return worker_ps
+
+    def adopt(self, spawned):
+        """Take care of the actors that an actor created, see
+        spawn_actors."""
+        for spawn in spawned.spawns:
+            key = spawn.actor_key
+            self.specs[key] = (spawn.actor_type, spawn.weak_ref, spawn.args,
+                               spawn.kwargs, spawn.role_options)
+            worker = spawned.placement.get(key)
+            if worker is None:
+                self.queues[key] = spawned.queues[key]
+                self.adopted.add(key)
+            else:
+                self.queues[key] = self.worker_queues[worker]
+                self.placer.add(key, worker, spawn.weak_ref._thtr_class_id,
+                                spawn.role_options)
+
+    def dead_actors(self):
+        """The ``(actor_key, error)`` of the actors whose process died
+        since the last call.
+
+        A dead worker is started again with the same queue, and its actors
+        wait there for a restart.
+        """
+        self.count_deaths()
+        dead = []
+        for actor_key, process in list(self.processes.items()):
+            code = process.exitcode
+            if code is None:
+                continue
+            if self.processes.get(actor_key) is process:
+                del self.processes[actor_key]
+            if code != 0:
+                self.exited.add(actor_key)
+                dead.append((actor_key, f"Its process exited with code "
+                                        f"{code}"))
+        for worker, process in enumerate(self.worker_processes):
+            code = process.exitcode
+            if code is None or not self.running:
+                continue
+            hosted = [key for key in self.placer.hosted_by(worker)
+                      if key in self.queues]
+            logger.warning(f"Worker {worker} exited with code {code}, "
+                           f"starting it again")
+            self.worker_processes[worker] = self.start_worker(
+                worker, [Spawn(*self.specs[key]) for key in hosted],
+                self.moved_from(worker))
+            dead.extend((key, f"Its worker exited with code {code}")
+                        for key in hosted)
+        return dead
+
+    def moved_from(self, worker):
+        """The ``(actor_key, queue)`` of the actors that left *worker*,
+        where they are now."""
+        moved = []
+        for key, workers in self.left.items():
+            now = self.placer.placement.get(key)
+            if worker in workers and now is not None and now != worker:
+                moved.append((key, self.worker_queues[now]))
+        return moved
+
+    def restart(self, actor_key):
+        """Create the failed actor with *actor_key* again, where it is
+        now or in a new process if its own died."""
+        if actor_key not in self.exited:
+            self.lookup(actor_key).put(Restart(actor_key))
+        elif actor_key in self.specs:
+            self.exited.discard(actor_key)
+            self.respawn_actor(*self.specs[actor_key])
+
+    def give_up(self, actor_key):
+        """Stop the failed actor with *actor_key* for good, and forget
+        it."""
+        if actor_key not in self.exited:
+            self.lookup(actor_key).put(Stop(actor_key, now=True))
+        self.exited.discard(actor_key)
+        self.queues.pop(actor_key, None)
+        self.actors.pop(actor_key, None)
+        self.specs.pop(actor_key, None)
+        self.left.pop(actor_key, None)
+        self.placer.remove(actor_key)
+        if peers is not None:
+            peers.forget(actor_key)
+
+    def supervise(self, supervision):
+        self.watcher.supervise(supervision)
 
     def run(self):
         # def p():
@@ -90,45 +1106,344 @@ class Director(object):
         self.running = True
         # self.t = Thread(target=p)
         # self.t.start()
+        self.start_workers()
+        self.watcher = Watcher(self, self.events)
+        if self.metrics is not None and self.config['metrics_dump']:
+            self.dumper = Dumper(self.metrics, self.config['metrics_dump'],
+                                 self.config['metrics_interval'])
+
+    def wait_idle(self, timeout=None):
+        flush()
+        return self.idle.wait(self.probe, timeout)
 
-    def stop(self):
-        # stop all actors
-        for actor in self.actors.keys():
-            self.msg2(actor, 'pls stop')
+    def count_deaths(self):
+        """Tell the idle detector of the processes that died since the
+        last call, to settle the calls lost with them."""
+        for process in self.all_processes().values():
+            if process.exitcode not in (None, 0) and \
+                    process not in self.died:
+                self.died.add(process)
+                self.idle.died()
+
+    def probe(self, probe):
+        """Put *probe* on the queue of every process that runs actors,
+        see actors.activity.
+
+        Returns how many it reached, or None if some queue was full.
+        """
+        self.count_deaths()
+        queues = self.process_queues()
+        for queue in queues:
+            try:
+                queue.put(probe, block=False)
+            except local_queue.Full:
+                return None
+        return len(queues)
+
+    def process_queues(self):
+        """The queues of the processes that run actors."""
+        queues = [self.queues[key]
+                  for key, process in list(self.processes.items())
+                  if key in self.queues and process.exitcode is None]
+        queues.extend(self.queues[key] for key in list(self.adopted)
+                      if key in self.queues and key not in self.idle.ended)
+        queues.extend(self.worker_queues)
+        return queues
+
+    def all_processes(self):
+        """The processes that run actors, by name."""
+        processes = {f"actor {key}": process
+                     for key, process in self.processes.items()}
+        processes.update((f"worker {worker}", process)
+                         for worker, process
+                         in enumerate(self.worker_processes))
+        return processes
+
+    def join(self, timeout=None):
+        """Wait for the processes to end, up to *timeout* seconds in
+        all. Returns the names of the ones still running."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        running = []
+        for name, process in self.all_processes().items():
+            process.join(None if deadline is None else
+                         max(0, deadline - time.monotonic()))
+            if process.exitcode is None:
+                running.append(name)
+        return running
+
+    def terminate(self, names):
+        """End the processes with *names* that are still running, killing
+        the ones that are still running KILL_GRACE seconds after being
+        terminated."""
+        processes = self.all_processes()
+        running = [(name, processes[name]) for name in names
+                   if processes[name].exitcode is None]
+        for _, process in running:
+            process.terminate()
+        deadline = time.monotonic() + KILL_GRACE
+        for name, process in running:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.exitcode is None:
+                logger.warning(f"Killing {name}")
+                process.kill()
+                process.join()
+
+    def close(self):
+        """Shut down the managers, once no process uses them."""
+        for manager in self.managers:
+            try:
+                manager.shutdown()
+            except Exception as e:
+                logger.debug(f"Could not shut down a manager: {e}")
+
+    def stop(self, timeout=None):
+        """Stop every actor, and wait up to *timeout* seconds for their
+        processes to end. Returns the ones still running."""
+        if outboxes is not None:
+            outboxes.close()
+        self.watcher.stop()
+        if self.autoscaler is not None:
+            self.autoscaler.stop()
+        # stop all actors, the failed ones take no more calls
+        for actor in list(self.queues.keys()):
+            self.msg2(actor, Stop(actor, actor in self.watcher.pending))
+        for worker_queue in self.worker_queues:
+            worker_queue.put('pls stop')
         self.running = False
         # self.t.join()
+        if reply_channel is not None:
+            reply_channel.close()
+        if self.dumper is not None:
+            self.dumper.stop()
+        if peers is not None:
+            peers.close()
+        return self.join(timeout)
+
+    def get_metrics(self):
+        if self.metrics is None:
+            raise Exception("Metrics are not enabled, use "
+                            "actors.start(metrics=True)")
+        return dict(self.metrics)
+
+    def lookup(self, actor_key):
+        try:
+            return self.queues[actor_key]
+        except KeyError:
+            pass
+        try:
+            queue = self.queues[actor_key] = self.actors[actor_key]
+        except KeyError:
+            raise KeyError(f"There is no actor {actor_key}, or it failed "
+                           "and was stopped") from None
+        return queue
+
+    def lookup_many(self, actor_keys):
+        """Resolve the queues of the *actor_keys* not known yet, with a
+        single lookup per shard."""
+        missing = [key for key in actor_keys if key not in self.queues]
+        if missing:
+            self.queues.update(self.actors.get_many(missing))
 
     def msg2(self, actor_key, msg):
-        self.actors[actor_key].put(msg)
+        resolve(actor_key).put(msg)
+        if isinstance(msg, Stop):
+            self.queues.pop(actor_key, None)
+            self.left.pop(actor_key, None)
+            self.placer.release(actor_key)
+            if peers is not None:
+                peers.forget(actor_key)
+
+    def autoscale(self, scaled):
+        """Scale the replica set of *scaled*, a ScaledSet, see
+        actors.replicas."""
+        if self.autoscaler is None:
+            self.autoscaler = Autoscaler(self.replica_board,
+                                         self.config['replica_interval'])
+        self.autoscaler.add(scaled)
+
+    def migrate(self, actor_key, worker=None):
+        """Move the actor with *actor_key* to the *worker* at that index,
+        or the best other one, see actors.migration."""
+        try:
+            actor_type, weak_ref, _, _, role_options = self.specs[actor_key]
+        except KeyError:
+            raise KeyError(f"There is no actor {actor_key}, or it failed "
+                           "and was stopped") from None
+        if not self.worker_queues:
+            raise ValueError("There are no workers to move actors to, see "
+                             "the workers option")
+        if async_methods_of(actor_type):
+            raise ValueError(f"Actor {actor_key} has async methods, it "
+                             "cannot be moved")
+        if role_options['mailbox_size'] is not None:
+            raise ValueError(f"Actor {actor_key} has a bounded mailbox, it "
+                             "cannot be moved")
+        current = self.placer.placement.get(actor_key)
+        if current is None and self.peer_directory is not None:
+            raise ValueError(f"Actor {actor_key} has a process of its own, "
+                             "it cannot be moved with peer_channels")
+        if worker is None:
+            worker = self.placer.move_target(
+                actor_key, weak_ref._thtr_class_id, role_options)
+            if worker is None:
+                raise ValueError(f"No other worker has room for actor "
+                                 f"{actor_key}")
+        elif not 0 <= worker < len(self.worker_queues) or worker == current:
+            raise ValueError(f"Cannot move actor {actor_key} to worker "
+                             f"{worker}, the workers are 0 to "
+                             f"{len(self.worker_queues) - 1} and it is on "
+                             f"{current}")
+        self.msg2(actor_key, Migrate(actor_key, worker))
+
+    def migrated(self, migrated):
+        """Count the actor that moved where it is now, and have every
+        process that had its old route take the new one."""
+        key = migrated.actor_key
+        if key not in self.specs:
+            return
+        _, weak_ref, _, _, role_options = self.specs[key]
+        old = self.placer.placement.get(key)
+        if old is not None:
+            self.left.setdefault(key, set()).add(old)
+        self.placer.add(key, migrated.worker, weak_ref._thtr_class_id,
+                        role_options)
+        self.adopted.discard(key)
+        # every process that has the old route takes the new one
+        reroute(key)
+        for queue in self.process_queues():
+            try:
+                queue.put(migrated, block=False)
+            except (local_queue.Full, EOFError, OSError):
+                logger.debug(f"Could not tell a process that {key} moved")
 
 
 global_director = None
 
 
-def start():
-    global global_director
+def start(**options):
+    """Start the actors runtime.
+
+    The *options* are described in :mod:`actors.config`.
+    """
+    global global_director, config, peers
     if global_director is not None:
         logger.info("Already started")
         return
     logger.info("Starting Lithops Actors")
-    global_director = Director()
+    config = make_config(**options)
+    if config['shm_threshold'] and not shm.available():
+        raise Exception("Shared memory transport is not available here")
+    global_director = Director(config)
+    if global_director.peer_directory is not None:
+        peers = Peers(global_director.peer_directory)
     global_director.run()
+    enable_batching()
 
 
-def shutdown():
+def shutdown(timeout=60):
+    """Stop the actors runtime.
+
+    Waits until the actors are idle (see :func:`wait_idle`), stops them,
+    and waits for their processes to end, for *timeout* seconds in all
+    (plus STOP_GRACE when the actors were busy), or forever if None. The
+    processes still running then are logged, and terminated (or killed
+    after KILL_GRACE seconds), since the interpreter would wait for them
+    at exit.
+    """
     global global_director
     if global_director is None:
         logger.info("Not started, can't shutdown")
         return
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if not global_director.wait_idle(timeout):
+        logger.warning("The actors are still busy, stopping them anyway")
     logger.info("Stopping Lithops Actors director")
-    global_director.stop()
+    running = global_director.stop(None if deadline is None else max(
+        STOP_GRACE, deadline - time.monotonic()))
+    if running:
+        logger.warning(f"{len(running)} processes did not end in time, "
+                       f"terminating them: {', '.join(running)}")
+        global_director.terminate(running)
+    if global_director.config['shm_threshold']:
+        left = shm.unlink_all(global_director.shm_prefix)
+        if left:
+            logger.debug(f"Unlinked {left} shared memory segments")
+    global_director.close()
     logger.info("Shut down")
 
 
+def wait_idle(timeout=None):
+    """Wait until the actors are idle: no call is waiting or running.
+
+    True when they are, False if they are still busy after *timeout*
+    seconds. See :mod:`actors.activity`.
+    """
+    if global_director is None:
+        raise Exception("Not started, there are no actors")
+    return global_director.wait_idle(timeout)
+
+
+def get_metrics():
+    """The last metrics snapshot of every actor, by actor key.
+
+    See :mod:`actors.metrics`, they are at most ``metrics_interval``
+    seconds old.
+    """
+    if global_director is None:
+        raise Exception("Not started, there are no metrics")
+    return global_director.get_metrics()
+
+
+def supervise(members, strategy='one_for_one', supervisor=None,
+              max_restarts=3, period=60.0, backoff=0.5, max_backoff=30.0):
+    """Restart the actors of *members* when they fail.
+
+    See :mod:`actors.supervision` for the arguments.
+    """
+    if global_director is None:
+        raise Exception("Not started, can't supervise actors")
+    supervision = Supervision(members, strategy, supervisor, max_restarts,
+                              period, backoff, max_backoff)
+    global_director.supervise(supervision)
+    return supervision
+
+
+def migrate(actor, worker=None):
+    """Move *actor* (a proxy) to another worker, the one at index
+    *worker* or the best one, see :mod:`actors.migration`."""
+    if global_director is None:
+        raise Exception("Not started, can't migrate actors")
+    global_director.migrate(actor._actor_key, worker)
+
+
 def new_actor(meta, weak_ref, args, kwargs):
+    new_actors(meta, [weak_ref], args, kwargs)
+
+
+def new_actors(meta, weak_refs, args, kwargs, options=None):
+    """Create the actors of *weak_refs* with the role of *meta*, and its
+    options or *options*."""
+    global global_director
+    if global_director is None and runtime is None:
+        raise Exception("Not started, can't create actor")
+    actor_type = meta.enriched_class.__thtr_actor_class__
+    registry.publish(meta.role)
+    if global_director is None:
+        # we are on a process that runs actors
+        spawn_actors(actor_type, weak_refs, args, kwargs,
+                     options or meta.options)
+    else:
+        global_director.new_actors(actor_type, weak_refs, args, kwargs,
+                                   options or meta.options)
+
+
+def respawn_actor(meta, weak_ref, args, kwargs):
     global global_director
+    if runtime is not None:
+        raise Exception("Actors can only be respawned from the driver")
     if global_director is None:
         raise Exception("Not started, can't create actor")
-        # TODO: actors cannot be created from other actors
     actor_type = meta.enriched_class.__thtr_actor_class__
-    global_director.new_actor(actor_type, weak_ref, args, kwargs)
+    registry.publish(meta.role)
+    global_director.respawn_actor(actor_type, weak_ref, args, kwargs,
+                                  meta.options)
@@ -0,0 +1,215 @@
+"""The directory of the actors: the queue of each one, by actor key.
+
+The keys are spread over several shards by consistent hashing, each
+shard a dict served by a manager of its own, so the registrations and
+lookups of all the processes do not go through a single server. With
+``directory_replicas`` above 1 each key is kept in that many shards, the
+next ones on the ring, and a lookup goes on to the next replica when a
+shard fails.
+
+Actors are registered in batches, with a single update per shard, and
+:meth:`ShardedDirectory.get_many` looks many up at once. A shard can be
+any dict-like object; when it has a ``get_many(keys)`` method (like
+:class:`LocalShard`), a batch takes a single call to it. The director
+serves each shard from a :class:`DirectoryManager`, whose ``Shard()``
+is a :class:`LocalShard` in the manager process, so a batch is a
+single round trip to it.
+
+:meth:`ShardedDirectory.local` makes one with plain dicts, a stand-in
+for the managers within a single process, for tests::
+
+    directory = ShardedDirectory.local(4, replicas=2)
+    directory.update({'a': queue_a, 'b': queue_b})
+    directory.get_many(['a', 'b', 'c'])  # {'a': queue_a, 'b': queue_b}
+"""
+import bisect
+import hashlib
+import logging
+
+from lithops.multiprocessing import managers
+
+logger = logging.getLogger(__name__)
+
+# Points of each shard on the ring, more spread the keys more evenly.
+POINTS_PER_SHARD = 64
+# What a call to a shard raises when its server is gone.
+SHARD_ERRORS = (EOFError, OSError)
+
+
+def key_hash(key):
+    # crc32 spreads the points of the shards unevenly
+    return int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing(object):
+    """Consistent hashing of keys over *num_shards* shards."""
+
+    def __init__(self, num_shards, points=POINTS_PER_SHARD):
+        ring = sorted((key_hash(f"{shard}:{point}"), shard)
+                      for shard in range(num_shards)
+                      for point in range(points))
+        self.hashes = [h for h, _ in ring]
+        self.owners = [shard for _, shard in ring]
+        self.num_shards = num_shards
+
+    def shards_of(self, key, replicas=1):
+        """The *replicas* different shards of *key*, the first one
+        first."""
+        start = bisect.bisect(self.hashes, key_hash(key))
+        shards = []
+        for i in range(len(self.owners)):
+            shard = self.owners[(start + i) % len(self.owners)]
+            if shard not in shards:
+                shards.append(shard)
+                if len(shards) == replicas:
+                    break
+        return shards
+
+
+class LocalShard(dict):
+    """A shard in a plain dict, for a directory used by a single
+    process."""
+
+    def get_many(self, keys):
+        return {key: self[key] for key in keys if key in self}
+
+
+class ShardProxy(managers.DictProxy):
+    """Proxy of a :class:`LocalShard` in a manager process."""
+    _exposed_ = managers.DictProxy._exposed_ + ('get_many',)
+
+    def get_many(self, keys):
+        return self._callmethod('get_many', (keys,))
+
+
+class DirectoryManager(managers.SyncManager):
+    """A manager that also serves shards of the directory, from
+    ``Shard()``."""
+
+
+DirectoryManager.register('Shard', LocalShard, ShardProxy)
+
+
+class ShardedDirectory(object):
+    """The actor queues in *shards* (dicts, usually from different
+    managers), each key in *replicas* of them."""
+
+    def __init__(self, shards, replicas=1):
+        if not shards:
+            raise ValueError("The directory needs at least one shard")
+        if not 1 <= replicas <= len(shards):
+            raise ValueError(f"The directory_replicas must be between 1 and "
+                             f"the number of shards ({len(shards)}), not "
+                             f"{replicas}")
+        self.shards = list(shards)
+        self.replicas = replicas
+        self.ring = HashRing(len(self.shards))
+
+    @classmethod
+    def local(cls, num_shards=1, replicas=1):
+        """A directory in local dicts, see the module docstring."""
+        return cls([LocalShard() for _ in range(num_shards)], replicas)
+
+    def __reduce__(self):
+        return ShardedDirectory, (self.shards, self.replicas)
+
+    def __repr__(self):
+        return (f"ShardedDirectory({len(self.shards)} shards, "
+                f"{self.replicas} replicas)")
+
+    def __getitem__(self, key):
+        for shard in self.ring.shards_of(key, self.replicas):
+            try:
+                return self.shards[shard][key]
+            except KeyError:
+                pass  # a replica may have it, if this shard was lost
+            except SHARD_ERRORS as e:
+                logger.warning(f"Shard {shard} of the directory failed on "
+                               f"a lookup: {e!r}")
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def get_many(self, keys):
+        """The values of the *keys* found, by key, with a batch per
+        shard."""
+        found = {}
+        missing = list(keys)
+        for replica in range(self.replicas):
+            by_shard = {}
+            for key in missing:
+                shards = self.ring.shards_of(key, self.replicas)
+                by_shard.setdefault(shards[replica], []).append(key)
+            for shard, shard_keys in by_shard.items():
+                try:
+                    found.update(self._get_batch(self.shards[shard],
+                                                 shard_keys))
+                except SHARD_ERRORS as e:
+                    logger.warning(f"Shard {shard} of the directory failed "
+                                   f"on a lookup: {e!r}")
+            missing = [key for key in missing if key not in found]
+            if not missing:
+                break
+        return found
+
+    @staticmethod
+    def _get_batch(shard, keys):
+        get_many = getattr(shard, 'get_many', None)
+        if get_many is not None:
+            return get_many(keys)
+        values = {}
+        for key in keys:
+            value = shard.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def update(self, mapping):
+        """Register every key of *mapping*, with a single update per
+        shard.
+
+        Raises ConnectionError if all the shards of some key failed.
+        """
+        by_shard = {}
+        for key, value in mapping.items():
+            for shard in self.ring.shards_of(key, self.replicas):
+                by_shard.setdefault(shard, {})[key] = value
+        failed = set()
+        for shard, values in by_shard.items():
+            try:
+                self.shards[shard].update(values)
+            except SHARD_ERRORS as e:
+                logger.warning(f"Shard {shard} of the directory failed on "
+                               f"an update: {e!r}")
+                failed.add(shard)
+        if failed:
+            lost = [key for key in mapping if failed.issuperset(
+                self.ring.shards_of(key, self.replicas))]
+            if lost:
+                raise ConnectionError(f"Could not register {len(lost)} "
+                                      f"actors, their shards failed")
+
+    def pop(self, key, default=None):
+        """Remove *key* from all its shards, and return its value."""
+        value = default
+        for shard in self.ring.shards_of(key, self.replicas):
+            try:
+                popped = self.shards[shard].pop(key, None)
+            except SHARD_ERRORS as e:
+                logger.warning(f"Shard {shard} of the directory failed on "
+                               f"a removal: {e!r}")
+                continue
+            if popped is not None:
+                value = popped
+        return value
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class ActorFuture(Future):
+    """The eventual result of an actor method called through `.future`.
+
+    It is a :class:`concurrent.futures.Future`, so it offers
+    ``result(timeout)``, ``exception(timeout)``, ``done()`` and
+    ``add_done_callback(fn)``.
+    """
+
+    def __init__(self, action_id):
+        super().__init__()
+        self.action_id = action_id
+
+    def __reduce__(self):
+        raise TypeError("Actor futures cannot be sent to other actors yet. "
+                        "Send the result instead.")
+
+    def __repr__(self):
+        return f"ActorFuture({self.action_id}, {self._state})"
+
+
+class ReplyChannel(object):
+    """The queue where the results of the calls made by this process arrive.
+
+    Every process (the driver or any actor) that calls methods through
+    `.future` owns one of these. Actions carry the queue as their
+    *reply_to* and the actor puts ``(action_id, result, error)`` on it.
+    A daemon thread reads the replies and completes the futures.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.pid = os.getpid()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def register(self, action_id):
+        future = ActorFuture(action_id)
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            self._pending[action_id] = future
+        return future
+
+    def _listen(self):
+        while True:
+            try:
+                reply = self.queue.get()
+            except (EOFError, OSError):
+                logger.debug("Reply queue closed")
+                break
+            except Exception as e:
+                # only this reply is lost, its future never completes
+                logger.error(f"Could not load a reply: {e!r}")
+                continue
+            if reply is None:
+                break
+            action_id, result, error = reply
+            with self._lock:
+                future = self._pending.pop(action_id, None)
+            if future is None:
+                logger.warning(f"Got a reply for unknown action {action_id}")
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        self.queue.put(None)
+
+
+def get(futures, timeout=None):
+    """Wait for one future, or a list of them, and return the result(s)."""
+    if isinstance(futures, (list, tuple)):
+        return [f.result(timeout) for f in futures]
+    return futures.result(timeout)
@@ -0,0 +1,489 @@
+"""Groups of actors, to call all of them at once.
+
+An :class:`ActorGroup` sends the same call to all of its members with a
+single serialization of the arguments: they are pickled once, or moved
+once to shared memory with the ``shm_threshold`` option (see actors.shm),
+and every member gets the same bytes. It also scatters a list of values
+over the members, gathers their results into a single future, reduces
+them, in a tree among the members themselves, so no process receives
+more than a few partial results, and allreduces them, in a ring or a
+tree, to give the combination of all the results to every member.
+"""
+import operator
+import pickle
+import threading
+import uuid
+from concurrent.futures import Future
+
+import actors
+from actors import serialization, shm
+from actors.actor import Action
+
+
+def add(a, b):
+    """Sum of two results, element by element for lists and tuples (like
+    lists of NumPy arrays, one per layer)."""
+    if isinstance(a, (list, tuple)):
+        return type(a)(add(x, y) for x, y in zip(a, b))
+    return operator.add(a, b)
+
+
+class PackedArgs(object):
+    """The arguments of many actions, pickled once."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __reduce__(self):
+        return PackedArgs, (self.data,)
+
+    def load(self):
+        return pickle.loads(self.data)
+
+    def release(self):
+        pass  # nothing to free, see actors.shm.SharedPayload
+
+    def __repr__(self):
+        return f"PackedArgs({len(self.data)} bytes)"
+
+
+def pack(members, args, kwargs):
+    """The arguments for a call to all the *members*, serialized once."""
+    names = {member._thtr_role.serializer for member in members}
+    dumps = serialization.buffer_dumps(names.pop() if len(names) == 1
+                                       else None)
+    threshold = actors.director.config['shm_threshold']
+    if threshold:
+        shared = shm.share((args, kwargs), threshold, len(members), dumps)
+        if shared is not None:
+            return shared
+    return PackedArgs(dumps((args, kwargs), protocol=5))
+
+
+def gather_futures(futures):
+    """A future of the list of results of *futures*, in their order."""
+    gathered = Future()
+    gathered.set_running_or_notify_cancel()
+    if not futures:
+        gathered.set_result([])
+        return gathered
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            pending[0] -= 1
+            if pending[0]:
+                return
+        for future in futures:
+            if future.exception() is not None:
+                gathered.set_exception(future.exception())
+                return
+        gathered.set_result([future.result() for future in futures])
+
+    for future in futures:
+        future.add_done_callback(done)
+    return gathered
+
+
+class ActorGroup(object):
+    """A fixed list of actors (their proxies), which can be of different
+    roles as long as they have the methods called.
+
+    Groups can be sent to other actors, like proxies.
+    """
+
+    def __init__(self, members):
+        self.members = list(members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __iter__(self):
+        return iter(self.members)
+
+    def __getitem__(self, index):
+        return self.members[index]
+
+    def __repr__(self):
+        return f"ActorGroup({len(self.members)} actors)"
+
+    def broadcast(self, method_name, *args, **kwargs):
+        """Call *method_name* on every member with the same arguments."""
+        self._call_all(method_name, args, kwargs, with_futures=False)
+
+    def scatter(self, method_name, values, *args, **kwargs):
+        """Call *method_name* on every member, with the value at its
+        position in *values* as the first argument."""
+        if len(values) != len(self.members):
+            raise ValueError(f"Got {len(values)} values to scatter over "
+                             f"{len(self.members)} actors")
+        for member, value in zip(self.members, values):
+            getattr(member, method_name).remote(value, *args, **kwargs)
+
+    def gather(self, method_name, *args, **kwargs):
+        """Call *method_name* on every member, like broadcast.
+
+        Returns a future of the list of their results, in the order of the
+        members, or of the first error.
+        """
+        futures = self._call_all(method_name, args, kwargs,
+                                 with_futures=True)
+        return gather_futures(futures)
+
+    def reduce(self, method_name, *args, op=add, **kwargs):
+        """Call *method_name* on every member, like broadcast, and combine
+        their results with *op*.
+
+        The members form a binary tree: each one combines its own result
+        with those of its children, in that order, and sends it to its
+        parent, up to the first member. *op* takes two results and returns
+        their combination, it must be associative and must not modify
+        them. The default adds them, element by element for lists.
+        Returns a future of the combination of all the results, or of the
+        first error.
+        """
+        if not self.members:
+            raise ValueError("Cannot reduce an empty group")
+        channel = actors.director.get_reply_channel()
+        reduction = Reduction(self.members, method_name, op, channel.queue)
+        # register before sending, the reply could be faster than us
+        future = channel.register(reduction.action_id)
+        self._call_all('__thtr_reduce__', (reduction,) + args, kwargs,
+                       with_futures=False)
+        return future
+
+    def allreduce(self, method_name, then, *args, op=add, algorithm='ring',
+                  **kwargs):
+        """Call *method_name* on every member, like broadcast, combine
+        their results with *op* and call *then* with the combination on
+        every member.
+
+        The members exchange the results among themselves, no process gets
+        all of them. With the 'ring' *algorithm* the results must be NumPy
+        arrays, or lists of them, of the same shapes in every member, and
+        *op* must work element by element (like the default, add): each
+        array is split in chunks that go around the ring. With 'tree' the
+        results go up and down the tree of :meth:`reduce`, they can be
+        anything *op* takes.
+
+        Returns a future of the list of what *then* returned on each
+        member, or of the first error.
+        """
+        if not self.members:
+            raise ValueError("Cannot reduce an empty group")
+        try:
+            plan_class = ALLREDUCE_ALGORITHMS[algorithm]
+        except KeyError:
+            raise ValueError(f"Unknown allreduce algorithm '{algorithm}', "
+                             f"valid algorithms are: "
+                             f"{', '.join(ALLREDUCE_ALGORITHMS)}") from None
+        channel = actors.director.get_reply_channel()
+        action_ids = [next(actors.actor.action_ids) for _ in self.members]
+        plan = plan_class(self.members, method_name, op, then, channel.queue,
+                          action_ids)
+        futures = [channel.register(action_id) for action_id in action_ids]
+        start = '__thtr_ring__' if algorithm == 'ring' else '__thtr_reduce__'
+        self._call_all(start, (plan,) + args, kwargs, with_futures=False)
+        return gather_futures(futures)
+
+    def _call_all(self, method_name, args, kwargs, with_futures):
+        shared = pack(self.members, args, kwargs)
+        channel = actors.director.get_reply_channel() if with_futures \
+            else None
+        futures = []
+        actors.director.prefetch([member._thtr_actor_key
+                                  for member in self.members])
+        for member in self.members:
+            role = member._thtr_role
+            action = Action(member._thtr_actor_key,
+                            role.method_ids[method_name], shared=shared)
+            action.serializer = role.serializer
+            if channel is not None:
+                action.reply_to = channel.queue
+                futures.append(channel.register(action.action_id))
+            actors.director.send_action(action)
+        return futures
+
+    def __reduce__(self):
+        return ActorGroup, (self.members,)
+
+
+class Reduction(object):
+    """A reduction over *members*, with the results of *method_name*.
+
+    The first member puts the result on *reply_to* as a reply to the
+    *action_id* of the reduction.
+    """
+
+    def __init__(self, members, method_name, op, reply_to, reduction_id=None,
+                 action_id=None):
+        self.members = members
+        self.method_name = method_name
+        self.op = op
+        self.reply_to = reply_to
+        self.reduction_id = reduction_id or uuid.uuid4().hex
+        self.action_id = action_id or next(actors.actor.action_ids)
+
+    def __reduce__(self):
+        return Reduction, (self.members, self.method_name, self.op,
+                           self.reply_to, self.reduction_id, self.action_id)
+
+    def children(self, index):
+        return [child for child in (2 * index + 1, 2 * index + 2)
+                if child < len(self.members)]
+
+    def finish(self, instance, result, error):
+        """Called by the first member with the *result* of everyone."""
+        if error is not None:
+            error = serialization.sendable_error(error)
+        self.reply_to.put((self.action_id, result, error))
+
+
+class TreeAllreduce(Reduction):
+    """A reduction whose result goes back down the tree, to call *then*
+    with it on every member. Member *i* replies to ``action_ids[i]``."""
+
+    def __init__(self, members, method_name, op, then, reply_to,
+                 action_ids, reduction_id=None):
+        super().__init__(members, method_name, op, reply_to, reduction_id,
+                         action_ids[0])
+        self.then = then
+        self.action_ids = action_ids
+
+    def __reduce__(self):
+        return TreeAllreduce, (self.members, self.method_name, self.op,
+                               self.then, self.reply_to, self.action_ids,
+                               self.reduction_id)
+
+    def finish(self, instance, result, error):
+        pass_down(instance, self, result, error)
+
+
+class RingAllreduce(object):
+    """An allreduce in a ring: member *i* sends to member *i + 1*.
+
+    Every array of the results is split in as many chunks as members.
+    In the first ``N - 1`` steps each member adds the chunk it receives
+    to its own and sends it on, until each one has a chunk with the sum
+    of everyone, and in the next ``N - 1`` they pass those around. Each
+    member sends and receives ``2 (N - 1) / N`` times the size of the
+    result, whatever the number of members. Member *i* replies to
+    ``action_ids[i]``.
+    """
+
+    def __init__(self, members, method_name, op, then, reply_to,
+                 action_ids, reduction_id=None):
+        self.members = members
+        self.method_name = method_name
+        self.op = op
+        self.then = then
+        self.reply_to = reply_to
+        self.action_ids = action_ids
+        self.reduction_id = reduction_id or uuid.uuid4().hex
+
+    def __reduce__(self):
+        return RingAllreduce, (self.members, self.method_name, self.op,
+                               self.then, self.reply_to, self.action_ids,
+                               self.reduction_id)
+
+    @property
+    def last_step(self):
+        return 2 * len(self.members) - 3
+
+
+ALLREDUCE_ALGORITHMS = {'ring': RingAllreduce, 'tree': TreeAllreduce}
+
+
+class Partials(object):
+    """What a member has of a reduction: its result and those of its
+    children."""
+
+    def __init__(self):
+        self.reduction = None
+        self.own = None
+        self.children = {}  # by member index
+        self.error = None
+
+
+def run_reduction(instance, reduction, args, kwargs):
+    """Compute the result of a member of the *reduction*, the actor
+    *instance*."""
+    partials = partials_of(instance, reduction.reduction_id)
+    partials.reduction = reduction
+    try:
+        partials.own = getattr(instance, reduction.method_name)(*args,
+                                                                 **kwargs)
+    except Exception as e:
+        partials.error = e
+    advance_reduction(instance, reduction.reduction_id)
+
+
+def add_partial(instance, reduction_id, child, result, error):
+    """Take the combined result of the *child* of this member."""
+    partials = partials_of(instance, reduction_id)
+    partials.children[child] = result
+    if error is not None and partials.error is None:
+        partials.error = error
+    advance_reduction(instance, reduction_id)
+
+
+def partials_of(instance, reduction_id):
+    reductions = instance.__dict__.setdefault('_thtr_reductions', {})
+    partials = reductions.get(reduction_id)
+    if partials is None:
+        partials = reductions[reduction_id] = Partials()
+    return partials
+
+
+def advance_reduction(instance, reduction_id):
+    """Send up the result of this member once it has all its parts."""
+    reductions = instance._thtr_reductions
+    partials = reductions[reduction_id]
+    reduction = partials.reduction
+    if reduction is None:
+        return  # our own call has not arrived yet
+    index = reduction.members.index(instance.proxy)
+    children = reduction.children(index)
+    if len(partials.children) < len(children):
+        return
+    del reductions[reduction_id]
+    result = partials.own
+    error = partials.error
+    if error is None:
+        try:
+            for child in children:
+                result = reduction.op(result, partials.children[child])
+        except Exception as e:
+            error = e
+    if error is not None:
+        result = None
+    if index == 0:
+        reduction.finish(instance, result, error)
+    else:
+        parent = reduction.members[(index - 1) // 2]
+        parent.__thtr_reduce_part__.remote(reduction_id, index, result,
+                                           error)
+
+
+def pass_down(instance, reduction, result, error):
+    """Give the *result* of a TreeAllreduce to this member and to its
+    children."""
+    index = reduction.members.index(instance.proxy)
+    for child in reduction.children(index):
+        reduction.members[child].__thtr_allreduce_result__.remote(
+            reduction, result, error)
+    finish_allreduce(instance, reduction, index, result, error)
+
+
+def finish_allreduce(instance, plan, index, result, error):
+    """Call *then* on this member with the *result* and reply."""
+    if error is None:
+        try:
+            result = getattr(instance, plan.then)(result)
+        except Exception as e:
+            error = e
+    if error is not None:
+        result, error = None, serialization.sendable_error(error)
+    plan.reply_to.put((plan.action_ids[index], result, error))
+
+
+class Ring(object):
+    """What a member has of a RingAllreduce."""
+
+    def __init__(self):
+        self.plan = None
+        self.chunks = None  # by chunk index, a list with a part per array
+        self.shapes = None
+        self.single = False  # the result was an array, not a list
+        self.early = []  # parts that came before our own result
+        self.error = None
+
+
+def split(result, parts):
+    """Split each array of *result* in *parts* chunks."""
+    import numpy as np
+    single = not isinstance(result, (list, tuple))
+    arrays = [np.asarray(a) for a in ([result] if single else result)]
+    pieces = [np.array_split(a.reshape(-1), parts) for a in arrays]
+    chunks = [[array_pieces[k] for array_pieces in pieces]
+              for k in range(parts)]
+    return chunks, [a.shape for a in arrays], single
+
+
+def join(chunks, shapes, single):
+    import numpy as np
+    arrays = [np.concatenate([chunk[j] for chunk in chunks]).reshape(shape)
+              for j, shape in enumerate(shapes)]
+    return arrays[0] if single else arrays
+
+
+def ring_of(instance, reduction_id):
+    reductions = instance.__dict__.setdefault('_thtr_reductions', {})
+    ring = reductions.get(reduction_id)
+    if ring is None:
+        ring = reductions[reduction_id] = Ring()
+    return ring
+
+
+def run_ring(instance, plan, args, kwargs):
+    """Compute the result of a member of the RingAllreduce *plan* and
+    start passing it around."""
+    ring = ring_of(instance, plan.reduction_id)
+    ring.plan = plan
+    index = plan.members.index(instance.proxy)
+    size = len(plan.members)
+    try:
+        result = getattr(instance, plan.method_name)(*args, **kwargs)
+        ring.chunks, ring.shapes, ring.single = split(result, size)
+    except Exception as e:
+        ring.error = e
+    if size == 1:
+        end_ring(instance, ring, index)
+        return
+    send_ring_part(plan, index, ring, 0, index)
+    early, ring.early = ring.early, []
+    for step, part, error in early:
+        add_ring_part(instance, plan.reduction_id, step, part, error)
+
+
+def add_ring_part(instance, reduction_id, step, part, error):
+    """Take the chunk of the previous member for *step*."""
+    ring = ring_of(instance, reduction_id)
+    plan = ring.plan
+    if plan is None:
+        ring.early.append((step, part, error))
+        return
+    index = plan.members.index(instance.proxy)
+    size = len(plan.members)
+    chunk = (index - 1 - step) % size
+    if error is not None and ring.error is None:
+        ring.error = error
+    if ring.error is None:
+        try:
+            if step < size - 1:
+                ring.chunks[chunk] = plan.op(ring.chunks[chunk], part)
+            else:
+                ring.chunks[chunk] = part
+        except Exception as e:
+            ring.error = e
+    if step < plan.last_step:
+        send_ring_part(plan, index, ring, step + 1, chunk)
+    else:
+        end_ring(instance, ring, index)
+
+
+def send_ring_part(plan, index, ring, step, chunk):
+    following = plan.members[(index + 1) % len(plan.members)]
+    part = None if ring.error is not None else ring.chunks[chunk]
+    following.__thtr_ring_part__.remote(plan.reduction_id, step, part,
+                                        ring.error)
+
+
+def end_ring(instance, ring, index):
+    del instance._thtr_reductions[ring.plan.reduction_id]
+    result = None
+    if ring.error is None:
+        result = join(ring.chunks, ring.shapes, ring.single)
+    finish_allreduce(instance, ring.plan, index, result, ring.error)
@@ -0,0 +1,316 @@
+"""Mailboxes with priority classes.
+
+The messages for an actor are taken by class, then in the order they
+arrived within each class:
+
+- ``SYSTEM``: control messages for the runtime, like the stops sent
+  with ``actor.pls_stop(now=True)``, the restarts of actors.supervision
+  and the moves of actors.migration. A failed actor takes only these
+  until it is restarted.
+- ``HIGH``: calls to the methods of the actor marked with
+  :func:`high_priority`, like the ones that cancel or reconfigure its
+  work.
+- ``NORMAL``: everything else, including the stops sent with
+  ``actor.pls_stop()``, which keep waiting for the messages sent before
+  them.
+
+The calls still waiting when the actor stops are dropped, the ones made
+through ``.future`` get an :class:`ActorStopped` error.
+
+So a high-priority call overtakes the normal calls that are waiting in
+the mailbox, but two calls of the same class never swap places.
+
+A role can bound the mailboxes of its actors with
+``@actors.remote(mailbox_size=n)``, in number of normal calls; high and
+system messages are never held back. What happens to a call for a full
+mailbox depends on the ``overflow`` option of the role:
+
+- ``'block'``: the sender waits until there is room. Each actor has a
+  credit for each call that can wait for it, that its senders take and
+  it gives back when it runs the call (see :class:`BoundedQueue`): an
+  actor that calls a slower one with ``.remote()`` slows down to its
+  pace, instead of burying it in messages.
+- ``'drop_oldest'`` or ``'drop_newest'``: the actor drops the oldest
+  waiting call, or the new one, and senders never wait. A dropped call
+  made through ``.future`` gets a :class:`MailboxFull` error.
+- ``'raise'``: ``.remote()`` raises :class:`MailboxFull` in the sender,
+  and the call is not sent.
+
+With 'block' and 'raise', at most *n* normal calls wait for the actor,
+in its queue and its mailbox together. These calls go through the queue
+of the actor, never through the direct channels of actors.peers, and
+are never batched. Actors with a bounded mailbox run in a process of
+their own, even when there are workers.
+"""
+import inspect
+import logging
+import threading
+from collections import deque
+
+from actors import activity
+from actors.actor import Action, Restart, Stop
+from actors.batching import Batch
+from actors.migration import Migrate
+
+logger = logging.getLogger(__name__)
+
+SYSTEM = 0
+HIGH = 1
+NORMAL = 2
+
+
+def high_priority(method):
+    """Decorator for the methods of an actor that go before its normal
+    calls, see actors.mailbox."""
+    method.__thtr_priority__ = HIGH
+    return method
+
+
+def high_priority_methods_of(actor_type):
+    """Names of the methods of *actor_type* marked with high_priority."""
+    return frozenset(
+        name for name, method in inspect.getmembers(actor_type, callable)
+        if getattr(method, '__thtr_priority__', NORMAL) == HIGH)
+
+
+def priority_of(message, high_ids):
+    """The class of *message*, *high_ids* are the IDs of the methods that
+    have high priority."""
+    if isinstance(message, Action):
+        return HIGH if message.method_id in high_ids else NORMAL
+    if isinstance(message, Stop) and message.now or \
+            isinstance(message, (Restart, Migrate)):
+        return SYSTEM
+    return NORMAL
+
+
+class MailboxFull(Exception):
+    """The mailbox of an actor with the 'raise' overflow policy is full,
+    the call was not sent, or it was dropped by one with a 'drop_oldest'
+    or 'drop_newest' policy."""
+
+
+class ActorStopped(Exception):
+    """The actor stopped before it ran the call, like the calls waiting
+    for an actor stopped with ``pls_stop(now=True)``."""
+
+
+def drop(messages, error):
+    """Give up on the calls in *messages*, they are never handled.
+
+    The ones made through ``.future`` get *error*, their arguments in
+    shared memory are released (see actors.shm), and all are counted as
+    handled, see actors.activity.
+    """
+    actions = [action for message in messages
+               for action in (message if isinstance(message, Batch)
+                              else [message])
+               if isinstance(action, Action)]
+    for action in actions:
+        if action.shared is not None:
+            action.shared.release()
+            action.shared = None
+        if action.reply_to is not None:
+            try:
+                action.reply_to.put((action.action_id, None, error))
+            except (EOFError, OSError):
+                pass  # the caller is gone
+    # those of a batch that could not be loaded were counted already
+    activity.counters.add_dropped(actions)
+
+
+def dropped_for_room(message):
+    return MailboxFull(f"The mailbox of actor {message.actor_key} is full, "
+                       "the call was dropped")
+
+
+def classify(message, high_ids, split=False):
+    """The ``(priority, message)`` pairs to put in a mailbox for
+    *message*.
+
+    A batch is split in its actions when some of them could go first, or
+    if asked to *split* it.
+    """
+    if isinstance(message, Batch):
+        if not (high_ids or split):
+            return [(NORMAL, message)]
+        return [(priority_of(action, high_ids), action) for action in message]
+    return [(priority_of(message, high_ids), message)]
+
+
+class Mailbox(object):
+    """The pending messages of an actor, a FIFO queue per class.
+
+    *high_ids* are the IDs of the methods that have high priority. With a
+    *size*, at most that many normal messages are kept and the
+    *overflow* policy says what to do with the rest. It can be used by
+    many threads, :meth:`get` waits for a message.
+    """
+
+    def __init__(self, high_ids=frozenset(), size=None, overflow='block'):
+        self.high_ids = high_ids
+        self.size = size
+        self.overflow = overflow
+        self.classes = (deque(), deque(), deque())
+        lock = threading.Lock()
+        self.not_empty = threading.Condition(lock)
+        self.not_full = threading.Condition(lock)
+
+    def put(self, message):
+        """Add a message, with a size it may wait for room."""
+        bounded = self.size is not None
+        with self.not_empty:
+            for priority, item in classify(message, self.high_ids, bounded):
+                if bounded and priority == NORMAL and \
+                        not self._make_room(item):
+                    continue
+                self.classes[priority].append(item)
+            self.not_empty.notify()
+
+    append = put
+
+    def put_back(self, messages):
+        """Return normal *messages* that were taken but not handled, they
+        go first again."""
+        with self.not_empty:
+            self.classes[NORMAL].extendleft(reversed(messages))
+            self.not_empty.notify()
+
+    def get(self, lowest=NORMAL):
+        """Take the next message of class *lowest* or higher, waits until
+        there is one."""
+        with self.not_empty:
+            while not self.has(lowest):
+                self.not_empty.wait()
+            return self._take()
+
+    def popleft(self, lowest=NORMAL):
+        """Take the next message of class *lowest* or higher, there must
+        be one."""
+        with self.not_empty:
+            return self._take()
+
+    def has(self, lowest=NORMAL):
+        """Whether there are messages of class *lowest* or higher."""
+        return any(self.classes[:lowest + 1])
+
+    def take_all(self):
+        """Take every message, in the order they would be taken."""
+        with self.not_empty:
+            taken = [message for messages in self.classes
+                     for message in messages]
+            for messages in self.classes:
+                messages.clear()
+            self.not_full.notify_all()
+        return taken
+
+    def clear(self, error):
+        """Drop every message, the calls are never handled, the ones made
+        through ``.future`` get *error*."""
+        with self.not_empty:
+            for messages in self.classes:
+                drop(messages, error)
+                messages.clear()
+            self.not_full.notify_all()
+
+    def _make_room(self, message):
+        """Make room for a normal *message*, False if it is dropped."""
+        normal = self.classes[NORMAL]
+        while len(normal) >= self.size and not isinstance(message, Stop):
+            if self.overflow == 'drop_newest':
+                logger.debug(f"Mailbox full, dropping {message}")
+                drop([message], dropped_for_room(message))
+                return False
+            if self.overflow == 'drop_oldest':
+                if not isinstance(normal[0], Action):
+                    # a stop, what comes after it is lost
+                    drop([message], dropped_for_room(message))
+                    return False
+                logger.debug(f"Mailbox full, dropping {normal[0]}")
+                oldest = normal.popleft()
+                drop([oldest], dropped_for_room(oldest))
+            else:
+                # what we added so far can be taken meanwhile
+                self.not_empty.notify()
+                self.not_full.wait()
+        return True
+
+    def _take(self):
+        for messages in self.classes:
+            if messages:
+                if self.size is not None:
+                    self.not_full.notify()
+                return messages.popleft()
+
+    def __len__(self):
+        return sum(len(messages) for messages in self.classes)
+
+    def __bool__(self):
+        return any(self.classes)
+
+
+class BoundedQueue(object):
+    """The queue of an actor with the 'block' or 'raise' overflow policy,
+    as its senders and the actor see it.
+
+    *credits* is a semaphore with a credit for each normal call that can
+    wait for the actor. A sender takes one to put a normal call on the
+    queue, waiting for it, or raising MailboxFull if *raising*, and the
+    actor gives it back when it takes the call to run it. The queue
+    itself is not bounded, so the other messages are never held back.
+    The calls encoded by a serializer take a credit even to the methods
+    with high priority, their sender cannot tell.
+    """
+
+    def __init__(self, queue, credits, actor_key, high_ids=frozenset(),
+                 raising=False):
+        self.queue = queue
+        self.credits = credits
+        self.actor_key = actor_key
+        self.high_ids = high_ids
+        self.raising = raising
+        # in the process of the actor, the IDs of the calls whose credit
+        # it has to give back
+        self.owed = set()
+
+    def __reduce__(self):
+        return BoundedQueue, (self.queue, self.credits, self.actor_key,
+                              self.high_ids, self.raising)
+
+    def charged(self, message):
+        """Whether *message*, as it is on the queue, took a credit."""
+        if isinstance(message, Action):
+            return message.method_id not in self.high_ids
+        return isinstance(message, bytes)
+
+    def put(self, message, block=True):
+        if self.charged(message) and \
+                not self.credits.acquire(not self.raising):
+            raise MailboxFull(f"The mailbox of actor {self.actor_key} is "
+                              "full")
+        self.queue.put(message, block)
+
+    def get(self):
+        return self.queue.get()
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def arrived(self, data, message):
+        """The actor took *message* off the queue, where it was *data*."""
+        if self.charged(data):
+            self.owed.add(message.action_id)
+
+    def lost(self, data):
+        """Give back the credit of *data*, a call that could not be
+        loaded."""
+        if self.charged(data):
+            self.credits.release()
+
+    def settle(self, message):
+        """Give back the credit of *message*, that the actor takes to run
+        it."""
+        if isinstance(message, Action) and \
+                message.action_id in self.owed:
+            self.owed.discard(message.action_id)
+            self.credits.release()
@@ -0,0 +1,184 @@
+"""Per-actor and per-method metrics.
+
+Enabled with ``actors.start(metrics=True)``. Senders stamp every action
+with the time it was sent, and encode it (with the serializer of its
+role, or cloudpickle, see actors.serialization), so the receivers know
+its size as it travelled, plus its buffers in shared memory. The process
+running the actor records, per method, the number of calls, the
+queueing delay (from the send to the start of the call), the execution
+time and the bytes received. Every *metrics_interval* seconds
+each process publishes a snapshot of its actors, with their mailbox
+depth, to a manager dict that :func:`actors.metrics` reads.
+
+When disabled, actions carry no stamp and nothing is recorded.
+"""
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def stamp(action):
+    """Set the trace of an action that is about to be sent, its size is
+    set by the receiver, see sized."""
+    action.trace = (time.time(), 0)
+    if action.serializer is None:
+        action.serializer = 'cloudpickle'
+
+
+def sized(action, nbytes):
+    """Set the size of a stamped *action* that came in *nbytes*."""
+    if action.trace is not None:
+        if action.shared is not None:
+            nbytes += getattr(action.shared, 'size', 0)  # see actors.shm
+        action.trace = (action.trace[0], nbytes)
+    return action
+
+
+class MethodStats(object):
+    __slots__ = ('calls', 'exec_s', 'exec_max_s', 'queue_delay_s',
+                 'queue_delay_max_s', 'bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.exec_s = 0.0
+        self.exec_max_s = 0.0
+        self.queue_delay_s = 0.0
+        self.queue_delay_max_s = 0.0
+        self.bytes = 0
+
+    def snapshot(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ActorStats(object):
+    def __init__(self, method_names, depth):
+        self.method_names = method_names
+        self.depth = depth  # returns the number of pending messages
+        self.methods = {}  # by method ID
+
+    def snapshot(self):
+        try:
+            depth = self.depth()
+        except Exception:
+            depth = None
+        methods = {self.method_names[method_id]: stats.snapshot()
+                   for method_id, stats in self.methods.items()}
+        return {
+            'mailbox': depth,
+            'calls': sum(m['calls'] for m in methods.values()),
+            'exec_s': sum(m['exec_s'] for m in methods.values()),
+            'methods': methods,
+            'stopped': False,
+        }
+
+
+class Metrics(object):
+    """The metrics of the actors run by this process.
+
+    A daemon thread publishes them to the *board* (a manager dict) every
+    *interval* seconds.
+    """
+
+    def __init__(self, board, interval):
+        self.board = board
+        self.interval = interval
+        self.actors = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._publish_loop,
+                                       daemon=True)
+        self.thread.start()
+
+    def add_actor(self, actor_key, method_names, depth):
+        with self.lock:
+            self.actors[actor_key] = ActorStats(method_names, depth)
+
+    def remove_actor(self, actor_key):
+        """Stop tracking a stopped actor, its last snapshot stays."""
+        with self.lock:
+            stats = self.actors.pop(actor_key, None)
+            if stats is None:
+                return
+            snapshot = stats.snapshot()
+            snapshot['mailbox'] = 0
+            snapshot['stopped'] = True
+            try:
+                self.board[actor_key] = snapshot
+            except Exception as e:
+                logger.debug(f"Could not publish metrics: {e}")
+
+    def record(self, actor_key, action, started, exec_s):
+        """Account a call of *action* that *started* at that time.time()."""
+        stats = self.actors.get(actor_key)
+        if stats is None:
+            return
+        method = stats.methods.get(action.method_id)
+        if method is None:
+            method = stats.methods[action.method_id] = MethodStats()
+        method.calls += 1
+        method.exec_s += exec_s
+        method.exec_max_s = max(method.exec_max_s, exec_s)
+        if action.trace is not None:
+            sent, nbytes = action.trace
+            delay = max(0.0, started - sent)
+            method.queue_delay_s += delay
+            method.queue_delay_max_s = max(method.queue_delay_max_s, delay)
+            method.bytes += nbytes
+
+    def snapshot(self):
+        with self.lock:
+            return {key: stats.snapshot()
+                    for key, stats in self.actors.items()}
+
+    def publish(self):
+        # under the lock, so it cannot overwrite the last snapshot of an
+        # actor that is being removed
+        with self.lock:
+            snapshot = {key: stats.snapshot()
+                        for key, stats in self.actors.items()}
+            if snapshot:
+                self.board.update(snapshot)
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.debug(f"Could not publish metrics: {e}")
+
+
+class Dumper(object):
+    """Appends the snapshots on the *board* to the file at *path*.
+
+    Every *interval* seconds, as a JSON line with the time and the
+    metrics by actor key.
+    """
+
+    def __init__(self, board, path, interval):
+        self.board = board
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._dump_loop, daemon=True)
+        self.thread.start()
+
+    def dump(self):
+        line = json.dumps({'time': time.time(), 'actors': dict(self.board)})
+        with open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+    def stop(self):
+        """Stop dumping, after a last dump."""
+        self.stopped.set()
+        self.thread.join()
+        self.dump()
+
+    def _dump_loop(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.dump()
+            except Exception as e:
+                logger.warning(f"Could not dump metrics: {e}")
@@ -0,0 +1,136 @@
+"""Moving running actors to other workers.
+
+:func:`actors.migrate` moves an actor to another worker (see
+actors.scheduler), to take a busy actor off a loaded one, like the ones
+with the most calls or the fullest mailboxes in
+:func:`actors.get_metrics`::
+
+    actors.migrate(hot_actor)            # to the best other worker
+    actors.migrate(hot_actor, worker=3)  # to that one
+
+It does not wait. The director puts a :class:`Migrate` on the queue of
+the actor, a system message (see actors.mailbox), and its process:
+
+1. Takes it once the call the actor is running ends, the actor runs no
+   more calls there.
+2. Pickles the state of the actor, the same fields as a checkpoint (see
+   actors.checkpoint).
+3. Sends the state, and the calls waiting in its mailbox, to the new
+   worker, which creates the actor with ``__new__``, without running
+   its ``__init__``, gives it the state (or to its ``__setstate__``),
+   and then the calls. When some fields could not be pickled, the new
+   worker runs ``__init__`` first, with the arguments the actor was
+   created with, and those fields keep what it gave them.
+4. Points the directory of the actors to the new worker, and forwards
+   there the calls that still come to the old one, from the processes
+   that had its route, so each sender's calls keep their order. Unless
+   the actor moves back before the calls forwarded to it arrive, these
+   may then come after newer calls.
+5. The director tells the driver and every process that runs actors.
+   Those that had the old route put a :class:`Drain` on it, hold what
+   they send to the actor meanwhile (see :class:`Reroute`), and once
+   the drain reaches the actor's worker, they send it all by the new
+   route. The old worker forwards only the calls that were on their
+   way; if it is started again, it gets the actors that left it, to
+   forward what still comes for them.
+
+An actor with a process of its own hands its queue to the new worker,
+which reads it from then on, and the process ends. Actors with async
+methods, with a bounded mailbox, or that failed cannot be moved; nor
+the ones with a process of their own, with the ``peer_channels`` option.
+
+Where to move an actor by default follows its placement options (see
+actors.placement), the actor leaves the actors co-located with it.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Migrate(object):
+    """Ask the process of the actor with *actor_key* to move it to the
+    *worker* at that index."""
+    __slots__ = ('actor_key', 'worker')
+
+    def __init__(self, actor_key, worker):
+        self.actor_key = actor_key
+        self.worker = worker
+
+    def __reduce__(self):
+        return Migrate, (self.actor_key, self.worker)
+
+    def __repr__(self):
+        return f"Migrate({self.actor_key}, {self.worker})"
+
+
+class Migrated(object):
+    """Tells the director that the actor with *actor_key* moved to the
+    *worker* at that index."""
+    __slots__ = ('actor_key', 'worker')
+
+    def __init__(self, actor_key, worker):
+        self.actor_key = actor_key
+        self.worker = worker
+
+    def __reduce__(self):
+        return Migrated, (self.actor_key, self.worker)
+
+    def __repr__(self):
+        return f"Migrated({self.actor_key}, {self.worker})"
+
+
+class Drain(object):
+    """Follows the last messages a process sent to the actor with
+    *actor_key* by its old route. The worker it reaches, once forwarded
+    like them, replies on *reply_to* to the call *action_id*."""
+    __slots__ = ('actor_key', 'reply_to', 'action_id')
+
+    def __init__(self, actor_key, reply_to, action_id):
+        self.actor_key = actor_key
+        self.reply_to = reply_to
+        self.action_id = action_id
+
+    def __reduce__(self):
+        return Drain, (self.actor_key, self.reply_to, self.action_id)
+
+    def __repr__(self):
+        return f"Drain({self.actor_key}, {self.action_id})"
+
+    def done(self):
+        self.reply_to.put((self.action_id, None, None))
+
+
+class Reroute(object):
+    """The route of a process to the actor with *actor_key*, that moved,
+    while its :class:`Drain` is on the way.
+
+    What the process sends to the actor meanwhile waits here, and goes
+    in order on :meth:`release`, by the route *resolve* gives then.
+    """
+
+    def __init__(self, actor_key, resolve):
+        self.actor_key = actor_key
+        self.resolve = resolve
+        self.held = []
+        self.released = False
+        self.lock = threading.Lock()
+
+    def put(self, message, block=True):
+        with self.lock:
+            if not self.released:
+                self.held.append(message)
+                return
+        self.resolve(self.actor_key).put(message)
+
+    def release(self):
+        with self.lock:
+            try:
+                route = self.resolve(self.actor_key)
+                for message in self.held:
+                    route.put(message)
+            except Exception as e:
+                logger.error(f"Could not send {len(self.held)} messages to "
+                             f"moved actor {self.actor_key}: {e!r}")
+            self.held = []
+            self.released = True
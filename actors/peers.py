@@ -0,0 +1,274 @@
+"""Direct channels between processes, bypassing the shared queues.
+
+Enabled with ``actors.start(peer_channels=True)``. Every process that
+runs actors listens on a socket and publishes its endpoint for each of
+its actors. The first message a process sends to an actor opens a
+channel to the process of that actor, or reuses the one it already has,
+and the following messages go through it instead of through the queue
+(a broker round trip with the Redis backend). Actors that cannot be
+reached, like those that have not published their endpoint yet, still
+get their messages through the queue.
+
+Messages from the same sender keep their order when it switches from the
+queue to a channel: the sender puts a :class:`Switch` on the queue and
+on the channel, and the receiver holds what comes after it on the
+channel until the one on the queue arrives.
+"""
+import itertools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from multiprocessing.connection import (Connection, Listener,
+                                        answer_challenge, deliver_challenge)
+
+from actors.serialization import (drop_unreadable, dumps_message,
+                                  loads_message)
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for a peer to accept a connection.
+CONNECT_TIMEOUT = 5
+# Seconds between retries to reach an actor that we could not reach.
+RETRY_INTERVAL = 0.5
+# Connections waiting to be accepted, many peers may connect at once.
+BACKLOG = 128
+
+
+class PeerDirectory(object):
+    """The endpoints of the actors, by actor key, shared by all processes.
+
+    Each endpoint is an ``(address, peer_id)`` tuple. Connections are
+    authenticated with *authkey*.
+    """
+
+    def __init__(self, endpoints, authkey=None):
+        self.endpoints = endpoints  # a manager dict
+        self.authkey = authkey or os.urandom(32)
+
+    def __reduce__(self):
+        return PeerDirectory, (self.endpoints, self.authkey)
+
+
+class Switch(object):
+    """Marks where the messages of *sender* to *actor_key* move from the
+    queue to a channel, the *seq* tells apart the switches of the same
+    sender."""
+    __slots__ = ('sender', 'seq', 'actor_key')
+
+    def __init__(self, sender, seq, actor_key=None):
+        self.sender = sender
+        self.seq = seq
+        self.actor_key = actor_key
+
+    def __reduce__(self):
+        return Switch, (self.sender, self.seq, self.actor_key)
+
+    def __repr__(self):
+        return f"Switch({self.sender}, {self.seq})"
+
+
+class PeerListener(object):
+    """Accepts channels from other processes.
+
+    Every message received is given to *deliver*, from the thread that
+    reads its channel.
+    """
+
+    def __init__(self, directory, host, deliver):
+        self.directory = directory
+        self.deliver = deliver
+        self.peer_id = uuid.uuid4().hex
+        self.listener = Listener((host, 0), backlog=BACKLOG,
+                                 authkey=directory.authkey)
+        self.endpoint = (self.listener.address, self.peer_id)
+        self.switches = {}  # by (sender, seq), set when seen on the queue
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def publish(self, actor_key):
+        """Let the others reach the actor with *actor_key* through us."""
+        self.directory.endpoints[actor_key] = self.endpoint
+
+    def unpublish(self, actor_key):
+        self.directory.endpoints.pop(actor_key, None)
+
+    def switched(self, switch):
+        """The *switch* came through the queue."""
+        self._switch_event(switch).set()
+
+    def _switch_event(self, switch):
+        with self.lock:
+            key = (switch.sender, switch.seq)
+            event = self.switches.get(key)
+            if event is None:
+                event = self.switches[key] = threading.Event()
+            return event
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+            except OSError as e:
+                logger.debug(f"Not accepting more peers: {e}")
+                return
+            threading.Thread(target=self._serve, args=(conn,),
+                             daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            # the peer must be reaching us and not another process that
+            # once had our address
+            conn.send_bytes(self.peer_id.encode())
+            while True:
+                data = conn.recv_bytes()
+                try:
+                    message = loads_message(data)
+                except Exception as e:
+                    drop_unreadable(data, e)
+                    continue
+                if isinstance(message, Switch):
+                    self._switch_event(message).wait()
+                    with self.lock:
+                        del self.switches[(message.sender, message.seq)]
+                else:
+                    self.deliver(message)
+        except (EOFError, OSError):
+            pass  # the peer is gone
+        finally:
+            conn.close()
+
+
+class PeerRoute(object):
+    """Puts the messages for one actor on a channel.
+
+    Falls back to the *queue* of the actor if the channel breaks.
+    """
+
+    def __init__(self, peers, channel, actor_key, queue):
+        self.peers = peers
+        self.channel = channel
+        self.actor_key = actor_key
+        self.queue = queue
+
+    def put(self, message):
+        try:
+            self.channel.send(message)
+        except OSError as e:
+            logger.debug(f"Channel to {self.actor_key} broken: {e}")
+            self.peers.drop(self.channel)
+            self.queue.put(message)
+
+
+class PeerChannel(object):
+    """A connection to another process, used by any thread."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        data = dumps_message(message)
+        with self.lock:
+            self.connection.send_bytes(data)
+
+    def close(self):
+        self.connection.close()
+
+
+class Peers(object):
+    """The channels this process opened to other processes."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.sender = uuid.uuid4().hex
+        self.seqs = itertools.count(1)
+        self.channels = {}  # by peer ID
+        self.routes = {}  # by actor key
+        self.retry_at = {}  # by actor key, for the ones we could not reach
+        self.lock = threading.Lock()
+
+    def route(self, actor_key, resolve_queue):
+        """The route to *actor_key*, or None to use its queue.
+
+        *resolve_queue* gives the queue of an actor key.
+        """
+        route = self.routes.get(actor_key)
+        if route is not None:
+            return route
+        retry_at = self.retry_at.get(actor_key)
+        if retry_at is not None and time.monotonic() < retry_at:
+            return None
+        with self.lock:
+            route = self.routes.get(actor_key)
+            if route is None:
+                route = self._open_route(actor_key, resolve_queue)
+            if route is None:
+                self.retry_at[actor_key] = time.monotonic() + RETRY_INTERVAL
+            else:
+                self.retry_at.pop(actor_key, None)
+            return route
+
+    def forget(self, actor_key):
+        self.routes.pop(actor_key, None)
+        self.retry_at.pop(actor_key, None)
+
+    def drop(self, channel):
+        """Stop using a broken *channel*."""
+        with self.lock:
+            for peer_id, known in list(self.channels.items()):
+                if known is channel:
+                    del self.channels[peer_id]
+            for key, route in list(self.routes.items()):
+                if route.channel is channel:
+                    del self.routes[key]
+        channel.close()
+
+    def close(self):
+        with self.lock:
+            for channel in self.channels.values():
+                channel.close()
+            self.channels.clear()
+            self.routes.clear()
+
+    def _open_route(self, actor_key, resolve_queue):
+        endpoint = self.directory.endpoints.get(actor_key)
+        if endpoint is None:
+            return None
+        address, peer_id = endpoint
+        channel = self.channels.get(peer_id)
+        if channel is None:
+            channel = self._connect(address, peer_id)
+            if channel is None:
+                return None
+            self.channels[peer_id] = channel
+        queue = resolve_queue(actor_key)
+        switch = Switch(self.sender, next(self.seqs), actor_key)
+        try:
+            channel.send(switch)
+        except OSError:
+            self.channels.pop(peer_id, None)
+            channel.close()
+            return None
+        queue.put(switch)
+        route = self.routes[actor_key] = PeerRoute(self, channel, actor_key,
+                                                   queue)
+        return route
+
+    def _connect(self, address, peer_id):
+        try:
+            sock = socket.create_connection(address, CONNECT_TIMEOUT)
+            sock.settimeout(None)
+            connection = Connection(sock.detach())
+            answer_challenge(connection, self.directory.authkey)
+            deliver_challenge(connection, self.directory.authkey)
+            if connection.recv_bytes().decode() != peer_id:
+                connection.close()
+                return None
+        except Exception as e:
+            logger.debug(f"Could not connect to peer {peer_id}: {e}")
+            return None
+        return PeerChannel(connection)
@@ -0,0 +1,192 @@
+"""Where the actors run, from the placement options of their role.
+
+With workers (see actors.scheduler) the director hosts every new actor
+on one of them, by default the one with the fewest actors. The role
+options of ``@actors.remote`` change that:
+
+- ``pool``: the workers are in pools, the default one, with the
+  ``workers`` option of :func:`actors.start`, and the named ones of the
+  ``pools`` option (like ``pools={'big': 2}``). The actors of a role
+  with a pool only go to its workers.
+- ``spread``: put the actors of the role on different workers, the one
+  with the fewest actors of the role first.
+- ``memory`` (MB) and ``cpus``: what each actor needs. Each worker has
+  ``worker_memory`` MB and ``worker_cpus`` CPUs (None for no limit), and
+  only takes the actors that fit.
+
+And for a single actor, given when creating it::
+
+    pinger = Pinger.remote()
+    ponger = Ponger.options(colocate=pinger).remote()
+
+``colocate`` puts it on the worker of another actor, so their calls
+never leave the process: a worker hands the calls between its own
+actors to them directly, without going through the queues.
+``Role.options`` also takes the options above, for that actor.
+
+An actor that no worker of the default pool has room for gets a process
+of its own, like the actors with a bounded mailbox (see actors.mailbox)
+and the ones to co-locate with an actor that has its own process. When
+no worker of its pool has room, an actor pinned to the pool goes to the
+one with the fewest actors anyway.
+
+The actors created by other actors (see actors.director.spawn_actors) go
+to a worker of their pool chosen by the hash of their key, or to the
+worker of the actor to co-locate with when it is the one creating them;
+their memory and cpus are not checked.
+"""
+import logging
+import zlib
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL = 'default'
+# The options of Role.options(), the role options about placement and
+# the actor to co-locate with.
+PLACEMENT_OPTIONS = ('pool', 'spread', 'memory', 'cpus', 'colocate')
+
+
+def worker_pools(workers, pools=None):
+    """The pool of each worker, the *workers* of the default pool first,
+    then those of the named *pools* (numbers of workers by name)."""
+    names = [DEFAULT_POOL] * workers
+    for name, size in (pools or {}).items():
+        if name == DEFAULT_POOL:
+            raise ValueError(f"The pool '{DEFAULT_POOL}' is the one of the "
+                             "workers option")
+        names.extend([name] * size)
+    return names
+
+
+def check_pool(options, pools):
+    """Raise ValueError if the pool of the actors with *options* is not
+    one of *pools*, the pool of each worker."""
+    pool = options['pool']
+    if pool is not None and pool not in pools:
+        raise ValueError(f"There is no worker pool '{pool}', the pools "
+                         f"are: {', '.join(sorted(set(pools)))}")
+
+
+def hashed_worker(actor_key, pools, pool=None):
+    """The worker of the *pool* for *actor_key* by its hash, or None if
+    the pool has no workers."""
+    workers = [worker for worker, name in enumerate(pools)
+               if name == (pool or DEFAULT_POOL)]
+    if not workers:
+        return None
+    return workers[zlib.crc32(actor_key.encode()) % len(workers)]
+
+
+class Placer(object):
+    """Chooses the worker of each new actor, in the director.
+
+    *pools* has the pool of each worker, see worker_pools, and *memory*
+    and *cpus* are what each worker has, None for no limit.
+    """
+
+    def __init__(self, pools, memory=None, cpus=None):
+        self.pools = pools
+        self.memory = memory
+        self.cpus = cpus
+        self.placement = {}  # worker of each hosted actor, by actor key
+        self.needs = {}  # (class_id, memory, cpus) of each, by actor key
+        self.load = [0] * len(pools)  # number of actors of each worker
+        self.used_memory = [0] * len(pools)
+        self.used_cpus = [0] * len(pools)
+        self.roles = [Counter() for _ in pools]  # actors of each role
+
+    def place(self, actor_key, class_id, options):
+        """Choose the worker of a new actor, and count it there.
+
+        None when it needs a process of its own.
+        """
+        colocate = options.get('colocate')
+        if colocate is not None:
+            worker = self.placement.get(colocate)
+            if worker is None:
+                logger.warning(f"Actor {colocate} is not on a worker, "
+                               f"{actor_key} cannot run with it")
+                return None
+        else:
+            worker = self._choose(class_id, options)
+            if worker is None:
+                return None
+        self.add(actor_key, worker, class_id, options)
+        return worker
+
+    def _choose(self, class_id, options):
+        pool = options['pool'] or DEFAULT_POOL
+        workers = [worker for worker, name in enumerate(self.pools)
+                   if name == pool]
+        fitting = [worker for worker in workers
+                   if self._fits(worker, options)]
+        if not fitting:
+            if options['pool'] is None:
+                return None
+            logger.warning(f"No worker of pool '{pool}' has room for an "
+                           f"actor of {class_id}, overloading one")
+            fitting = workers
+        return self._best(fitting, class_id, options)
+
+    def _best(self, workers, class_id, options):
+        if options['spread']:
+            return min(workers, key=lambda worker: (
+                self.roles[worker][class_id], self.load[worker]))
+        return min(workers, key=self.load.__getitem__)
+
+    def move_target(self, actor_key, class_id, options):
+        """The worker of the pool of an actor to move it to, other than
+        its own, or None if no other has room."""
+        current = self.placement.get(actor_key)
+        pool = options['pool'] or DEFAULT_POOL
+        fitting = [worker for worker, name in enumerate(self.pools)
+                   if name == pool and worker != current and
+                   self._fits(worker, options)]
+        if not fitting:
+            return None
+        return self._best(fitting, class_id, options)
+
+    def _fits(self, worker, options):
+        memory, cpus = options['memory'], options['cpus']
+        if memory and self.memory is not None and \
+                self.used_memory[worker] + memory > self.memory:
+            return False
+        if cpus and self.cpus is not None and \
+                self.used_cpus[worker] + cpus > self.cpus:
+            return False
+        return True
+
+    def add(self, actor_key, worker, class_id, options):
+        """Count the actor with *actor_key* on *worker*."""
+        self.remove(actor_key)
+        memory, cpus = options['memory'] or 0, options['cpus'] or 0
+        self.placement[actor_key] = worker
+        self.needs[actor_key] = (class_id, memory, cpus)
+        self.load[worker] += 1
+        self.used_memory[worker] += memory
+        self.used_cpus[worker] += cpus
+        self.roles[worker][class_id] += 1
+
+    def release(self, actor_key):
+        """Stop counting the actor with *actor_key*, that stopped, but
+        remember its worker, where it goes if it is respawned."""
+        needs = self.needs.pop(actor_key, None)
+        if needs is None:
+            return
+        worker = self.placement[actor_key]
+        class_id, memory, cpus = needs
+        self.load[worker] -= 1
+        self.used_memory[worker] -= memory
+        self.used_cpus[worker] -= cpus
+        self.roles[worker][class_id] -= 1
+
+    def remove(self, actor_key):
+        """Forget the actor with *actor_key*."""
+        self.release(actor_key)
+        self.placement.pop(actor_key, None)
+
+    def hosted_by(self, worker):
+        """The keys of the actors on *worker*."""
+        return [key for key, placed in self.placement.items()
+                if placed == worker]
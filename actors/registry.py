@@ -0,0 +1,99 @@
+"""Registry of the roles known by this process, by class ID.
+
+Proxies and actions only carry a class ID and a method ID on the wire;
+the method names and signatures are looked up here. The director shares
+every role that has actors through a manager dict, so that processes
+that never imported a role can still resolve it (only the first time,
+it is cached afterwards).
+"""
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+roles = {}
+# module and qualified name of the class of each role defined here
+origins = {}
+# manager dict with the roles of the running actors, set by the director
+shared_roles = None
+published = set()
+# functions the runtime adds as methods to every role, by name, see
+# actors.actor.enrich_class
+runtime_methods = {}
+
+
+class RoleInfo(object):
+    """What a process needs to know to talk with actors of a role.
+
+    Methods are identified by their index in *method_names*.
+    """
+    __slots__ = ('class_id', 'class_name', 'method_names', 'method_ids',
+                 'signatures', 'serializer')
+
+    def __init__(self, class_id, class_name, signatures, method_names,
+                 serializer=None):
+        self.class_id = class_id
+        self.class_name = class_name
+        self.signatures = signatures
+        self.method_names = method_names
+        self.serializer = serializer  # its name, see actors.serialization
+        self.method_ids = {name: method_id for method_id, name
+                           in enumerate(self.method_names)}
+
+    def __reduce__(self):
+        return RoleInfo, (self.class_id, self.class_name, self.signatures,
+                          self.method_names, self.serializer)
+
+    def bind(self, instance):
+        """The dispatch table of *instance*: its bound methods by ID.
+
+        Methods the instance lacks get None, unless the runtime adds them
+        (see runtime_methods).
+        """
+        return tuple(self._bind(instance, method_name)
+                     for method_name in self.method_names)
+
+    @staticmethod
+    def _bind(instance, method_name):
+        method = getattr(instance, method_name, None)
+        if method is None and method_name in runtime_methods:
+            method = functools.partial(runtime_methods[method_name],
+                                       instance)
+        return method
+
+    def __repr__(self):
+        return f"RoleInfo({self.class_id})"
+
+
+def register(role, origin):
+    """Register a role defined (decorated) in this process, from the
+    class named *origin* (its module and qualified name).
+
+    Defining that class again replaces the role, but another class with
+    the same class ID raises ValueError: proxies could not tell them
+    apart.
+    """
+    known = origins.get(role.class_id)
+    if known is not None and known != origin:
+        raise ValueError(f"Class ID {role.class_id!r} of {origin} is "
+                         f"already the one of {known}, give it another "
+                         f"class_id")
+    roles[role.class_id] = role
+    origins[role.class_id] = origin
+
+
+def publish(role):
+    """Make the role known to every process."""
+    if role.class_id not in published:
+        shared_roles[role.class_id] = role
+        published.add(role.class_id)
+
+
+def lookup(class_id):
+    try:
+        return roles[class_id]
+    except KeyError:
+        if shared_roles is None:
+            raise KeyError(f"Unknown role {class_id}") from None
+        role = roles[class_id] = shared_roles[class_id]
+        return role
@@ -0,0 +1,369 @@
+"""Replica sets: many actors of a stateless role behind one proxy.
+
+A role whose calls need no state kept between them (or only a cache)
+can run as many replicas, with the ``replicas`` role option::
+
+    @actors.remote(replicas=4, max_replicas=16)
+    class DataWorker(object):
+        ...
+
+    workers = DataWorker.remote()           # a ReplicaSet
+    workers.process.remote(batch)           # to the least loaded replica
+
+``Role.remote()`` creates that many actors, spread over the workers
+(see actors.placement), and returns a :class:`ReplicaSet`, a proxy that
+sends each call to the replica with the fewest calls waiting in its
+mailbox. The processes of the replicas report those depths to a board
+shared by all, every ``replica_interval`` seconds, and each process
+reads it at most that often, adding the calls it sent since, so a burst of
+calls goes round the replicas. Calls from the same sender can go to
+different replicas, so they are not run in order.
+
+With ``max_replicas`` the set grows, a replica at a time, while more
+than SCALE_UP_DEPTH calls wait per replica on average, up to that many,
+and shrinks back to ``replicas`` when no call waited for IDLE_CHECKS
+checks in a row. A replica that leaves the set stops after the calls
+sent to it, once no sender can pick it anymore. Only the sets created
+from the driver scale.
+
+A replica set can be sent to other actors, like a proxy, and
+``pls_stop()`` stops all its replicas. ``ReplicaSet._replicas`` has the
+proxies of the replicas, to supervise them (see actors.supervision) or
+to call all of them with an ActorGroup.
+"""
+import logging
+import threading
+import time
+import uuid
+
+import actors
+from actors import registry
+from actors.actor import ActorProxy, create_actors
+
+logger = logging.getLogger(__name__)
+
+# Average number of calls waiting per replica above which a set with
+# max_replicas gets one more.
+SCALE_UP_DEPTH = 4
+# Checks in a row without calls waiting after which a set loses one
+# replica, down to its replicas option.
+IDLE_CHECKS = 20
+# Checks between the removal of a replica from its set and its stop, so
+# that every sender saw it go.
+RETIRE_CHECKS = 5
+
+# shared by all the processes, see set_up
+board = None
+view = None
+reporter = None
+
+
+class ReplicaBoard(object):
+    """The actor keys of the replicas of each set, by set key, and the
+    mailbox depth of each replica, by actor key, in *members* and *loads*
+    (manager dicts)."""
+
+    def __init__(self, members, loads):
+        self.members = members
+        self.loads = loads
+
+    def __reduce__(self):
+        return ReplicaBoard, (self.members, self.loads)
+
+
+class View(object):
+    """What this process knows of the *board*, read again at most every
+    *interval* seconds, for all the replica sets at once."""
+
+    def __init__(self, board, interval):
+        self.board = board
+        self.interval = interval
+        self.members = {}
+        self.loads = {}
+        self.refreshed = None  # time.monotonic() of the last read
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        now = time.monotonic()
+        if self.refreshed is not None and \
+                now - self.refreshed < self.interval:
+            return
+        with self.lock:
+            if self.refreshed is not None and \
+                    now - self.refreshed < self.interval:
+                return
+            try:
+                self.members = self.board.members.copy()
+                self.loads = self.board.loads.copy()
+            except (EOFError, OSError) as e:
+                logger.debug(f"Could not read the replica loads: {e}")
+            self.refreshed = now
+
+
+class Reporter(object):
+    """Publishes the mailbox depth of the replicas run by this process to
+    the *board*, every *interval* seconds from a daemon thread."""
+
+    def __init__(self, board, interval):
+        self.board = board
+        self.interval = interval
+        self.depths = {}  # functions that return them, by actor key
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._publish_loop,
+                                       daemon=True)
+        self.thread.start()
+
+    def track(self, actor_key, depth):
+        with self.lock:
+            self.depths[actor_key] = depth
+
+    def untrack(self, actor_key):
+        with self.lock:
+            if self.depths.pop(actor_key, None) is None:
+                return
+            try:
+                self.board.loads.pop(actor_key, None)
+            except (EOFError, OSError):
+                pass  # shutting down
+
+    def publish(self):
+        with self.lock:
+            loads = {}
+            for key, depth in self.depths.items():
+                try:
+                    loads[key] = depth()
+                except Exception:
+                    continue
+            if loads:
+                self.board.loads.update(loads)
+
+    def _publish_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.debug(f"Could not publish the replica loads: {e}")
+
+
+def set_up(replica_board, interval):
+    """Use the *replica_board* of the runtime in this process."""
+    global board, view, reporter
+    board = replica_board
+    view = View(replica_board, interval)
+    reporter = None  # the one of the parent, if forked, is not running
+
+
+def track(actor_key, depth):
+    """Report the mailbox *depth* (a function) of the replica with
+    *actor_key*, run by this process."""
+    global reporter
+    if reporter is None:
+        reporter = Reporter(board, view.interval)
+    reporter.track(actor_key, depth)
+
+
+def untrack(actor_key):
+    if reporter is not None:
+        reporter.untrack(actor_key)
+
+
+class ReplicaSet(ActorProxy):
+    """The proxy of a replica set with *set_key*, see the module
+    docstring.
+
+    *members* are the actor keys of its replicas when the proxy was made,
+    it follows the ones added and removed later.
+    """
+
+    def __init__(self, set_key, role, members):
+        super().__init__(set_key, role)
+        self._thtr_members = tuple(members)
+        self._thtr_sent = {}  # calls sent to each since the last read
+        self._thtr_refreshed = None
+        self.pls_stop = self._thtr_stop
+
+    def _thtr_refresh(self):
+        """The mailbox depths of the replicas, and their keys up to
+        date."""
+        if view is None:
+            return {}
+        view.refresh()
+        if view.refreshed != self._thtr_refreshed:
+            self._thtr_refreshed = view.refreshed
+            self._thtr_members = view.members.get(self._thtr_actor_key,
+                                                  self._thtr_members)
+            self._thtr_sent = {}
+        return view.loads
+
+    def _thtr_next_key(self):
+        loads = self._thtr_refresh()
+        sent = self._thtr_sent
+        actor_key = min(self._thtr_members,
+                        key=lambda key: loads.get(key, 0) + sent.get(key, 0))
+        sent[actor_key] = sent.get(actor_key, 0) + 1
+        return actor_key
+
+    def _thtr_stop(self, now=False):
+        stop_replica_set(self._thtr_actor_key, self._thtr_members, now)
+
+    @property
+    def _replicas(self):
+        self._thtr_refresh()
+        return [ActorProxy(key, self._thtr_role)
+                for key in self._thtr_members]
+
+    @staticmethod
+    def _from_parts(set_key, class_id, members):
+        return ReplicaSet(set_key, registry.lookup(class_id), members)
+
+    def __reduce__(self):
+        return ReplicaSet._from_parts, (self._thtr_actor_key,
+                                        self._thtr_class_id,
+                                        self._thtr_members)
+
+    def __repr__(self):
+        return (f"ReplicaSet({self._thtr_class_name}, {self._actor_key}, "
+                f"{len(self._thtr_members)} replicas)")
+
+
+def replica_options(options, set_key):
+    """The role options of the replicas of a set with *options*."""
+    member_options = dict(options, replicas=None, max_replicas=None,
+                          spread=True)
+    member_options['replica_of'] = set_key
+    return member_options
+
+
+def create_replica_set(meta, args, kwargs, options):
+    """Create a replica set of the role of *meta*, with its role
+    *options*, and return its proxy."""
+    if board is None:
+        raise Exception("Not started, can't create actor")
+    set_key = f"{meta.class_id}:set:{uuid.uuid4()}"
+    member_options = replica_options(options, set_key)
+    members = [proxy._thtr_actor_key for proxy in create_actors(
+        meta, options['replicas'], args, kwargs, member_options)]
+    board.members[set_key] = tuple(members)
+    if options['max_replicas'] is not None and \
+            options['max_replicas'] > options['replicas']:
+        director = actors.director.global_director
+        if director is None:
+            logger.warning(f"Replica set {set_key} was not created from the "
+                           f"driver, it will not scale")
+        else:
+            director.autoscale(ScaledSet(set_key, meta, args, kwargs,
+                                         member_options, members,
+                                         options['replicas'],
+                                         options['max_replicas']))
+    return ReplicaSet(set_key, meta.role, members)
+
+
+def stop_replica_set(set_key, members, now=False):
+    """Stop the replicas of the set with *set_key*, *members* if it is
+    not on the board anymore."""
+    try:
+        members = board.members.pop(set_key, None) or members
+    except (EOFError, OSError):
+        pass  # shutting down, stop the ones we know
+    director = actors.director.global_director
+    if director is not None and director.autoscaler is not None:
+        members = tuple(members) + director.autoscaler.forget(set_key)
+    for actor_key in members:
+        actors.director.send_stop(actor_key, now)
+
+
+class ScaledSet(object):
+    """A replica set with *set_key* of the role of *meta* that scales
+    between *least* and *most* replicas, created with *args*, *kwargs*
+    and *options*. *members* are the keys of its replicas."""
+
+    def __init__(self, set_key, meta, args, kwargs, options, members,
+                 least, most):
+        self.set_key = set_key
+        self.meta = meta
+        self.args = args
+        self.kwargs = kwargs
+        self.options = options
+        self.members = list(members)
+        self.least = least
+        self.most = most
+        self.idle_checks = 0
+        self.retiring = {}  # checks left before stopping them, by key
+
+    def check(self, loads):
+        """Add or remove a replica after the *loads* (the mailbox depths
+        by actor key), returns the keys of the replicas to stop now."""
+        stopping = []
+        for key in list(self.retiring):
+            self.retiring[key] -= 1
+            if self.retiring[key] <= 0:
+                del self.retiring[key]
+                stopping.append(key)
+        waiting = sum(loads.get(key, 0) for key in self.members)
+        if waiting > SCALE_UP_DEPTH * len(self.members) and \
+                len(self.members) < self.most:
+            self.idle_checks = 0
+            proxy, = create_actors(self.meta, 1, self.args, self.kwargs,
+                                   self.options)
+            self.members.append(proxy._thtr_actor_key)
+            board.members[self.set_key] = tuple(self.members)
+            logger.info(f"Replica set {self.set_key} grew to "
+                        f"{len(self.members)} replicas")
+        elif waiting == 0 and len(self.members) > self.least:
+            self.idle_checks += 1
+            if self.idle_checks >= IDLE_CHECKS:
+                self.idle_checks = 0
+                self.retiring[self.members.pop()] = RETIRE_CHECKS
+                board.members[self.set_key] = tuple(self.members)
+                logger.info(f"Replica set {self.set_key} shrank to "
+                            f"{len(self.members)} replicas")
+        else:
+            self.idle_checks = 0
+        return stopping
+
+
+class Autoscaler(object):
+    """Scales the replica sets with max_replicas, every *interval*
+    seconds from a thread of the driver, after the loads on the
+    *board*."""
+
+    def __init__(self, board, interval):
+        self.board = board
+        self.interval = interval
+        self.sets = {}  # ScaledSet by set key
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, scaled):
+        with self.lock:
+            self.sets[scaled.set_key] = scaled
+
+    def forget(self, set_key):
+        """Stop scaling the set with *set_key*, returns the keys of its
+        replicas that were about to stop."""
+        with self.lock:
+            scaled = self.sets.pop(set_key, None)
+        if scaled is None:
+            return ()
+        return tuple(scaled.retiring)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def check(self):
+        loads = self.board.loads.copy()
+        with self.lock:
+            for scaled in list(self.sets.values()):
+                for actor_key in scaled.check(loads):
+                    actors.director.send_stop(actor_key)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error scaling the replica sets")
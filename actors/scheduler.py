@@ -0,0 +1,133 @@
+import logging
+from collections import deque
+
+from actors.actor import Stop
+from actors.mailbox import NORMAL, SYSTEM, Mailbox, drop
+
+logger = logging.getLogger(__name__)
+
+
+class Spawn(object):
+    """Ask a worker to create and host a new actor.
+
+    An actor that moves from another process (see actors.migration)
+    brings its *state*, its fields pickled one by one, the *pending*
+    messages of its mailbox, its *queue* if it had one of its own, and
+    the names of the fields *missing* from the state, that could not be
+    pickled.
+    """
+
+    def __init__(self, actor_type, weak_ref, args, kwargs, role_options,
+                 state=None, pending=(), queue=None, missing=()):
+        self.actor_type = actor_type
+        self.weak_ref = weak_ref
+        self.args = args
+        self.kwargs = kwargs
+        self.role_options = role_options
+        self.state = state
+        self.pending = pending
+        self.queue = queue
+        self.missing = missing
+
+    @property
+    def actor_key(self):
+        return self.weak_ref._thtr_actor_key
+
+    def __repr__(self):
+        return f"Spawn({self.actor_key})"
+
+
+class Spawned(object):
+    """Tells the director about the actors an actor created from the
+    *spawns*: the *queues* of those with a process of their own and the
+    *placement* of the others on the workers, by actor key."""
+
+    def __init__(self, spawns, queues, placement):
+        self.spawns = spawns
+        self.queues = queues
+        self.placement = placement
+
+    def __repr__(self):
+        return f"Spawned({len(self.spawns)})"
+
+
+class ActorCell(object):
+    """An actor instance, with its own mailbox when hosted by a worker.
+
+    *dispatch* has the bound methods of the instance, by method ID, and
+    *high_ids* the IDs of the ones with high priority, see actors.mailbox.
+    A failed actor only takes system messages, until it is restarted from
+    its *spec*, see actors.supervision.
+    """
+
+    def __init__(self, key, instance, dispatch, high_ids=frozenset()):
+        self.key = key
+        self.instance = instance
+        self.dispatch = dispatch
+        self.mailbox = Mailbox(high_ids)
+        self.async_actor = None  # see actors.aio
+        self.checkpointer = None  # see actors.checkpoint
+        self.credits = None  # its BoundedQueue, see actors.mailbox
+        self.spec = None  # (actor_type, weak_ref, args, kwargs)
+        self.role_options = None
+        self.failed = False
+
+    def runnable(self):
+        """Whether the actor has a message it can take now."""
+        return self.mailbox.has(SYSTEM if self.failed else NORMAL)
+
+    def __repr__(self):
+        return f"ActorCell({self.key}, {len(self.mailbox)} pending)"
+
+
+class Scheduler(object):
+    """Runs the messages of many actors that share a worker process.
+
+    Each actor has its own mailbox, see actors.mailbox, and actors with
+    pending messages take turns, one message each, so a busy actor does
+    not starve the rest. An actor never handles two messages at the same
+    time.
+
+    *handle* is called as ``handle(cell, message)`` to run each message.
+    """
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.cells = {}
+        self.ready = deque()  # cells with pending messages, in turn order
+
+    def add(self, cell):
+        self.cells[cell.key] = cell
+        if cell.runnable():
+            self.ready.append(cell)
+
+    def remove(self, actor_key):
+        return self.cells.pop(actor_key, None)
+
+    def enqueue(self, actor_key, message):
+        cell = self.cells.get(actor_key)
+        if cell is None:
+            if isinstance(message, Stop):
+                return  # it stopped already
+            logger.warning(f"Dropping {message}, actor {actor_key} is not "
+                           "hosted by this worker")
+            drop([message], KeyError(f"There is no actor {actor_key} on "
+                                     "this worker, it stopped or moved"))
+            return
+        runnable = cell.runnable()
+        cell.mailbox.append(message)
+        if not runnable and cell.runnable():
+            self.ready.append(cell)
+
+    def has_work(self):
+        return bool(self.ready)
+
+    def run_once(self):
+        """Run the next message of the next actor in turn."""
+        cell = self.ready.popleft()
+        if self.cells.get(cell.key) is not cell or not cell.runnable():
+            return  # it was stopped or replaced
+        message = cell.mailbox.popleft(SYSTEM if cell.failed else NORMAL)
+        self.handle(cell, message)
+        if self.cells.get(cell.key) is cell and cell.runnable():
+            self.ready.append(cell)
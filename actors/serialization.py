@@ -0,0 +1,290 @@
+"""Serializers for the actions, chosen per role.
+
+By default the queues (and the channels, see actors.peers) pickle every
+action with cloudpickle, which has a large fixed cost for the small
+messages that most calls send. A role can pick a serializer for the
+calls to its actors with ``@actors.remote(serializer=...)``. Those
+actions are sent as bytes, the name of the serializer followed by what
+it encoded: the direct channels between processes (see actors.peers)
+send them as they are, and for the queues bytes are cheap to pickle.
+The receivers decode them with :func:`decode`.
+
+Built-in serializers:
+
+- ``'pickle5'``: plain pickle, protocol 5. Large buffers (like NumPy
+  arrays) in the arguments can go out of band through shared memory,
+  with the ``shm_threshold`` option, see actors.shm.
+- ``'cloudpickle'``: for arguments that plain pickle cannot handle, like
+  lambdas or classes defined in ``__main__``. The same as the default,
+  the actions are left for the queues to pickle.
+- ``'msgpack'``: fast for calls with plain data (numbers, strings,
+  bytes, lists and dicts), needs the msgpack package. Any other object
+  in the action is pickled inside it. Tuples arrive as lists.
+
+More can be added with :func:`register`, in every process.
+
+A message that a receiver cannot load, like one with an argument whose
+class it does not have, is dropped with :func:`drop_unreadable`, and
+the receiver goes on with the next one. A call made through ``.future``
+gets the error when what could be read of it has its reply_to: calls
+encoded by a serializer, or that came through a channel. Those that
+came through a queue as they were are lost with the queue's error.
+"""
+import io
+import logging
+import pickle
+
+import cloudpickle
+
+import actors.actor
+from actors.metrics import sized
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+serializers = {}
+
+# msgpack extension type of the objects pickled inside a message
+PICKLED = 1
+# first byte of what pickle.dumps gives, never the first byte of a name
+PICKLE_PROTO = 0x80
+
+
+class Serializer(object):
+    """Turns the state of an action (a tuple) into bytes and back."""
+    name = None
+
+    def dumps(self, obj):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+    def salvage(self, data):
+        """What can be read of *data*, that loads failed on, or None."""
+        return None
+
+
+class Missing(object):
+    """Stands for an object whose class or function could not be found,
+    whatever it was built with."""
+
+    def __new__(cls, *args, **kwargs):
+        return super().__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+
+class Salvager(pickle.Unpickler):
+    """Loads what it can of a pickle that failed to load: what the
+    functions it calls to rebuild its objects cannot give is None, and
+    the objects of the classes and functions it cannot find are
+    :class:`Missing`."""
+
+    def find_class(self, module, name):
+        try:
+            found = super().find_class(module, name)
+        except Exception:
+            return Missing
+        if isinstance(found, type):
+            return found
+
+        def tolerant(*args, **kwargs):
+            try:
+                return found(*args, **kwargs)
+            except Exception:
+                return None
+        return tolerant
+
+
+def salvage_pickle(data):
+    return Salvager(io.BytesIO(data)).load()
+
+
+class Pickle5Serializer(Serializer):
+    name = 'pickle5'
+
+    def dumps(self, obj):
+        return pickle.dumps(obj, protocol=5)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+    def salvage(self, data):
+        return salvage_pickle(data)
+
+
+class CloudpickleSerializer(Serializer):
+    name = 'cloudpickle'
+
+    def dumps(self, obj):
+        return cloudpickle.dumps(obj)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+    def salvage(self, data):
+        return salvage_pickle(data)
+
+
+def _pickled(obj):
+    return msgpack.ExtType(PICKLED, cloudpickle.dumps(obj))
+
+
+def _unpickled(code, data):
+    if code == PICKLED:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+def _salvaged(code, data):
+    try:
+        return _unpickled(code, data)
+    except Exception:
+        return None
+
+
+class MsgpackSerializer(Serializer):
+    name = 'msgpack'
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True, default=_pickled)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False,
+                               ext_hook=_unpickled)
+
+    def salvage(self, data):
+        return msgpack.unpackb(data, raw=False, strict_map_key=False,
+                               ext_hook=_salvaged)
+
+
+def register(serializer):
+    """Make *serializer* (a Serializer) available by its name."""
+    serializers[serializer.name] = serializer
+
+
+def get(name):
+    try:
+        return serializers[name]
+    except KeyError:
+        if name == 'msgpack':
+            raise ImportError("The 'msgpack' serializer needs the msgpack "
+                              "package") from None
+        raise ValueError(f"Unknown serializer '{name}', valid serializers "
+                         f"are: {', '.join(serializers)}") from None
+
+
+def wire_name(name):
+    """The serializer actions encode themselves with, for roles with the
+    serializer called *name*. None when the queues do the same."""
+    if name is None or name == 'cloudpickle':
+        return None
+    get(name)  # fail early if we do not have it
+    return name
+
+
+def dumps_message(message):
+    """Turn a message into bytes for a channel."""
+    if type(message) is bytes:
+        return message  # an encoded action
+    return cloudpickle.dumps(message)
+
+
+def loads_message(data):
+    if data[0] == PICKLE_PROTO:
+        return pickle.loads(data)
+    return decode_action(data)
+
+
+def copy_message(message):
+    """A copy of *message* like the one a queue gives, for a receiver in
+    the same process, so it does not share the arguments with the
+    sender."""
+    return loads_message(dumps_message(message))
+
+
+def buffer_dumps(name):
+    """How to pickle, with out-of-band buffers, the arguments for roles
+    with the serializer called *name*, for actors.shm."""
+    if name in ('pickle5', 'msgpack'):
+        return pickle.dumps
+    return cloudpickle.dumps  # like the queues do
+
+
+def encode(name, state):
+    """Encode the *state* of an action with the serializer *name*."""
+    return name.encode() + b':' + get(name).dumps(state)
+
+
+def decode(message):
+    """The action in *message* if it was encoded, else *message*."""
+    if type(message) is bytes:
+        return decode_action(message)
+    return message
+
+
+def decode_action(data):
+    """Rebuild an action from what :func:`encode` gave."""
+    end = data.index(b':')
+    name = bytes(data[:end]).decode()
+    state = get(name).loads(memoryview(data)[end + 1:])
+    return sized(actors.actor.Action(*state), len(data))
+
+
+def salvage(data):
+    """The action in the message *data*, that could not be loaded, with
+    what could be read of it, or None if not even its reply_to could."""
+    try:
+        if data[0] == PICKLE_PROTO:
+            message = salvage_pickle(data)
+        else:
+            end = data.index(b':')
+            state = get(bytes(data[:end]).decode()).salvage(
+                memoryview(data)[end + 1:])
+            message = None if state is None else \
+                actors.actor.Action(*state)
+    except Exception:
+        return None
+    return message if isinstance(message, actors.actor.Action) else None
+
+
+def sendable_error(error):
+    """*error*, or a RuntimeError with its repr when the caller could not
+    load it, like an exception whose __init__ needs other arguments."""
+    try:
+        pickle.loads(cloudpickle.dumps(error))
+    except Exception:
+        return RuntimeError(repr(error))
+    return error
+
+
+def drop_unreadable(data, error):
+    """Drop the message *data*, that could not be loaded because of
+    *error*, or None when the queue could not even give it.
+
+    The call it had gets the error, if it was made through ``.future``
+    and its reply_to can be salvaged; else it is counted as one call.
+    """
+    logger.error("Dropping a message that could not be loaded",
+                 exc_info=error)
+    action = None if data is None else salvage(data)
+    # both modules import this one, the package has them loaded
+    if action is None:
+        actors.activity.counters.add_handled()
+    else:
+        actors.mailbox.drop([action], error)
+
+
+register(Pickle5Serializer())
+register(CloudpickleSerializer())
+if msgpack is not None:
+    register(MsgpackSerializer())
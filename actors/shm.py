@@ -0,0 +1,183 @@
+"""Shared memory transport for large buffers in action arguments.
+
+When enabled with ``actors.start(shm_threshold=nbytes)``, the arguments of
+an action are pickled with protocol 5 and every out-of-band buffer of at
+least *nbytes* (e.g. the data of a NumPy array) is copied to a shared
+memory segment instead of going through the actor queue. The receiver
+maps the segment and rebuilds the arguments on top of it, without
+copying the buffers again.
+
+A segment starts with a reference count of its receivers. Each receiver
+decrements it once it has mapped the segment, and the last one unlinks
+it. The mapping itself lives as long as any object built on it, since
+the rebuilt objects hold references to the memory views of the mapping.
+The receivers that drop a call without running it (see actors.mailbox)
+release its segment the same way.
+
+The names of the segments of a runtime start with its own prefix, so
+:func:`actors.shutdown` unlinks the ones still there, like those of the
+calls taken by a process that died.
+
+This only works when the actors share a host, like in localhost mode.
+"""
+import logging
+import mmap
+import os
+import pickle
+import secrets
+import struct
+
+try:
+    import fcntl
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # not POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('q')  # reference count
+ALIGNMENT = 64
+# Where the segments are, to find the ones left on shutdown.
+SEGMENTS_DIR = '/dev/shm'
+
+# start of the names of the segments of this runtime, see set_up
+prefix = None
+
+
+def available():
+    return fcntl is not None
+
+
+def set_up(segment_prefix):
+    """Name the segments created by this process with *segment_prefix*."""
+    global prefix
+    prefix = segment_prefix
+
+
+def new_prefix():
+    # short, some systems take names of up to 31 characters
+    return f"thtr{secrets.token_hex(4)}_"
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedPayload(object):
+    """Pickled arguments whose large buffers are in a shared segment."""
+
+    def __init__(self, data, segment, size, buffers):
+        self.data = data
+        self.segment = segment
+        self.size = size
+        self.buffers = buffers  # (offset, nbytes) of each buffer
+
+    def load(self):
+        """Map the segment and rebuild the pickled object."""
+        mapping = memoryview(self._take(mapped=True))
+        buffers = [mapping[offset:offset + nbytes]
+                   for offset, nbytes in self.buffers]
+        return pickle.loads(self.data, buffers=buffers)
+
+    def release(self):
+        """Give up on the pickled object, without loading it."""
+        try:
+            self._take(mapped=False)
+        except FileNotFoundError:
+            pass  # unlinked already, on shutdown
+
+    def _take(self, mapped):
+        """Decrement the reference count, unlink the segment if we are
+        the last receiver, and return our own mapping of it if
+        *mapped*."""
+        shm = shared_memory.SharedMemory(self.segment)
+        mapping = None
+        try:
+            fcntl.flock(shm._fd, fcntl.LOCK_EX)
+            try:
+                refs, = HEADER.unpack_from(shm.buf)
+                HEADER.pack_into(shm.buf, 0, refs - 1)
+            finally:
+                fcntl.flock(shm._fd, fcntl.LOCK_UN)
+            if mapped:
+                # it stays alive while its views are in use
+                mapping = mmap.mmap(shm._fd, self.size)
+        finally:
+            shm.close()
+        if refs <= 1:
+            shm.unlink()
+        else:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return mapping
+
+    def __repr__(self):
+        return f"SharedPayload({self.segment}, {self.size} bytes)"
+
+
+def share(obj, threshold, receivers=1, dumps=pickle.dumps):
+    """Pickle *obj* moving its large buffers to a shared segment.
+
+    Returns a SharedPayload to be loaded by *receivers* processes, or
+    None if *obj* has no buffer of at least *threshold* bytes. *dumps*
+    must take the protocol and buffer_callback arguments of pickle.dumps.
+    """
+    large = []
+
+    def keep_large(buffer):
+        raw = buffer.raw()
+        if raw.nbytes < threshold:
+            return True  # small, serialize it in-band
+        large.append(raw)
+        return False
+
+    data = dumps(obj, protocol=5, buffer_callback=keep_large)
+    if not large:
+        return None
+
+    buffers = []
+    offset = HEADER.size
+    for raw in large:
+        offset = _aligned(offset)
+        buffers.append((offset, raw.nbytes))
+        offset += raw.nbytes
+
+    shm = create_segment(offset)
+    try:
+        HEADER.pack_into(shm.buf, 0, receivers)
+        for (start, nbytes), raw in zip(buffers, large):
+            shm.buf[start:start + nbytes] = raw
+    finally:
+        shm.close()
+    # the receivers own the segment from now on
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    logger.debug(f"Shared {len(large)} buffers in segment {shm.name}")
+    return SharedPayload(data, shm.name, offset, buffers)
+
+
+def create_segment(size):
+    if prefix is None:
+        return shared_memory.SharedMemory(create=True, size=size)
+    while True:
+        try:
+            return shared_memory.SharedMemory(
+                prefix + secrets.token_hex(4), create=True, size=size)
+        except FileExistsError:
+            continue
+
+
+def unlink_all(segment_prefix):
+    """Unlink the segments whose names start with *segment_prefix*,
+    returns how many there were."""
+    try:
+        names = [name for name in os.listdir(SEGMENTS_DIR)
+                 if name.startswith(segment_prefix)]
+    except OSError:
+        return 0  # they cannot be listed here
+    for name in names:
+        try:
+            shm = shared_memory.SharedMemory(name)
+        except FileNotFoundError:
+            continue  # its last receiver just unlinked it
+        shm.close()
+        shm.unlink()
+    return len(names)
@@ -0,0 +1,219 @@
+"""Supervision of actors, to restart the ones that fail.
+
+An actor fails when one of its calls raises and there is nobody to give
+the error to (a ``.remote()`` call, not a future), when its ``__init__``
+raises, or when its process dies. A failed actor takes no more calls;
+they wait in its mailbox (or its queue) until it is restarted, so none
+is lost. The director watches the processes and gets the failures
+reported by the actors.
+
+Actors are supervised with :func:`actors.supervise`::
+
+    actors.supervise(workers, strategy='one_for_one', supervisor=boss,
+                     max_restarts=3, period=60, backoff=0.5)
+
+- ``'one_for_one'``: only the actor that failed is restarted.
+- ``'all_for_one'``: all the supervised actors are restarted, for actors
+  that cannot go on without each other.
+
+A restart creates the instance again with the same arguments (and the
+last checkpoint, see actors.checkpoint). It waits *backoff* seconds,
+doubled for each restart in the last *period* seconds, up to
+*max_backoff*. After *max_restarts* restarts in *period* the actor is
+stopped. The *supervisor*, an actor, is told about each failure with a
+call to its ``actor_failed(actor, error, restarting)`` method, where
+*error* is the traceback as a string.
+
+Actors that are not supervised are stopped when they fail, and the
+failure is logged. Supervise actors right after creating them, a failure
+that comes first is one of an actor that is not supervised. A stopped
+actor is forgotten, and calls to it from the driver raise KeyError.
+
+When a process dies, the calls it had taken from its queue die with it;
+the ones still in the queue go to the actor once it is restarted.
+"""
+import heapq
+import itertools
+import logging
+import queue as local_queue
+import threading
+import time
+from collections import deque
+
+from actors.migration import Migrated
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('one_for_one', 'all_for_one')
+# Seconds between checks of the processes.
+WATCH_INTERVAL = 0.5
+
+
+class Failure(object):
+    """Tells the director that the actor with *actor_key* failed, *error*
+    says why."""
+    __slots__ = ('actor_key', 'error')
+
+    def __init__(self, actor_key, error):
+        self.actor_key = actor_key
+        self.error = error
+
+    def __reduce__(self):
+        return Failure, (self.actor_key, self.error)
+
+    def __repr__(self):
+        return f"Failure({self.actor_key})"
+
+
+class Supervision(object):
+    """How to restart the actors of *members* (proxies), see the module
+    docstring for the rest of the arguments."""
+
+    def __init__(self, members, strategy='one_for_one', supervisor=None,
+                 max_restarts=3, period=60.0, backoff=0.5, max_backoff=30.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{strategy}', valid "
+                             f"strategies are: {', '.join(STRATEGIES)}")
+        if supervisor is not None and \
+                not hasattr(supervisor, 'actor_failed'):
+            raise ValueError(f"The supervisor {supervisor} has no "
+                             "actor_failed method")
+        self.members = {member._actor_key: member for member in members}
+        self.strategy = strategy
+        self.supervisor = supervisor
+        self.max_restarts = max_restarts
+        self.period = period
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # times of the last restarts, per actor key, or for all with
+        # 'all_for_one'
+        self.restarts = {}
+
+    def to_restart(self, actor_key):
+        """The actors to restart when *actor_key* fails."""
+        if self.strategy == 'all_for_one':
+            return list(self.members)
+        return [actor_key]
+
+    def next_delay(self, actor_key):
+        """Seconds to wait before the restart after a failure of
+        *actor_key*, or None if it failed too often."""
+        if self.strategy == 'all_for_one':
+            actor_key = None
+        now = time.monotonic()
+        restarts = self.restarts.setdefault(actor_key, deque())
+        while restarts and restarts[0] < now - self.period:
+            restarts.popleft()
+        if len(restarts) >= self.max_restarts:
+            return None
+        delay = min(self.backoff * 2 ** len(restarts), self.max_backoff)
+        restarts.append(now + delay)
+        return delay
+
+    def report(self, actor_key, error, restarting):
+        if self.supervisor is None:
+            return
+        try:
+            self.supervisor.actor_failed.remote(self.members[actor_key],
+                                                error, restarting)
+        except Exception:
+            logger.exception(f"Could not report the failure of {actor_key} "
+                             f"to {self.supervisor}")
+
+
+class Watcher(object):
+    """Watches the actors of *director* from a thread of the driver.
+
+    Takes the *events* (a queue) the processes put: the failures of their
+    actors, the actors they create (see actors.director.spawn_actors) and
+    the ones they move (see actors.migration).
+    Also finds the processes that died, and restarts or stops the failed
+    actors.
+    """
+
+    def __init__(self, director, events):
+        self.director = director
+        self.events = events
+        self.supervisions = {}  # by actor key
+        self.pending = set()  # the keys of the failed actors
+        self.restarts = []  # heap of (time, seq, actor_keys)
+        self.seqs = itertools.count()
+        self.lock = threading.Lock()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def supervise(self, supervision):
+        with self.lock:
+            for actor_key in supervision.members:
+                self.supervisions[actor_key] = supervision
+
+    def stop(self):
+        self.running = False
+        self.events.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while self.running:
+            with self.lock:
+                timeout = WATCH_INTERVAL
+                if self.restarts:
+                    timeout = min(timeout, max(
+                        0, self.restarts[0][0] - time.monotonic()))
+            try:
+                event = self.events.get(timeout=timeout)
+            except local_queue.Empty:
+                event = None
+            except (EOFError, OSError):
+                return  # shutting down
+            if not self.running:
+                return
+            try:
+                if isinstance(event, Failure):
+                    self._failed(event.actor_key, event.error)
+                elif isinstance(event, Migrated):
+                    self.director.migrated(event)
+                elif event is not None:
+                    self.director.adopt(event)
+                for actor_key, error in self.director.dead_actors():
+                    self._failed(actor_key, error)
+                self._run_restarts()
+            except Exception:
+                logger.exception("Error watching the actors")
+
+    def _failed(self, actor_key, error):
+        with self.lock:
+            if actor_key in self.pending:
+                return  # a restart is on its way
+            supervision = self.supervisions.get(actor_key)
+            if supervision is None:
+                logger.error(f"Actor {actor_key} failed and is not "
+                             f"supervised, stopping it: {error}")
+                self.director.give_up(actor_key)
+                return
+            delay = supervision.next_delay(actor_key)
+            if delay is None:
+                logger.error(f"Actor {actor_key} failed too often, "
+                             f"stopping it: {error}")
+                for key in supervision.to_restart(actor_key):
+                    self.director.give_up(key)
+                    self.supervisions.pop(key, None)
+            else:
+                logger.warning(f"Actor {actor_key} failed, restarting it in "
+                               f"{delay:.1f}s: {error}")
+                keys = supervision.to_restart(actor_key)
+                self.pending.update(keys)
+                heapq.heappush(self.restarts, (time.monotonic() + delay,
+                                               next(self.seqs), keys))
+        supervision.report(actor_key, error, delay is not None)
+
+    def _run_restarts(self):
+        while True:
+            with self.lock:
+                if not self.restarts or \
+                        self.restarts[0][0] > time.monotonic():
+                    return
+                _, _, keys = heapq.heappop(self.restarts)
+                self.pending.difference_update(keys)
+            for actor_key in keys:
+                self.director.restart(actor_key)
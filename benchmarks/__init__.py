@@ -0,0 +1,6 @@
+"""Messaging benchmarks for lithops actors.
+
+Run them all with ``python -m benchmarks``, see ``--help`` for the options.
+Results are printed (or written with ``--output``) as JSON, so that runs
+of different versions can be compared.
+"""
@@ -0,0 +1,105 @@
+import argparse
+import ast
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import actors
+from benchmarks import suite
+
+MB = 1000 * 1000
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmarks(quick):
+    """The benchmarks to run, as (name, function, kwargs)."""
+    scale = 10 if quick else 1
+    sizes = [100, 10 * 1000, MB, 10 * MB] if quick else \
+        [100, 10 * 1000, MB, 10 * MB, 100 * MB]
+    return [
+        ('round_trip', suite.round_trip, {'samples': 1000 // scale}),
+        ('one_to_one', suite.one_to_one, {'messages': 20000 // scale}),
+        ('fan_in', suite.fan_in, {'sources': 8,
+                                  'messages': 5000 // scale}),
+        ('fan_out', suite.fan_out, {'sinks': 8,
+                                    'messages': 5000 // scale}),
+        ('colocated', suite.colocated, {'messages': 5000 // scale}),
+        ('replicated', suite.replicated, {'calls': 1000 // scale,
+                                          'replicas': 4}),
+        ('spawn_rate', suite.spawn_rate, {'count': 100 // scale}),
+        ('payload_scaling', suite.payload_scaling,
+         {'sizes': sizes, 'samples': 5 if quick else 10}),
+        ('memory_per_actor', suite.memory_per_actor,
+         {'count': 100 // scale}),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Run the actor messaging benchmarks, report JSON.")
+    parser.add_argument('--quick', action='store_true',
+                        help="smaller runs, for a quick check")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help="run only this benchmark (can be repeated)")
+    parser.add_argument('--output', metavar='FILE',
+                        help="write the JSON report here instead of stdout")
+    parser.add_argument('--option', action='append', default=[],
+                        metavar='KEY=VALUE',
+                        help="runtime option for actors.start(), "
+                             "like --option batch_size=32 or "
+                             "--option peer_channels=True")
+    args = parser.parse_args(argv)
+
+    options = {}
+    for option in args.option:
+        key, _, value = option.partition('=')
+        # numbers, booleans, None, lists, dicts; else the text as it is
+        try:
+            options[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            options[key] = value
+
+    selected = [b for b in benchmarks(args.quick)
+                if not args.only or b[0] in args.only]
+
+    actors.start(**options)
+    results = {}
+    try:
+        for name, function, kwargs in selected:
+            print(f"Running {name}...", file=sys.stderr)
+            start = time.perf_counter()
+            results[name] = function(**kwargs)
+            results[name]['wall_s'] = time.perf_counter() - start
+    finally:
+        actors.shutdown()
+
+    report = {
+        'revision': git_revision(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': options,
+        'quick': args.quick,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import resource
+import time
+
+import actors
+
+
+def current_rss():
+    """Resident memory of this process, in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # not Linux, use the peak instead (KB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@actors.remote
+class Echo(object):
+    def echo(self, value):
+        return value
+
+    def size(self, payload):
+        return len(payload)
+
+    def memory(self):
+        return os.getpid(), current_rss()
+
+
+@actors.remote
+class Sink(object):
+    def __init__(self):
+        self.count = 0
+
+    def hit(self):
+        self.count += 1
+
+    def get_count(self):
+        return self.count
+
+
+@actors.remote
+class Source(object):
+    def send(self, sinks, messages):
+        for _ in range(messages):
+            for sink in sinks:
+                sink.hit.remote()
+        actors.flush()
+
+
+@actors.remote
+class Busy(object):
+    def work(self, ms):
+        time.sleep(ms / 1000)
@@ -0,0 +1,189 @@
+import statistics
+import time
+
+import actors
+from benchmarks.roles import Busy, Echo, Sink, Source
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Timeout (in seconds) for every single wait of a benchmark.
+TIMEOUT = 600
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def stop_all(proxies):
+    for proxy in proxies:
+        proxy.pls_stop()
+
+
+def wait_counts(sinks, expected):
+    """Poll the *sinks* until every one has been hit *expected* times."""
+    pending = list(sinks)
+    deadline = time.monotonic() + TIMEOUT
+    while pending:
+        counts = actors.get([s.get_count.future.remote() for s in pending],
+                            TIMEOUT)
+        pending = [s for s, c in zip(pending, counts) if c < expected]
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{len(pending)} sinks did not get "
+                               f"{expected} messages")
+        if pending:
+            time.sleep(0.001)
+
+
+def round_trip(samples):
+    """Latency of a call through .future and back, in microseconds."""
+    echo = Echo.remote()
+    echo.echo.future.remote(None).result(TIMEOUT)  # warm up
+    latencies = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        echo.echo.future.remote(None).result(TIMEOUT)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    stop_all([echo])
+    return {
+        'samples': samples,
+        'p50_us': percentile(latencies, 50),
+        'p99_us': percentile(latencies, 99),
+        'mean_us': statistics.mean(latencies),
+    }
+
+
+def one_to_one(messages):
+    """Messages per second from the driver to a single actor."""
+    sink = Sink.remote()
+    sink.get_count.future.remote().result(TIMEOUT)  # wait until running
+    start = time.perf_counter()
+    for _ in range(messages):
+        sink.hit.remote()
+    actors.flush()
+    wait_counts([sink], messages)
+    elapsed = time.perf_counter() - start
+    stop_all([sink])
+    return {'messages': messages, 'seconds': elapsed,
+            'msg_per_s': messages / elapsed}
+
+
+def fan_in(sources, messages):
+    """Messages per second from many actors to a single one."""
+    sink = Sink.remote()
+    senders = Source.remote_many(sources)
+    # wait until all of them are running
+    actors.get([s.send.future.remote([], 0) for s in senders], TIMEOUT)
+    sink.get_count.future.remote().result(TIMEOUT)
+    start = time.perf_counter()
+    for sender in senders:
+        sender.send.remote([sink], messages)
+    wait_counts([sink], sources * messages)
+    elapsed = time.perf_counter() - start
+    stop_all(senders + [sink])
+    total = sources * messages
+    return {'sources': sources, 'messages': total, 'seconds': elapsed,
+            'msg_per_s': total / elapsed}
+
+
+def fan_out(sinks, messages):
+    """Messages per second from one actor to many."""
+    sender = Source.remote()
+    receivers = Sink.remote_many(sinks)
+    actors.get([r.get_count.future.remote() for r in receivers], TIMEOUT)
+    start = time.perf_counter()
+    sender.send.remote(receivers, messages)
+    wait_counts(receivers, messages)
+    elapsed = time.perf_counter() - start
+    stop_all(receivers + [sender])
+    total = sinks * messages
+    return {'sinks': sinks, 'messages': total, 'seconds': elapsed,
+            'msg_per_s': total / elapsed}
+
+
+def colocated(messages):
+    """Messages per second from an actor to one on the same worker, see
+    actors.placement. Needs workers, else reported as skipped."""
+    if not actors.director.config['workers']:
+        return {'skipped': "needs workers, like --option workers=2"}
+    sink = Sink.remote()
+    sender = Source.options(colocate=sink).remote()
+    actors.get([sender.send.future.remote([], 0),
+                sink.get_count.future.remote()], TIMEOUT)
+    start = time.perf_counter()
+    sender.send.remote([sink], messages)
+    wait_counts([sink], messages)
+    elapsed = time.perf_counter() - start
+    stop_all([sender, sink])
+    return {'messages': messages, 'seconds': elapsed,
+            'msg_per_s': messages / elapsed}
+
+
+def replicated(calls, replicas):
+    """Calls per second to a replica set of a role whose calls take 10
+    ms, and to a single actor, see actors.replicas."""
+    results = {'calls': calls, 'replicas': replicas}
+    for n in (1, replicas):
+        busy = Busy.options(replicas=n).remote()
+        actors.get([busy.work.future.remote(0) for _ in range(n)], TIMEOUT)
+        start = time.perf_counter()
+        actors.get([busy.work.future.remote(10) for _ in range(calls)],
+                   TIMEOUT)
+        elapsed = time.perf_counter() - start
+        busy.pls_stop()
+        results[f'calls_per_s_{n}'] = calls / elapsed
+    return results
+
+
+def spawn_rate(count):
+    """Actors per second, until all of them answer a call."""
+    start = time.perf_counter()
+    created = Echo.remote_many(count)
+    actors.get([e.echo.future.remote(None) for e in created], TIMEOUT)
+    elapsed = time.perf_counter() - start
+    stop_all(created)
+    return {'actors': count, 'seconds': elapsed,
+            'actors_per_s': count / elapsed}
+
+
+def make_payload(nbytes):
+    if np is not None:
+        return np.zeros(nbytes, dtype=np.uint8)
+    return bytes(nbytes)
+
+
+def payload_scaling(sizes, samples):
+    """Round trip time of calls that send payloads of different sizes."""
+    echo = Echo.remote()
+    echo.size.future.remote(b'').result(TIMEOUT)
+    results = []
+    for nbytes in sizes:
+        payload = make_payload(nbytes)
+        times = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            echo.size.future.remote(payload).result(TIMEOUT)
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        results.append({'bytes': nbytes, 'samples': samples,
+                        'p50_ms': median * 1e3,
+                        'mb_per_s': nbytes / median / 1e6})
+    stop_all([echo])
+    return {'payload': 'numpy' if np is not None else 'bytes',
+            'sizes': results}
+
+
+def memory_per_actor(count):
+    """Resident memory of the processes hosting *count* actors."""
+    created = Echo.remote_many(count)
+    reports = actors.get([e.memory.future.remote() for e in created],
+                         TIMEOUT)
+    by_process = dict(reports)  # a pid reports the same, or newer, rss
+    total = sum(by_process.values())
+    stop_all(created)
+    return {'actors': count, 'processes': len(by_process),
+            'total_bytes': total, 'bytes_per_actor': total / count}
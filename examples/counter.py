@@ -1,5 +1,3 @@
-import time
-
 import actors
 
 
@@ -38,14 +36,14 @@ def main():
     [counter_actor.increment.remote() for _ in range(10)]
 
     # counter_actor.pls_stop()
-    count = counter_actor.get_counter.future.remote()  # Returns do not work yet
+    count = counter_actor.get_counter.future.remote()
 
-    print(f"Count: {count}")    # This will be count.get(), since it's a future
+    print(f"Count: {count.result(timeout=10)}")
 
     counter_actor.set_self.remote(counter_actor)
     counter_actor.check_proxy.remote()
 
-    time.sleep(5)
+    # waits until the actor is done
     actors.shutdown()
 
 
@@ -133,7 +133,8 @@ def main_sync():
 
     actors.start()
     ps = ParameterServer.remote(1e-2)
-    workers = [DataWorker.remote() for i in range(num_workers)]
+    # a replica set, each call goes to the least busy of the workers
+    workers = DataWorker.options(replicas=num_workers).remote()
 
     model = ConvNet()
     test_loader = get_data_loader()[1]
@@ -142,8 +143,8 @@ def main_sync():
     current_weights = ps.get_weights.remote()
     for i in range(iterations):
         gradients = [
-            worker.compute_gradients.remote(current_weights) for worker in
-            workers
+            workers.compute_gradients.remote(current_weights)
+            for _ in range(num_workers)
         ]
         # Calculate update after all gradients are available.
         current_weights = ps.apply_gradients.remote(*gradients)
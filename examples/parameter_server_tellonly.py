@@ -106,11 +106,13 @@ class ParameterServer(object):
     #     return self.model.get_weights()
 
     def send_weights_to(self, workers):
-        for worker in workers:
-            worker.compute_gradients.remote(self.model.get_weights())
+        # the weights are serialized once for all the workers
+        actors.ActorGroup(workers).broadcast('compute_gradients',
+                                             self.model.get_weights())
 
 
-@actors.remote
+# each on a worker of its own
+@actors.remote(spread=True)
 class DataWorker(object):
     def __init__(self, trainer):
         self.model = ConvNet()
@@ -176,17 +178,20 @@ def main_sync():
     iterations = 200
     num_workers = 2
 
-    actors.start()
+    # one worker for the trainer and the parameter server, that talk
+    # all the time, and one for each data worker
+    actors.start(workers=num_workers + 1)
 
     trainer = TrainSupervisor.remote()
 
-    ps = ParameterServer.remote(1e-2, trainer)
+    ps = ParameterServer.options(colocate=trainer).remote(1e-2, trainer)
     workers = [DataWorker.remote(trainer) for _ in range(num_workers)]
 
     trainer.set_up.remote(ps, workers, iterations)
 
-    import time
-    time.sleep(120)
+    # the actors go idle once the training is over
+    if not actors.wait_idle(timeout=600):
+        print("The actors are still busy, stopping them anyway")
     # Clean up resources and processes.
     actors.shutdown()
 
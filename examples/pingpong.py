@@ -70,12 +70,14 @@ class Judge(object):
 
 
 if __name__ == '__main__':
-    actors.start()
+    actors.start(workers=2)
     judge = Judge.remote()
     pinger = Pinger.remote()
-    ponger = Ponger.remote()
+    # on the worker of the pinger, their calls never leave the process
+    ponger = Ponger.options(colocate=pinger).remote()
 
     judge.set_up.remote(100, pinger, ponger)
 
-    time.sleep(10)
+    if not actors.wait_idle(timeout=60):
+        print("The actors are still busy, stopping them anyway")
     actors.shutdown()
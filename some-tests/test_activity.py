@@ -0,0 +1,88 @@
+"""Tests of how the driver tells that the actors are idle, see
+actors.activity."""
+import queue
+import unittest
+from unittest import mock
+
+from actors import activity
+from actors.activity import Counters, IdleDetector
+
+
+class IdleDetectorTest(unittest.TestCase):
+    """The processes are faked: the probe answers for them with the counts
+    of *self.processes*, ``(sent, handled, received)`` by process ID."""
+
+    def setUp(self):
+        patcher = mock.patch('actors.activity.counters', Counters())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reports = queue.Queue()
+        self.detector = IdleDetector(self.reports)
+        self.processes = {}
+        self.probes = []
+
+    def probe(self, probe):
+        self.probes.append(probe.wave)
+        for process_id, counts in self.processes.items():
+            self.reports.put((probe.wave, process_id) + counts + (None,))
+        return len(self.processes)
+
+    def test_idle_after_two_waves_with_the_same_counts(self):
+        self.processes = {'a': (2, 1, 1), 'b': (0, 1, 1)}
+        self.assertTrue(self.detector.wait(self.probe, timeout=5))
+        self.assertEqual(self.probes, [1, 2])
+
+    def test_busy(self):
+        self.processes = {'a': (2, 1, 1), 'b': (0, 0, 1)}
+        with mock.patch('actors.activity.WAVE_TIMEOUT', 0.05):
+            self.assertFalse(self.detector.wait(self.probe, timeout=0.2))
+
+    def test_idle_once_the_calls_are_handled(self):
+        self.processes = {'a': (2, 1, 1), 'b': (0, 0, 1)}
+
+        def probe(probe):
+            if len(self.probes) == 3:
+                self.processes['b'] = (0, 1, 1)
+            return self.probe(probe)
+
+        self.assertTrue(self.detector.wait(probe, timeout=5))
+        self.assertEqual(len(self.probes), 5)
+
+    def test_driver_calls_counted(self):
+        activity.counters.add_sent(1)
+        self.processes = {'a': (0, 1, 1)}
+        self.assertTrue(self.detector.wait(self.probe, timeout=5))
+
+    def test_unreached_process(self):
+        self.processes = {'a': (1, 1, 1)}
+
+        def probe(probe):
+            self.probe(probe)
+            return None  # a full queue
+
+        with mock.patch('actors.activity.WAVE_TIMEOUT', 0.05):
+            self.assertFalse(self.detector.wait(probe, timeout=0.2))
+
+    def test_calls_lost_with_a_process_that_died(self):
+        # b took the second call of a and died, it no longer answers
+        self.reports.put((None, 'b', 0, 0, 1, 'b-actor'))
+        self.processes = {'a': (2, 1, 1)}
+        self.detector.died()
+        with self.assertLogs('actors.activity', 'WARNING'):
+            self.assertTrue(self.detector.wait(self.probe, timeout=5))
+        self.assertEqual(self.detector.settled, 1)
+        self.assertEqual(self.detector.deaths, 0)
+        self.assertEqual(self.detector.ended, {'b-actor'})
+        # settled for good, the next waits need no death
+        self.assertTrue(self.detector.wait(self.probe, timeout=5))
+
+    def test_lost_calls_not_settled_while_a_process_is_busy(self):
+        self.processes = {'a': (2, 1, 2)}
+        self.detector.died()
+        with mock.patch('actors.activity.WAVE_TIMEOUT', 0.05):
+            self.assertFalse(self.detector.wait(self.probe, timeout=0.2))
+        self.assertEqual(self.detector.settled, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
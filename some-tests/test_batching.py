@@ -0,0 +1,74 @@
+"""Tests of the outboxes that batch the messages to each actor, see
+actors.batching."""
+import queue
+import time
+import unittest
+
+from actors.batching import Batch, Outboxes
+
+
+class OutboxesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queues = {'a': queue.Queue(), 'b': queue.Queue()}
+
+    def outboxes(self, batch_size=3, batch_age_us=10 ** 7):
+        outboxes = Outboxes(self.queues.__getitem__, batch_size,
+                            batch_age_us)
+        self.addCleanup(setattr, outboxes, 'running', False)
+        return outboxes
+
+    def sent(self, actor_key):
+        box = self.queues[actor_key]
+        return [box.get_nowait() for _ in range(box.qsize())]
+
+    def test_flush_by_size(self):
+        outboxes = self.outboxes()
+        outboxes.put('a', 1)
+        outboxes.put('a', 2)
+        outboxes.put('b', 3)
+        self.assertEqual(self.sent('a'), [])
+        outboxes.put('a', 4)
+        batch, = self.sent('a')
+        self.assertIsInstance(batch, Batch)
+        self.assertEqual(batch.messages, [1, 2, 4])
+        self.assertEqual(self.sent('b'), [])
+
+    def test_flush_by_age(self):
+        outboxes = self.outboxes(batch_age_us=20000)
+        outboxes.put('a', 1)
+        deadline = time.monotonic() + 5
+        while self.queues['a'].empty() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # a single message is sent as it is
+        self.assertEqual(self.sent('a'), [1])
+
+    def test_explicit_flush(self):
+        outboxes = self.outboxes()
+        outboxes.put('a', 1)
+        outboxes.put('b', 2)
+        outboxes.flush('a')
+        self.assertEqual(self.sent('a'), [1])
+        self.assertEqual(self.sent('b'), [])
+        outboxes.flush()
+        self.assertEqual(self.sent('b'), [2])
+
+    def test_unknown_actor_keeps_its_messages(self):
+        outboxes = self.outboxes(batch_age_us=20000)
+        outboxes.put('c', 1)
+        outboxes.put('a', 2)
+        with self.assertLogs('actors.batching', 'ERROR'):
+            deadline = time.monotonic() + 5
+            while self.queues['a'].empty() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+        self.assertEqual(self.sent('a'), [2])
+        self.assertTrue(outboxes.flusher.is_alive())
+        # sent once the actor is known
+        self.queues['c'] = queue.Queue()
+        outboxes.flush('c')
+        self.assertEqual(self.sent('c'), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""Tests of the checkpoints of the state of actors, see
+actors.checkpoint."""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from actors.checkpoint import MANIFEST, Checkpointer
+
+
+class Model(object):
+
+    def __init__(self):
+        self.weights = list(range(100))
+        self.steps = 0
+
+
+class Custom(object):
+
+    def __init__(self):
+        self.value = 1
+        self.cache = {}
+
+    def __getstate__(self):
+        return {'value': self.value}
+
+    def __setstate__(self, state):
+        self.value = state['value']
+        self.restored = True
+
+
+class CheckpointerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def checkpointer(self, **kwargs):
+        return Checkpointer(self.directory, 'role:actor/1', **kwargs)
+
+    def files(self, checkpointer):
+        return sorted(os.listdir(checkpointer.path))
+
+    def test_restore(self):
+        model = Model()
+        model.steps = 5
+        self.checkpointer().save(model)
+        restored = Model.__new__(Model)
+        self.assertTrue(self.checkpointer().restore(restored))
+        self.assertEqual(vars(restored), vars(model))
+
+    def test_nothing_to_restore(self):
+        self.assertFalse(self.checkpointer().restore(Model()))
+
+    def test_unchanged_fields_not_written_again(self):
+        checkpointer = self.checkpointer()
+        model = Model()
+        checkpointer.save(model)
+        weights = checkpointer.fields['weights']
+        steps = checkpointer.fields['steps']
+        model.steps += 1
+        checkpointer.save(model)
+        self.assertEqual(checkpointer.fields['weights'], weights)
+        self.assertNotEqual(checkpointer.fields['steps'], steps)
+        # the file of the old steps is gone
+        self.assertEqual(self.files(checkpointer), sorted(
+            [MANIFEST] + [filename for filename, _
+                          in checkpointer.fields.values()]))
+
+    def test_changed_field_gets_new_digest(self):
+        checkpointer = self.checkpointer()
+        model = Model()
+        checkpointer.save(model)
+        digest = checkpointer.fields['weights'][1]
+        model.weights.append(100)
+        checkpointer.save(model)
+        self.assertNotEqual(checkpointer.fields['weights'][1], digest)
+
+    def test_failed_save_keeps_the_last_checkpoint(self):
+        checkpointer = self.checkpointer()
+        model = Model()
+        checkpointer.save(model)
+        model.steps = 10
+        with mock.patch('os.replace', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                checkpointer.save(model)
+        restored = Model.__new__(Model)
+        self.checkpointer().restore(restored)
+        self.assertEqual(restored.steps, 0)
+
+    def test_no_temporary_manifest_left(self):
+        checkpointer = self.checkpointer()
+        checkpointer.save(Model())
+        checkpointer.save(Model())
+        self.assertNotIn(MANIFEST + '.tmp', self.files(checkpointer))
+
+    def test_sequence_goes_on_after_restart(self):
+        checkpointer = self.checkpointer()
+        checkpointer.save(Model())
+        checkpointer.save(Model())
+        self.assertEqual(self.checkpointer().seq, 2)
+
+    def test_unpicklable_fields_skipped(self):
+        model = Model()
+        model.lock = threading.Lock()
+        checkpointer = self.checkpointer()
+        with self.assertLogs('actors.checkpoint', 'WARNING'):
+            checkpointer.save(model)
+        self.assertNotIn('lock', checkpointer.fields)
+        self.assertIn('weights', checkpointer.fields)
+
+    def test_getstate_and_setstate(self):
+        custom = Custom()
+        custom.value = 3
+        self.checkpointer().save(custom)
+        restored = Custom()
+        self.checkpointer().restore(restored)
+        self.assertEqual(restored.value, 3)
+        self.assertTrue(restored.restored)
+
+    def test_due_after_every_calls(self):
+        checkpointer = self.checkpointer(every=2)
+        model = Model()
+        checkpointer.handled(model)
+        self.assertEqual(checkpointer.seq, 0)
+        checkpointer.handled(model)
+        self.assertEqual(checkpointer.seq, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Tests of the consistent hashing and the sharded directory of the
+actors, see actors.directory."""
+import unittest
+from unittest import mock
+
+from actors.directory import (DirectoryManager, HashRing, LocalShard,
+                              ShardedDirectory, ShardProxy)
+
+KEYS = [f"role:{i}" for i in range(1000)]
+
+
+class FailedShard(object):
+    """A shard whose manager is gone."""
+
+    def fail(self, *args):
+        raise EOFError("shard lost")
+
+    __getitem__ = get = get_many = update = pop = fail
+
+
+class HashRingTest(unittest.TestCase):
+
+    def test_same_shards_every_time(self):
+        ring = HashRing(4)
+        again = HashRing(4)
+        for key in KEYS[:50]:
+            self.assertEqual(ring.shards_of(key, 2), again.shards_of(key, 2))
+
+    def test_replicas_are_different_shards(self):
+        ring = HashRing(4)
+        for key in KEYS[:50]:
+            shards = ring.shards_of(key, 3)
+            self.assertEqual(len(shards), 3)
+            self.assertEqual(len(set(shards)), 3)
+            self.assertEqual(shards[0], ring.shards_of(key)[0])
+
+    def test_no_more_replicas_than_shards(self):
+        self.assertEqual(sorted(HashRing(2).shards_of('a', 5)), [0, 1])
+
+    def test_keys_spread_over_all_shards(self):
+        ring = HashRing(4)
+        counts = [0] * 4
+        for key in KEYS:
+            counts[ring.shards_of(key)[0]] += 1
+        for count in counts:
+            self.assertGreater(count, len(KEYS) / 4 / 2)
+
+    def test_new_shard_moves_few_keys(self):
+        before, after = HashRing(4), HashRing(5)
+        moved = [key for key in KEYS
+                 if before.shards_of(key)[0] != after.shards_of(key)[0]]
+        # about a fifth of the keys move, all of them to the new shard
+        self.assertLess(len(moved), len(KEYS) / 3)
+        for key in moved:
+            self.assertEqual(after.shards_of(key)[0], 4)
+
+
+class ShardedDirectoryTest(unittest.TestCase):
+
+    def test_update_and_lookups(self):
+        directory = ShardedDirectory.local(4)
+        directory.update({key: key.upper() for key in KEYS[:20]})
+        directory['extra'] = 'EXTRA'
+        self.assertEqual(directory['role:3'], 'ROLE:3')
+        self.assertEqual(directory.get('extra'), 'EXTRA')
+        self.assertIsNone(directory.get('missing'))
+        self.assertIn('role:0', directory)
+        self.assertNotIn('missing', directory)
+        with self.assertRaises(KeyError):
+            directory['missing']
+        self.assertEqual(directory.get_many(['role:1', 'role:2', 'missing']),
+                         {'role:1': 'ROLE:1', 'role:2': 'ROLE:2'})
+
+    def test_keys_in_their_shards(self):
+        directory = ShardedDirectory.local(4, replicas=2)
+        directory.update({key: 1 for key in KEYS[:100]})
+        for key in KEYS[:100]:
+            holders = [index for index, shard in enumerate(directory.shards)
+                       if key in shard]
+            self.assertEqual(sorted(holders),
+                             sorted(directory.ring.shards_of(key, 2)))
+
+    def test_pop_from_all_replicas(self):
+        directory = ShardedDirectory.local(3, replicas=3)
+        directory['a'] = 1
+        self.assertEqual(directory.pop('a'), 1)
+        self.assertIsNone(directory.pop('a'))
+        self.assertFalse(any(directory.shards))
+
+    def test_lookups_survive_a_lost_shard(self):
+        directory = ShardedDirectory.local(4, replicas=2)
+        values = {key: key for key in KEYS[:100]}
+        directory.update(values)
+        directory.shards[1] = FailedShard()
+        with self.assertLogs('actors.directory', 'WARNING'):
+            self.assertEqual(directory.get_many(list(values)), values)
+        with self.assertLogs('actors.directory', 'WARNING'):
+            for key in KEYS[:100]:
+                self.assertEqual(directory[key], key)
+
+    def test_update_fails_when_all_replicas_fail(self):
+        directory = ShardedDirectory([FailedShard(), LocalShard()])
+        lost = next(key for key in KEYS
+                    if directory.ring.shards_of(key)[0] == 0)
+        with self.assertLogs('actors.directory', 'WARNING'):
+            with self.assertRaises(ConnectionError):
+                directory.update({lost: 1})
+
+    def test_shards_without_get_many(self):
+        directory = ShardedDirectory([{}, {}])
+        directory.update({'a': 1, 'b': 2})
+        self.assertEqual(directory.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+
+    def test_invalid_replicas(self):
+        with self.assertRaises(ValueError):
+            ShardedDirectory.local(2, replicas=3)
+        with self.assertRaises(ValueError):
+            ShardedDirectory.local(2, replicas=0)
+        with self.assertRaises(ValueError):
+            ShardedDirectory([])
+
+
+class ManagerShardTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = DirectoryManager()
+        self.manager.start()
+        self.addCleanup(self.manager.shutdown)
+
+    def test_batch_is_one_call_per_shard(self):
+        directory = ShardedDirectory([self.manager.Shard()
+                                      for _ in range(2)])
+        values = {key: key for key in KEYS[:50]}
+        directory.update(values)
+        callmethod = ShardProxy._callmethod
+        with mock.patch.object(ShardProxy, '_callmethod', autospec=True,
+                               side_effect=callmethod) as calls:
+            self.assertEqual(directory.get_many(list(values) + ['missing']),
+                             values)
+        self.assertEqual(calls.call_count, 2)
+        self.assertEqual(directory['role:7'], 'role:7')
+
+
+if __name__ == '__main__':
+    unittest.main()
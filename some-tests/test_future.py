@@ -0,0 +1,90 @@
+"""Tests of the replies to the calls made through ``.future``, see
+actors.future."""
+import pickle
+import queue
+import threading
+import unittest
+
+import cloudpickle
+
+from actors.actor import Action
+from actors.director import send_reply
+from actors.future import ReplyChannel
+
+
+class PicklingQueue(queue.Queue):
+    """Pickles what it is given, like the queues between processes."""
+
+    def put(self, item, *args, **kwargs):
+        super().put(cloudpickle.dumps(item), *args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        return pickle.loads(super().get(*args, **kwargs))
+
+
+class TwoArgsError(Exception):
+    """Pickles, but cannot be loaded: its args are only the message."""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+
+
+class ReplyChannelTest(unittest.TestCase):
+
+    def test_unreadable_reply_skipped(self):
+        replies = PicklingQueue()
+        channel = ReplyChannel(replies)
+        lost, kept = channel.register(1), channel.register(2)
+        queue.Queue.put(replies, cloudpickle.dumps((1, None,
+                                                    TwoArgsError('a', 2))))
+        replies.put((2, 'done', None))
+        with self.assertLogs('actors.future', 'ERROR'):
+            self.assertEqual(kept.result(5), 'done')
+        self.assertFalse(lost.done())
+        channel.close()
+
+    def test_closed_queue_ends_the_listener(self):
+        class ClosedQueue(object):
+            def get(self):
+                raise EOFError
+
+        channel = ReplyChannel(ClosedQueue())
+        channel._thread.join(5)
+        self.assertFalse(channel._thread.is_alive())
+
+
+class SendReplyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.replies = PicklingQueue()
+        self.action = Action('actor', 1, reply_to=self.replies)
+
+    def test_error_that_cannot_be_loaded(self):
+        send_reply(self.action, error=TwoArgsError('bad', 2))
+        action_id, result, error = self.replies.get_nowait()
+        self.assertEqual(action_id, self.action.action_id)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn('bad', str(error))
+
+    def test_error_that_can_be_loaded(self):
+        send_reply(self.action, error=ValueError('bad'))
+        self.assertIsInstance(self.replies.get_nowait()[2], ValueError)
+
+    def test_result_that_cannot_be_pickled(self):
+        with self.assertLogs('actors.director', 'ERROR'):
+            send_reply(self.action, threading.Lock())
+        action_id, result, error = self.replies.get_nowait()
+        self.assertIsNone(result)
+        self.assertIsInstance(error, RuntimeError)
+
+    def test_caller_gone(self):
+        class GoneQueue(object):
+            def put(self, item):
+                raise OSError("closed")
+
+        send_reply(Action('actor', 1, reply_to=GoneQueue()), 'result')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,282 @@
+"""Tests of the reductions and allreduces of actor groups, see
+actors.group.
+
+The members are plain instances with a stub proxy, whose ``.remote()``
+calls wait in a Network until it delivers them, in order, to the steps
+the runtime runs for them (see registry.runtime_methods).
+"""
+import queue
+import unittest
+from collections import deque
+
+import numpy as np
+
+from actors import registry
+from actors.group import (Reduction, RingAllreduce, TreeAllreduce, add,
+                          join, split)
+
+
+class Network(object):
+    """The calls between the members, not delivered yet."""
+
+    def __init__(self):
+        self.calls = deque()
+
+    def send(self, instance, method_name, *args):
+        self.calls.append((instance, method_name, args))
+
+    def run(self):
+        """Deliver the calls, and those they make, until there are
+        none."""
+        while self.calls:
+            instance, method_name, args = self.calls.popleft()
+            registry.runtime_methods[method_name](instance, *args)
+
+
+class Method(object):
+
+    def __init__(self, network, instance, method_name):
+        self.network = network
+        self.instance = instance
+        self.method_name = method_name
+
+    def remote(self, *args):
+        self.network.send(self.instance, self.method_name, *args)
+
+
+class Proxy(object):
+
+    def __init__(self, network, instance):
+        self.network = network
+        self.instance = instance
+
+    def __getattr__(self, method_name):
+        return Method(self.network, self.instance, method_name)
+
+
+class Member(object):
+    """An actor whose grad method returns *result*, or raises it."""
+
+    def __init__(self, network, result):
+        self.proxy = Proxy(network, self)
+        self.result = result
+        self.applied = None
+
+    def grad(self, scale=1):
+        if isinstance(self.result, Exception):
+            raise self.result
+        if isinstance(self.result, list):
+            return [part * scale for part in self.result]
+        return self.result * scale
+
+    def apply(self, total):
+        self.applied = total
+        return 'applied'
+
+    def refuse(self, total):
+        raise ValueError("refused")
+
+
+class GroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.network = Network()
+        self.replies = queue.Queue()
+
+    def members(self, results):
+        return [Member(self.network, result) for result in results]
+
+    def plan(self, plan_class, members, then='apply'):
+        return plan_class([member.proxy for member in members], 'grad', add,
+                          then, self.replies, list(range(len(members))))
+
+    def take_replies(self, count):
+        replies = [self.replies.get_nowait() for _ in range(count)]
+        self.assertTrue(self.replies.empty())
+        return {action_id: (result, error)
+                for action_id, result, error in replies}
+
+    def assert_cleaned_up(self, members):
+        for member in members:
+            self.assertEqual(member.__dict__.get('_thtr_reductions', {}), {})
+
+
+class RingAllreduceTest(GroupTest):
+
+    def run_ring(self, members, plan, scale=1):
+        for member in members:
+            self.network.send(member, '__thtr_ring__', plan, scale)
+        self.network.run()
+
+    def test_sum_of_lists_of_arrays(self):
+        for size in (1, 2, 3, 5):
+            members = self.members([[np.full((3, 3), i, float),
+                                     np.arange(7) * i] for i in range(size)])
+            self.run_ring(members, self.plan(RingAllreduce, members),
+                          scale=2)
+            total = sum(range(size)) * 2
+            replies = self.take_replies(size)
+            for index, member in enumerate(members):
+                self.assertEqual(replies[index], ('applied', None))
+                np.testing.assert_array_equal(member.applied[0],
+                                              np.full((3, 3), total))
+                np.testing.assert_array_equal(member.applied[1],
+                                              np.arange(7) * total)
+            self.assert_cleaned_up(members)
+
+    def test_single_array(self):
+        members = self.members([np.arange(4.0), np.ones(4)])
+        self.run_ring(members, self.plan(RingAllreduce, members))
+        self.take_replies(2)
+        for member in members:
+            self.assertIsInstance(member.applied, np.ndarray)
+            np.testing.assert_array_equal(member.applied, np.arange(4.0) + 1)
+
+    def test_parts_before_own_result(self):
+        members = self.members([np.full(6, i) for i in range(4)])
+        plan = self.plan(RingAllreduce, members)
+        late = members[2]
+        self.run_ring([m for m in members if m is not late], plan)
+        # the parts sent to it wait for its own call
+        self.assertTrue(late._thtr_reductions[plan.reduction_id].early)
+        self.assertTrue(self.replies.empty())
+        self.network.send(late, '__thtr_ring__', plan)
+        self.network.run()
+        replies = self.take_replies(4)
+        self.assertEqual({error for _, error in replies.values()}, {None})
+        for member in members:
+            np.testing.assert_array_equal(member.applied, np.full(6, 6))
+        self.assert_cleaned_up(members)
+
+    def test_error_reaches_every_member(self):
+        members = self.members([np.ones(4), ValueError("bad"), np.ones(4)])
+        self.run_ring(members, self.plan(RingAllreduce, members))
+        replies = self.take_replies(3)
+        for result, error in replies.values():
+            self.assertIsNone(result)
+            self.assertIsInstance(error, ValueError)
+        self.assertEqual([member.applied for member in members],
+                         [None] * 3)
+        self.assert_cleaned_up(members)
+
+    def test_error_of_then(self):
+        members = self.members([np.ones(2), np.ones(2)])
+        self.run_ring(members, self.plan(RingAllreduce, members, 'refuse'))
+        for result, error in self.take_replies(2).values():
+            self.assertIsNone(result)
+            self.assertIsInstance(error, ValueError)
+
+    def test_steps(self):
+        for size in (2, 3, 8):
+            plan = RingAllreduce(list(range(size)), 'grad', add, None, None,
+                                 list(range(size)))
+            self.assertEqual(plan.last_step + 1, 2 * (size - 1))
+
+
+class TreeTest(GroupTest):
+
+    def test_every_member_has_one_parent(self):
+        for size in (1, 2, 5, 8):
+            reduction = Reduction(list(range(size)), 'grad', add, None)
+            children = [child for index in range(size)
+                        for child in reduction.children(index)]
+            self.assertEqual(sorted(children), list(range(1, size)))
+
+    def test_reduce(self):
+        members = self.members([[np.full(4, i), i] for i in range(6)])
+        reduction = Reduction([member.proxy for member in members], 'grad',
+                              add, self.replies)
+        for member in members:
+            self.network.send(member, '__thtr_reduce__', reduction)
+        self.network.run()
+        (action_id, (result, error)), = self.take_replies(1).items()
+        self.assertEqual(action_id, reduction.action_id)
+        self.assertIsNone(error)
+        np.testing.assert_array_equal(result[0], np.full(4, 15))
+        self.assertEqual(result[1], 15)
+        self.assert_cleaned_up(members)
+
+    def test_children_before_own_result(self):
+        members = self.members([1, 2, 3])
+        reduction = Reduction([member.proxy for member in members], 'grad',
+                              add, self.replies)
+        for member in members[1:]:
+            self.network.send(member, '__thtr_reduce__', reduction)
+        self.network.run()
+        self.assertTrue(self.replies.empty())
+        self.network.send(members[0], '__thtr_reduce__', reduction)
+        self.network.run()
+        self.assertEqual(self.take_replies(1)[reduction.action_id],
+                         (6, None))
+
+    def test_reduce_error(self):
+        members = self.members([1, 2, 3, RuntimeError("bad"), 5])
+        reduction = Reduction([member.proxy for member in members], 'grad',
+                              add, self.replies)
+        for member in members:
+            self.network.send(member, '__thtr_reduce__', reduction)
+        self.network.run()
+        result, error = self.take_replies(1)[reduction.action_id]
+        self.assertIsNone(result)
+        self.assertIsInstance(error, RuntimeError)
+        self.assert_cleaned_up(members)
+
+    def test_allreduce(self):
+        members = self.members([np.full(3, i) for i in range(5)])
+        plan = self.plan(TreeAllreduce, members)
+        for member in members:
+            self.network.send(member, '__thtr_reduce__', plan)
+        self.network.run()
+        replies = self.take_replies(5)
+        self.assertEqual(set(replies.values()), {('applied', None)})
+        for member in members:
+            np.testing.assert_array_equal(member.applied, np.full(3, 10))
+        self.assert_cleaned_up(members)
+
+    def test_allreduce_error(self):
+        members = self.members([1, ValueError("bad"), 3])
+        plan = self.plan(TreeAllreduce, members)
+        for member in members:
+            self.network.send(member, '__thtr_reduce__', plan)
+        self.network.run()
+        for result, error in self.take_replies(3).values():
+            self.assertIsNone(result)
+            self.assertIsInstance(error, ValueError)
+        self.assertEqual([member.applied for member in members],
+                         [None] * 3)
+
+
+class SplitJoinTest(unittest.TestCase):
+
+    def test_single_array(self):
+        array = np.arange(12.0).reshape(3, 4)
+        chunks, shapes, single = split(array, 5)
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(single)
+        self.assertEqual(sum(len(chunk[0]) for chunk in chunks), 12)
+        joined = join(chunks, shapes, single)
+        self.assertIsInstance(joined, np.ndarray)
+        np.testing.assert_array_equal(joined, array)
+
+    def test_list_of_arrays(self):
+        arrays = [np.ones((2, 3)), np.arange(5), np.zeros(())]
+        chunks, shapes, single = split(arrays, 3)
+        self.assertFalse(single)
+        self.assertEqual(shapes, [(2, 3), (5,), ()])
+        joined = join(chunks, shapes, single)
+        self.assertEqual(len(joined), 3)
+        for got, expected in zip(joined, arrays):
+            np.testing.assert_array_equal(got, expected)
+
+    def test_more_chunks_than_elements(self):
+        array = np.arange(2)
+        chunks, shapes, single = split(array, 4)
+        self.assertEqual([len(chunk[0]) for chunk in chunks], [1, 1, 0, 0])
+        np.testing.assert_array_equal(join(chunks, shapes, single), array)
+
+    def test_add_keeps_the_type(self):
+        self.assertEqual(add((1, [2]), (3, [4])), (4, [6]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+"""Tests of the priority classes and the overflow policies of the
+mailboxes, see actors.mailbox."""
+import queue
+import threading
+import time
+import unittest
+
+from actors.actor import Action, Restart, Stop
+from actors.batching import Batch
+from actors.mailbox import ActorStopped, BoundedQueue, Mailbox, MailboxFull
+
+HIGH_ID = 7
+
+
+def call(method_id=1, reply_to=None):
+    return Action('actor', method_id, reply_to=reply_to)
+
+
+def take(mailbox):
+    return [mailbox.popleft() for _ in range(len(mailbox))]
+
+
+class PriorityTest(unittest.TestCase):
+
+    def test_classes_in_order(self):
+        mailbox = Mailbox(high_ids=frozenset([HIGH_ID]))
+        first, high, second = call(), call(HIGH_ID), call()
+        stop, restart = Stop('actor', now=True), Restart('actor')
+        for message in (first, high, second, stop, restart):
+            mailbox.put(message)
+        self.assertEqual(take(mailbox), [stop, restart, high, first, second])
+
+    def test_normal_stop_waits_its_turn(self):
+        mailbox = Mailbox()
+        first, stop, last = call(), Stop('actor'), call()
+        for message in (first, stop, last):
+            mailbox.put(message)
+        self.assertEqual(take(mailbox), [first, stop, last])
+
+    def test_batch_split_for_high_calls(self):
+        mailbox = Mailbox(high_ids=frozenset([HIGH_ID]))
+        normal, high = call(), call(HIGH_ID)
+        mailbox.put(Batch([normal, high]))
+        self.assertEqual(take(mailbox), [high, normal])
+
+    def test_batch_kept_whole_without_high_methods(self):
+        mailbox = Mailbox()
+        batch = Batch([call(), call()])
+        mailbox.put(batch)
+        self.assertEqual(take(mailbox), [batch])
+
+    def test_lowest_class(self):
+        mailbox = Mailbox(high_ids=frozenset([HIGH_ID]))
+        mailbox.put(call())
+        self.assertFalse(mailbox.has(lowest=1))
+        mailbox.put(call(HIGH_ID))
+        self.assertTrue(mailbox.has(lowest=1))
+
+    def test_put_back_goes_first(self):
+        mailbox = Mailbox()
+        taken, waiting = call(), call()
+        mailbox.put(taken)
+        mailbox.put(waiting)
+        mailbox.put_back([mailbox.popleft()])
+        self.assertEqual(take(mailbox), [taken, waiting])
+
+    def test_take_all(self):
+        mailbox = Mailbox(high_ids=frozenset([HIGH_ID]))
+        normal, high = call(), call(HIGH_ID)
+        mailbox.put(normal)
+        mailbox.put(high)
+        self.assertEqual(mailbox.take_all(), [high, normal])
+        self.assertFalse(mailbox)
+
+    def test_clear_fails_the_futures(self):
+        replies = queue.Queue()
+        mailbox = Mailbox()
+        action = call(reply_to=replies)
+        mailbox.put(action)
+        mailbox.put(call())
+        mailbox.clear(ActorStopped('stopped'))
+        self.assertEqual(len(mailbox), 0)
+        action_id, result, error = replies.get_nowait()
+        self.assertEqual(action_id, action.action_id)
+        self.assertIsInstance(error, ActorStopped)
+        self.assertTrue(replies.empty())
+
+
+class OverflowTest(unittest.TestCase):
+
+    def test_drop_newest(self):
+        replies = queue.Queue()
+        mailbox = Mailbox(size=2, overflow='drop_newest')
+        kept = [call(), call()]
+        dropped = call(reply_to=replies)
+        for action in kept + [dropped]:
+            mailbox.put(action)
+        self.assertEqual(take(mailbox), kept)
+        action_id, _, error = replies.get_nowait()
+        self.assertEqual(action_id, dropped.action_id)
+        self.assertIsInstance(error, MailboxFull)
+
+    def test_drop_oldest(self):
+        replies = queue.Queue()
+        mailbox = Mailbox(size=2, overflow='drop_oldest')
+        oldest = call(reply_to=replies)
+        kept = [call(), call()]
+        for action in [oldest] + kept:
+            mailbox.put(action)
+        self.assertEqual(take(mailbox), kept)
+        action_id, _, error = replies.get_nowait()
+        self.assertEqual(action_id, oldest.action_id)
+        self.assertIsInstance(error, MailboxFull)
+
+    def test_drop_oldest_keeps_a_stop(self):
+        mailbox = Mailbox(size=1, overflow='drop_oldest')
+        stop = Stop('actor')
+        mailbox.put(stop)
+        mailbox.put(call())
+        self.assertEqual(take(mailbox), [stop])
+
+    def test_size_counts_only_normal_calls(self):
+        mailbox = Mailbox(high_ids=frozenset([HIGH_ID]), size=1,
+                          overflow='drop_newest')
+        mailbox.put(call())
+        mailbox.put(call(HIGH_ID))
+        mailbox.put(Stop('actor', now=True))
+        self.assertEqual(len(mailbox), 3)
+
+    def test_block_waits_for_room(self):
+        mailbox = Mailbox(size=1, overflow='block')
+        first, second = call(), call()
+        mailbox.put(first)
+        sender = threading.Thread(target=mailbox.put, args=(second,))
+        sender.start()
+        time.sleep(0.1)
+        self.assertTrue(sender.is_alive())
+        self.assertIs(mailbox.get(), first)
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+        self.assertIs(mailbox.get(), second)
+
+
+class BoundedQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = queue.Queue()
+        self.credits = threading.Semaphore(2)
+
+    def bounded(self, raising=True):
+        return BoundedQueue(self.queue, self.credits, 'actor',
+                            frozenset([HIGH_ID]), raising)
+
+    def receive(self, bounded):
+        """Take a message off the queue, like the actor does."""
+        data = bounded.get()
+        bounded.arrived(data, data)
+        return data
+
+    def test_limit_is_the_mailbox_size(self):
+        bounded = self.bounded()
+        bounded.put(call())
+        bounded.put(call())
+        with self.assertRaises(MailboxFull):
+            bounded.put(call())
+        # taken off the queue, the calls still wait in the mailbox
+        mailbox = Mailbox()
+        mailbox.put(self.receive(bounded))
+        mailbox.put(self.receive(bounded))
+        with self.assertRaises(MailboxFull):
+            bounded.put(call())
+        bounded.settle(mailbox.get())
+        bounded.put(call())
+        with self.assertRaises(MailboxFull):
+            bounded.put(call())
+
+    def test_other_messages_never_held_back(self):
+        bounded = self.bounded()
+        bounded.put(call())
+        bounded.put(call())
+        high, stop = call(HIGH_ID), Stop('actor', now=True)
+        bounded.put(high)
+        bounded.put(stop)
+        bounded.put(Restart('actor'))
+        self.assertEqual(self.queue.qsize(), 5)
+
+    def test_encoded_calls_take_a_credit(self):
+        bounded = self.bounded()
+        bounded.put(b'pickle5:...')
+        bounded.put(b'pickle5:...')
+        with self.assertRaises(MailboxFull):
+            bounded.put(b'pickle5:...')
+
+    def test_credit_given_back_once(self):
+        bounded = self.bounded()
+        action = call()
+        bounded.put(action)
+        self.receive(bounded)
+        bounded.settle(action)
+        bounded.settle(action)
+        bounded.put(call())
+        bounded.put(call())
+        with self.assertRaises(MailboxFull):
+            bounded.put(call())
+
+    def test_lost_call_gives_back_its_credit(self):
+        bounded = self.bounded()
+        bounded.put(b'pickle5:...')
+        bounded.lost(bounded.get())
+        bounded.put(call())
+        bounded.put(call())
+
+    def test_block_waits_for_a_credit(self):
+        bounded = self.bounded(raising=False)
+        bounded.put(call())
+        first = call()
+        bounded.put(first)
+        sender = threading.Thread(target=bounded.put, args=(call(),))
+        sender.start()
+        time.sleep(0.1)
+        self.assertTrue(sender.is_alive())
+        self.receive(bounded)
+        self.receive(bounded)
+        bounded.settle(first)
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
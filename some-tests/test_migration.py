@@ -0,0 +1,40 @@
+"""Tests of the route of a process to an actor that moved, see
+actors.migration."""
+import queue
+import unittest
+
+from actors.migration import Drain, Reroute
+
+
+class RerouteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.new = queue.Queue()
+
+    def sent(self):
+        return [self.new.get_nowait() for _ in range(self.new.qsize())]
+
+    def test_held_until_released(self):
+        reroute = Reroute('actor', {'actor': self.new}.__getitem__)
+        reroute.put(1)
+        reroute.put(2)
+        self.assertEqual(self.sent(), [])
+        reroute.release()
+        reroute.put(3)
+        self.assertEqual(self.sent(), [1, 2, 3])
+
+    def test_route_lost(self):
+        reroute = Reroute('actor', {}.__getitem__)
+        reroute.put(1)
+        with self.assertLogs('actors.migration', 'ERROR'):
+            reroute.release()
+        self.assertEqual(reroute.held, [])
+
+    def test_drain_replies(self):
+        replies = queue.Queue()
+        Drain('actor', replies, 7).done()
+        self.assertEqual(replies.get_nowait(), (7, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
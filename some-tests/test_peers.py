@@ -0,0 +1,71 @@
+"""Tests of the direct channels between processes, see actors.peers."""
+import queue
+import time
+import unittest
+
+from actors.actor import Action
+from actors.peers import PeerDirectory, PeerListener, Peers, Switch
+
+
+def call(actor_key, n):
+    return Action(actor_key, 0, args=(n,))
+
+
+class PeersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = PeerDirectory({})
+        self.delivered = queue.Queue()
+        self.listener = PeerListener(self.directory, '127.0.0.1',
+                                     self.delivered.put)
+        self.addCleanup(self.listener.listener.close)
+        self.peers = Peers(self.directory)
+        self.addCleanup(self.peers.close)
+        self.queues = {'actor': queue.Queue()}
+
+    def delivered_args(self, count):
+        return [self.delivered.get(timeout=5).args[0]
+                for _ in range(count)]
+
+    def test_unpublished_actor_uses_its_queue(self):
+        self.assertIsNone(self.peers.route('actor', self.queues.get))
+        # not tried again right away
+        self.directory.endpoints['actor'] = self.listener.endpoint
+        self.assertIsNone(self.peers.route('actor', self.queues.get))
+        self.peers.retry_at['actor'] = time.monotonic()
+        self.assertIsNotNone(self.peers.route('actor', self.queues.get))
+
+    def test_held_until_switched(self):
+        self.listener.publish('actor')
+        route = self.peers.route('actor', self.queues.get)
+        self.assertIs(self.peers.route('actor', self.queues.get), route)
+        switch = self.queues['actor'].get_nowait()
+        self.assertIsInstance(switch, Switch)
+        route.put(call('actor', 1))
+        route.put(call('actor', 2))
+        time.sleep(0.05)
+        self.assertTrue(self.delivered.empty())
+        self.listener.switched(switch)
+        self.assertEqual(self.delivered_args(2), [1, 2])
+        self.assertEqual(self.listener.switches, {})
+
+    def test_stale_endpoint(self):
+        address, _ = self.listener.endpoint
+        self.directory.endpoints['actor'] = (address, 'another peer')
+        self.assertIsNone(self.peers.route('actor', self.queues.get))
+        self.assertEqual(self.peers.channels, {})
+
+    def test_broken_channel_falls_back_to_the_queue(self):
+        self.listener.publish('actor')
+        route = self.peers.route('actor', self.queues.get)
+        self.queues['actor'].get_nowait()  # the switch
+        route.channel.close()
+        message = call('actor', 1)
+        route.put(message)
+        self.assertIs(self.queues['actor'].get_nowait(), message)
+        self.assertEqual(self.peers.routes, {})
+        self.assertEqual(self.peers.channels, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""Tests of the choice of the worker of each actor, see
+actors.placement."""
+import unittest
+
+from actors.placement import (Placer, check_pool, hashed_worker,
+                              worker_pools)
+
+
+def options(**kwargs):
+    role_options = dict(pool=None, spread=False, memory=None, cpus=None)
+    role_options.update(kwargs)
+    return role_options
+
+
+class PoolsTest(unittest.TestCase):
+
+    def test_worker_pools(self):
+        self.assertEqual(worker_pools(2, {'big': 1}),
+                         ['default', 'default', 'big'])
+        with self.assertRaises(ValueError):
+            worker_pools(1, {'default': 1})
+
+    def test_check_pool(self):
+        pools = worker_pools(1, {'big': 1})
+        check_pool(options(pool='big'), pools)
+        check_pool(options(), pools)
+        with self.assertRaises(ValueError):
+            check_pool(options(pool='small'), pools)
+
+    def test_hashed_worker(self):
+        pools = worker_pools(2, {'big': 2})
+        for key in ('a', 'b', 'c', 'd'):
+            self.assertIn(hashed_worker(key, pools), (0, 1))
+            self.assertIn(hashed_worker(key, pools, 'big'), (2, 3))
+            self.assertEqual(hashed_worker(key, pools),
+                             hashed_worker(key, pools))
+        self.assertIsNone(hashed_worker('a', pools, 'small'))
+
+
+class PlacerTest(unittest.TestCase):
+
+    def test_least_loaded(self):
+        placer = Placer(worker_pools(3))
+        workers = [placer.place(f"a{i}", 'role', options())
+                   for i in range(6)]
+        self.assertEqual(sorted(workers), [0, 0, 1, 1, 2, 2])
+
+    def test_spread(self):
+        placer = Placer(worker_pools(2))
+        placer.place('other', 'other', options())
+        placer.place('other2', 'other', options())
+        placer.place('other3', 'other', options())
+        # worker 1 has fewer actors, but the role goes on both
+        workers = [placer.place(f"a{i}", 'role', options(spread=True))
+                   for i in range(2)]
+        self.assertEqual(sorted(workers), [0, 1])
+
+    def test_pool(self):
+        placer = Placer(worker_pools(1, {'big': 2}))
+        workers = {placer.place(f"a{i}", 'role', options(pool='big'))
+                   for i in range(4)}
+        self.assertEqual(workers, {1, 2})
+
+    def test_memory_and_cpus(self):
+        placer = Placer(worker_pools(2), memory=1000, cpus=2)
+        self.assertIsNotNone(placer.place('a', 'role', options(memory=800)))
+        self.assertIsNotNone(placer.place('b', 'role', options(memory=800)))
+        # no worker of the default pool has room, a process of its own
+        self.assertIsNone(placer.place('c', 'role', options(memory=800)))
+        self.assertIsNotNone(placer.place('d', 'role', options(cpus=2)))
+        self.assertIsNotNone(placer.place('e', 'role', options(cpus=2)))
+        self.assertIsNone(placer.place('f', 'role', options(cpus=1)))
+
+    def test_pinned_pool_overloads(self):
+        placer = Placer(worker_pools(0, {'big': 1}), memory=100)
+        placer.place('a', 'role', options(pool='big', memory=100))
+        with self.assertLogs('actors.placement', 'WARNING'):
+            self.assertEqual(
+                placer.place('b', 'role', options(pool='big', memory=100)), 0)
+
+    def test_colocate(self):
+        placer = Placer(worker_pools(3))
+        worker = placer.place('a', 'role', options())
+        for i in range(3):
+            self.assertEqual(placer.place(f"b{i}", 'role',
+                                          options(colocate='a')), worker)
+        with self.assertLogs('actors.placement', 'WARNING'):
+            self.assertIsNone(placer.place('c', 'role',
+                                           options(colocate='missing')))
+
+    def test_release_and_remove(self):
+        placer = Placer(worker_pools(2), memory=100)
+        worker = placer.place('a', 'role', options(memory=100))
+        placer.release('a')
+        self.assertEqual(placer.load[worker], 0)
+        self.assertEqual(placer.used_memory[worker], 0)
+        self.assertEqual(placer.hosted_by(worker), ['a'])
+        placer.release('a')
+        self.assertEqual(placer.load[worker], 0)
+        placer.remove('a')
+        self.assertEqual(placer.hosted_by(worker), [])
+
+    def test_add_moves_the_count(self):
+        placer = Placer(worker_pools(2))
+        placer.add('a', 0, 'role', options())
+        placer.add('a', 1, 'role', options())
+        self.assertEqual(placer.load, [0, 1])
+        self.assertEqual(placer.hosted_by(1), ['a'])
+
+    def test_move_target(self):
+        placer = Placer(worker_pools(3, {'big': 1}), memory=100)
+        placer.add('a', 0, 'role', options(memory=50))
+        placer.add('b', 1, 'role', options(memory=100))
+        self.assertEqual(placer.move_target('a', 'role', options(memory=50)),
+                         2)
+        placer.add('c', 2, 'role', options(memory=100))
+        self.assertIsNone(placer.move_target('a', 'role',
+                                             options(memory=50)))
+
+
+if __name__ == '__main__':
+    unittest.main()
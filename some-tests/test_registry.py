@@ -0,0 +1,43 @@
+"""Tests of the class IDs of the roles, see actors.registry."""
+import unittest
+
+import actors
+from actors import registry
+
+
+def define(class_id=None):
+    """A new class named Worker, like one of another module."""
+    class Worker(object):
+        def work(self):
+            return 'work'
+    return actors.remote(class_id=class_id)(Worker) if class_id \
+        else actors.remote(Worker)
+
+
+class ClassIdTest(unittest.TestCase):
+
+    def test_default_includes_module_and_qualname(self):
+        role = define().__thtr_metadata__.role
+        self.assertEqual(role.class_id,
+                         f"lithops:{__name__}.define.<locals>.Worker")
+        self.assertIs(registry.lookup(role.class_id), role)
+
+    def test_same_class_defined_again(self):
+        first = define('test:again').__thtr_metadata__.role
+        second = define('test:again').__thtr_metadata__.role
+        self.assertIsNot(first, second)
+        self.assertIs(registry.lookup('test:again'), second)
+
+    def test_other_class_with_the_same_id(self):
+        define('test:taken')
+
+        class Other(object):
+            pass
+
+        with self.assertRaises(ValueError):
+            actors.remote(class_id='test:taken')(Other)
+        self.assertEqual(registry.lookup('test:taken').class_name, 'Worker')
+
+
+if __name__ == '__main__':
+    unittest.main()
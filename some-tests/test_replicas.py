@@ -0,0 +1,103 @@
+"""Tests of how the calls to a replica set are spread, and of how the set
+scales, see actors.replicas."""
+import unittest
+from unittest import mock
+
+from actors import replicas
+from actors.replicas import ReplicaBoard, ReplicaSet, ScaledSet, View
+
+ROLE = mock.Mock(method_names=())
+
+
+class ReplicaSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.board = ReplicaBoard({'set': ('a', 'b', 'c')}, {})
+        patcher = mock.patch('actors.replicas.view', View(self.board, 60))
+        self.view = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def next_keys(self, replica_set, n):
+        return [replica_set._thtr_next_key() for _ in range(n)]
+
+    def test_least_loaded_first(self):
+        self.board.loads.update(a=2, b=0, c=1)
+        replica_set = ReplicaSet('set', ROLE, ('a', 'b', 'c'))
+        # counting the calls sent since the loads were read
+        self.assertEqual(self.next_keys(replica_set, 4), ['b', 'b', 'c', 'a'])
+
+    def test_loads_read_again(self):
+        replica_set = ReplicaSet('set', ROLE, ('a', 'b', 'c'))
+        self.assertEqual(self.next_keys(replica_set, 2), ['a', 'b'])
+        self.board.loads.update(a=0, b=0, c=5)
+        # not before the interval
+        self.assertEqual(self.next_keys(replica_set, 1), ['c'])
+        self.view.refreshed -= 60
+        self.assertEqual(self.next_keys(replica_set, 2), ['a', 'b'])
+
+    def test_members_followed(self):
+        replica_set = ReplicaSet('set', ROLE, ('a',))
+        self.assertEqual(self.next_keys(replica_set, 3), ['a', 'b', 'c'])
+        self.board.members['set'] = ('c', 'd')
+        self.view.refreshed -= 60
+        self.assertEqual(self.next_keys(replica_set, 2), ['c', 'd'])
+
+    def test_not_started(self):
+        replica_set = ReplicaSet('set', ROLE, ('a', 'b'))
+        with mock.patch('actors.replicas.view', None):
+            self.assertEqual(self.next_keys(replica_set, 3), ['a', 'b', 'a'])
+
+
+class ScaledSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.board = ReplicaBoard({}, {})
+        patcher = mock.patch('actors.replicas.board', self.board)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.created = 0
+        patcher = mock.patch('actors.replicas.create_actors', self.create)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scaled = ScaledSet('set', None, (), {}, {}, ['a', 'b'], 2, 3)
+
+    def create(self, meta, n, args, kwargs, options):
+        self.created += 1
+        return [mock.Mock(_thtr_actor_key=f"new{self.created}")]
+
+    def test_grows_up_to_most(self):
+        busy = {'a': replicas.SCALE_UP_DEPTH, 'b': replicas.SCALE_UP_DEPTH}
+        self.assertEqual(self.scaled.check(busy), [])
+        self.assertEqual(self.scaled.members, ['a', 'b'])
+        busy['b'] += 1
+        with self.assertLogs('actors.replicas', 'INFO'):
+            self.assertEqual(self.scaled.check(busy), [])
+        self.assertEqual(self.board.members['set'], ('a', 'b', 'new1'))
+        busy['new1'] = 100
+        self.scaled.check(busy)
+        self.assertEqual(self.created, 1)
+
+    def test_shrinks_after_idle_checks(self):
+        self.scaled.members.append('c')
+        for _ in range(replicas.IDLE_CHECKS - 1):
+            self.scaled.check({})
+        self.scaled.check({'a': 1})  # not idle, counting again
+        for _ in range(replicas.IDLE_CHECKS - 1):
+            self.scaled.check({})
+        self.assertEqual(self.scaled.members, ['a', 'b', 'c'])
+        with self.assertLogs('actors.replicas', 'INFO'):
+            self.scaled.check({})
+        self.assertEqual(self.board.members['set'], ('a', 'b'))
+        # stopped once every sender saw it go
+        for _ in range(replicas.RETIRE_CHECKS - 1):
+            self.assertEqual(self.scaled.check({}), [])
+        self.assertEqual(self.scaled.check({}), ['c'])
+        self.assertEqual(self.scaled.retiring, {})
+        # not below least
+        for _ in range(replicas.IDLE_CHECKS):
+            self.scaled.check({})
+        self.assertEqual(self.scaled.members, ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
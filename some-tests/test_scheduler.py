@@ -0,0 +1,95 @@
+"""Tests of the turns the actors of a worker take, see
+actors.scheduler."""
+import queue
+import unittest
+
+from actors.actor import Action, Restart
+from actors.scheduler import ActorCell, Scheduler
+
+
+def call(actor_key, reply_to=None):
+    return Action(actor_key, 0, reply_to=reply_to)
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.handled = []
+        self.scheduler = Scheduler(self.handle)
+
+    def handle(self, cell, message):
+        self.handled.append(cell.key)
+
+    def add(self, *keys):
+        cells = [ActorCell(key, None, ()) for key in keys]
+        for cell in cells:
+            self.scheduler.add(cell)
+        return cells
+
+    def run_all(self):
+        while self.scheduler.has_work():
+            self.scheduler.run_once()
+
+    def test_actors_take_turns(self):
+        self.add('a', 'b', 'c')
+        for _ in range(3):
+            self.scheduler.enqueue('a', call('a'))
+        self.scheduler.enqueue('b', call('b'))
+        self.scheduler.enqueue('c', call('c'))
+        self.scheduler.enqueue('c', call('c'))
+        self.run_all()
+        self.assertEqual(self.handled, ['a', 'b', 'c', 'a', 'c', 'a'])
+
+    def test_one_message_at_a_time(self):
+        cell, = self.add('a')
+        running = []
+
+        def handle(cell, message):
+            running.append(cell.key)
+            self.assertEqual(running.count('a'), 1)
+            # a call it makes to itself waits for its turn
+            if len(self.handled) < 3:
+                self.scheduler.enqueue('a', call('a'))
+            self.handled.append(cell.key)
+            running.remove(cell.key)
+
+        self.scheduler.handle = handle
+        self.scheduler.enqueue('a', call('a'))
+        self.scheduler.enqueue('a', call('a'))
+        self.assertEqual(list(self.scheduler.ready), [cell])
+        self.scheduler.run_once()
+        self.assertEqual(self.handled, ['a'])
+        self.assertEqual(list(self.scheduler.ready), [cell])
+        self.run_all()
+        self.assertEqual(self.handled, ['a'] * 5)
+
+    def test_failed_actor_takes_only_system_messages(self):
+        cell, = self.add('a')
+        cell.failed = True
+        self.scheduler.enqueue('a', call('a'))
+        self.assertFalse(self.scheduler.has_work())
+        self.scheduler.enqueue('a', Restart('a'))
+        self.run_all()
+        self.assertEqual(self.handled, ['a'])
+        self.assertEqual(len(cell.mailbox), 1)
+
+    def test_removed_actor_skipped(self):
+        self.add('a', 'b')
+        self.scheduler.enqueue('a', call('a'))
+        self.scheduler.enqueue('b', call('b'))
+        self.scheduler.remove('a')
+        self.run_all()
+        self.assertEqual(self.handled, ['b'])
+
+    def test_call_to_unknown_actor_fails(self):
+        replies = queue.Queue()
+        action = call('missing', replies)
+        with self.assertLogs('actors.scheduler', 'WARNING'):
+            self.scheduler.enqueue('missing', action)
+        action_id, _, error = replies.get_nowait()
+        self.assertEqual(action_id, action.action_id)
+        self.assertIsInstance(error, KeyError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tests of the serializers of the actions, and of what can be read of
+the ones that cannot be loaded, see actors.serialization."""
+import unittest
+from unittest import mock
+
+from actors import serialization
+from actors.actor import Action
+
+SERIALIZERS = ['pickle5', 'cloudpickle']
+if serialization.msgpack is not None:
+    SERIALIZERS.append('msgpack')
+
+
+class Gone(object):
+    """A class the receiver does not have, once it is removed."""
+
+
+def action(serializer, *args, **kwargs):
+    sent = Action('actor', 3, args=args, kwargs=kwargs, reply_to='replies')
+    sent.serializer = serializer
+    return sent
+
+
+def missing_class():
+    """Make Gone unknown until the end of the test."""
+    patcher = mock.patch.dict(globals())
+    patcher.start()
+    del globals()['Gone']
+    return patcher
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_every_serializer(self):
+        for name in SERIALIZERS:
+            with self.subTest(name):
+                sent = action(name, 1, 'two', b'three', [4.0], {'five': 5},
+                              key=None)
+                data = sent.encode()
+                self.assertTrue(data.startswith(name.encode() + b':'))
+                got = serialization.decode(data)
+                self.assertEqual(
+                    (got.actor_key, got.method_id, got.action_id,
+                     got.reply_to),
+                    ('actor', 3, sent.action_id, 'replies'))
+                self.assertEqual(list(got.args),
+                                 [1, 'two', b'three', [4.0], {'five': 5}])
+                self.assertEqual(got.kwargs, {'key': None})
+
+    @unittest.skipIf(serialization.msgpack is None, "msgpack missing")
+    def test_msgpack_pickles_other_objects(self):
+        got = serialization.decode(action('msgpack', Gone(), (1, 2)).encode())
+        self.assertIsInstance(got.args[0], Gone)
+        self.assertEqual(got.args[1], [1, 2])  # tuples arrive as lists
+
+    def test_messages_not_encoded(self):
+        message = action(None, 1)
+        self.assertIs(serialization.decode(message), message)
+        copy = serialization.copy_message(message)
+        self.assertIsNot(copy, message)
+        self.assertEqual(copy.args, (1,))
+
+    def test_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            serialization.wire_name('yaml')
+        self.assertIsNone(serialization.wire_name('cloudpickle'))
+        self.assertEqual(serialization.wire_name('pickle5'), 'pickle5')
+
+
+class SalvageTest(unittest.TestCase):
+
+    def test_reply_to_of_an_unknown_class(self):
+        for name in SERIALIZERS:
+            with self.subTest(name):
+                sent = action(name, Gone(), 2)
+                data = sent.encode()
+                patcher = missing_class()
+                try:
+                    with self.assertRaises(Exception):
+                        serialization.decode(data)
+                    got = serialization.salvage(data)
+                finally:
+                    patcher.stop()
+                self.assertEqual(got.action_id, sent.action_id)
+                self.assertEqual(got.reply_to, 'replies')
+                if name == 'msgpack':
+                    self.assertIsNone(got.args[0])
+                else:
+                    self.assertIsInstance(got.args[0],
+                                          serialization.Missing)
+                self.assertEqual(got.args[1], 2)
+
+    def test_pickled_message(self):
+        data = serialization.dumps_message(action(None, Gone()))
+        patcher = missing_class()
+        try:
+            got = serialization.salvage(data)
+        finally:
+            patcher.stop()
+        self.assertEqual(got.reply_to, 'replies')
+
+    def test_nothing_to_salvage(self):
+        self.assertIsNone(serialization.salvage(b'pickle5:\x80\x05garbage'))
+        self.assertIsNone(serialization.salvage(b'no serializer'))
+
+    def test_drop_unreadable_fails_the_call(self):
+        data = action('pickle5', 1).encode()
+        error = ValueError("cannot load")
+        with mock.patch('actors.mailbox.drop') as drop, \
+                self.assertLogs('actors.serialization', 'ERROR'):
+            serialization.drop_unreadable(data, error)
+        (dropped,), got_error = drop.call_args.args
+        self.assertEqual(dropped.reply_to, 'replies')
+        self.assertIs(got_error, error)
+
+    def test_drop_unreadable_counts_a_lost_call(self):
+        with mock.patch('actors.activity.counters') as counters, \
+                self.assertLogs('actors.serialization', 'ERROR'):
+            serialization.drop_unreadable(None, EOFError())
+        counters.add_handled.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
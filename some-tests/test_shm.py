@@ -0,0 +1,79 @@
+"""Tests of the shared memory transport of large buffers, see
+actors.shm."""
+import os
+import unittest
+
+import numpy as np
+
+from actors import shm
+from actors.actor import Action
+from actors.mailbox import drop
+
+
+def exists(payload):
+    return os.path.exists(os.path.join(shm.SEGMENTS_DIR, payload.segment))
+
+
+@unittest.skipUnless(shm.available() and os.path.isdir(shm.SEGMENTS_DIR),
+                     "no POSIX shared memory here")
+class ShareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.prefix = shm.new_prefix()
+        shm.set_up(self.prefix)
+        self.addCleanup(shm.set_up, None)
+        self.addCleanup(shm.unlink_all, self.prefix)
+
+    def test_small_buffers_stay_in_band(self):
+        self.assertIsNone(shm.share(np.arange(10), threshold=1000))
+
+    def test_round_trip(self):
+        array = np.arange(1000, dtype=np.float64)
+        payload = shm.share({'a': array, 'small': np.ones(2)}, 1000)
+        self.assertTrue(payload.segment.startswith(self.prefix))
+        self.assertEqual(len(payload.buffers), 1)
+        offset, nbytes = payload.buffers[0]
+        self.assertEqual(offset % shm.ALIGNMENT, 0)
+        self.assertEqual(nbytes, array.nbytes)
+        loaded = payload.load()
+        np.testing.assert_array_equal(loaded['a'], array)
+        np.testing.assert_array_equal(loaded['small'], np.ones(2))
+
+    def test_last_receiver_unlinks(self):
+        payload = shm.share(np.zeros(1000), 1000, receivers=3)
+        payload.load()
+        payload.release()
+        self.assertTrue(exists(payload))
+        loaded = payload.load()
+        self.assertFalse(exists(payload))
+        # the mapping outlives the segment name
+        self.assertEqual(loaded.sum(), 0)
+
+    def test_release_of_an_unlinked_segment(self):
+        payload = shm.share(np.zeros(1000), 1000)
+        self.assertEqual(shm.unlink_all(self.prefix), 1)
+        payload.release()
+        self.assertFalse(exists(payload))
+
+    def test_action_arguments(self):
+        array = np.arange(1000.0)
+        action = Action('actor', 0, args=(array,), kwargs={'scale': 2})
+        action.share_args(1000)
+        self.assertEqual((action.args, action.kwargs), ((), {}))
+        segment = action.shared
+        result = action.call([lambda array, scale: array * scale])
+        np.testing.assert_array_equal(result, array * 2)
+        self.assertIsNone(action.shared)
+        self.assertFalse(exists(segment))
+
+    def test_dropped_call_releases_its_segment(self):
+        action = Action('actor', 0, args=(np.zeros(1000),))
+        action.share_args(1000)
+        segment = action.shared
+        drop([action], RuntimeError("dropped"))
+        self.assertIsNone(action.shared)
+        self.assertFalse(exists(segment))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Tests of the backoff between the restarts of failed actors, see
+actors.supervision."""
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from actors.supervision import Supervision
+
+
+def members(*keys):
+    return [SimpleNamespace(_actor_key=key) for key in keys]
+
+
+class NextDelayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('actors.supervision.time.monotonic',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_backoff_doubles(self):
+        supervision = Supervision(members('a'), max_restarts=4, backoff=0.5)
+        self.assertEqual([supervision.next_delay('a') for _ in range(4)],
+                         [0.5, 1.0, 2.0, 4.0])
+
+    def test_backoff_capped(self):
+        supervision = Supervision(members('a'), max_restarts=10, backoff=1,
+                                  max_backoff=3)
+        self.assertEqual([supervision.next_delay('a') for _ in range(4)],
+                         [1, 2, 3, 3])
+
+    def test_too_many_restarts(self):
+        supervision = Supervision(members('a'), max_restarts=2)
+        self.assertIsNotNone(supervision.next_delay('a'))
+        self.assertIsNotNone(supervision.next_delay('a'))
+        self.assertIsNone(supervision.next_delay('a'))
+
+    def test_restarts_forgotten_after_period(self):
+        supervision = Supervision(members('a'), max_restarts=2, period=60,
+                                  backoff=1)
+        supervision.next_delay('a')
+        supervision.next_delay('a')
+        self.now += 30
+        self.assertIsNone(supervision.next_delay('a'))
+        # counted from the restarts, a second and two after the failures
+        self.now += 33
+        self.assertEqual(supervision.next_delay('a'), 1)
+
+    def test_one_for_one_counts_each_actor(self):
+        supervision = Supervision(members('a', 'b'), max_restarts=1)
+        self.assertIsNotNone(supervision.next_delay('a'))
+        self.assertIsNotNone(supervision.next_delay('b'))
+        self.assertIsNone(supervision.next_delay('a'))
+        self.assertEqual(supervision.to_restart('a'), ['a'])
+
+    def test_all_for_one_counts_together(self):
+        supervision = Supervision(members('a', 'b'), strategy='all_for_one',
+                                  max_restarts=1)
+        self.assertIsNotNone(supervision.next_delay('a'))
+        self.assertIsNone(supervision.next_delay('b'))
+        self.assertEqual(sorted(supervision.to_restart('a')), ['a', 'b'])
+
+
+class SupervisionTest(unittest.TestCase):
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            Supervision(members('a'), strategy='rest_for_one')
+
+    def test_supervisor_without_actor_failed(self):
+        with self.assertRaises(ValueError):
+            Supervision(members('a'), supervisor=object())
+
+
+if __name__ == '__main__':
+    unittest.main()